@@ -0,0 +1,132 @@
+# File: analysis_orchestrator.py
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TIMEOUT_SECONDS = 90.0
+
+
+class _TimedCall:
+    """A pool task that records when it starts running, so its timeout excludes time spent queued."""
+
+    def __init__(self, call, *args):
+        self.call = call
+        self.args = args
+        self.started = threading.Event()
+        self.started_at = None
+
+    def __call__(self):
+        self.started_at = time.time()
+        self.started.set()
+        return self.call(*self.args), round(time.time() - self.started_at, 3)
+
+
+class AnalysisOrchestrator:
+    """
+    Runs the financial extraction and the compliance check on a translation at the same
+    time. They are independent LLM calls on the same text, so the combined latency is
+    that of the slower one rather than the sum.
+
+    The worker pool is long-lived and shared by every `analyze` call, and the analyzers'
+    LLM requests share `request_slots`, so `max_workers` caps the number of analysis
+    requests in flight across callers. A call that runs
+    past its timeout cannot be interrupted; it is reported as timed out, keeps its worker
+    until it returns, and is counted in `overrunning` meanwhile.
+    """
+
+    def __init__(self, financial_analyzer, violation_analyzer, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 max_workers: int = 4):
+        self.financial_analyzer = financial_analyzer
+        self.violation_analyzer = violation_analyzer
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        # Compliance windows and deal segments fan out inside one call, so each LLM request
+        # also takes a slot; max_workers then bounds requests in flight, not just calls
+        self.request_slots = threading.BoundedSemaphore(max_workers)
+        financial_analyzer.request_slots = self.request_slots
+        violation_analyzer.request_slots = self.request_slots
+        self._overrunning = set()
+        self._overrunning_lock = threading.Lock()
+
+    def _extract(self, full_translation: str):
+        analysis_result = self.financial_analyzer.extract_key_info(full_translation)
+        return analysis_result, self.financial_analyzer.extract_deal_identifiers(analysis_result)
+
+    @property
+    def overrunning(self) -> int:
+        """Calls that timed out but are still occupying a worker."""
+        with self._overrunning_lock:
+            return len(self._overrunning)
+
+    def _flag_overrun(self, name: str, task: _TimedCall, future):
+        # Queued calls are simply dropped; a running one keeps its worker until it returns
+        if future.cancel():
+            return
+        with self._overrunning_lock:
+            self._overrunning.add(future)
+
+        def finished(done):
+            with self._overrunning_lock:
+                self._overrunning.discard(done)
+            print(f"{name.capitalize()} analysis finished {round(time.time() - task.started_at, 1)}s after it started, past its timeout")
+
+        future.add_done_callback(finished)
+
+    def _wait(self, task: _TimedCall, future, timeout: float):
+        # Time spent queued behind other callers' requests does not count against the timeout
+        while not task.started.wait(1.0):
+            if future.done():
+                break
+        remaining = task.started_at + timeout - time.time() if task.started_at is not None else 0
+        return future.result(timeout=max(remaining, 0))
+
+    def analyze(self, full_translation: str, timeout: Optional[float] = None,
+                translation_chunks: Optional[List[str]] = None,
+                violations_response: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Run both analyses on `full_translation` and wait for them.
+
+        :param translation_chunks: Per-chunk translations; when given, the compliance check runs
+            as parallel overlapping windows over them instead of one request on the whole text
+        :param violations_response: A compliance result that is already known, e.g. from an
+            incremental scan during transcription; only the financial extraction then runs
+        :param timeout: Seconds each call may take once it starts running (time queued in the shared
+            pool does not count); defaults to `self.timeout`. A call that times out or raises is
+            reported under `errors` and its result is None.
+        :return: Dict with analysis_result, deal_identifiers, violations_response, and
+            per-call `timings` (seconds) and `errors` (message) keyed by 'financial'/'compliance'
+        """
+        timeout = self.timeout if timeout is None else timeout
+        tasks = {'financial': _TimedCall(self._extract, full_translation)}
+        if violations_response is None:
+            if translation_chunks:
+                tasks['compliance'] = _TimedCall(self.violation_analyzer.check_violations_windowed, translation_chunks)
+            else:
+                tasks['compliance'] = _TimedCall(self.violation_analyzer.check_violations, full_translation)
+        futures = {name: self._executor.submit(task) for name, task in tasks.items()}
+
+        results, timings, errors = {}, {}, {}
+        for name, future in futures.items():
+            try:
+                results[name], timings[name] = self._wait(tasks[name], future, timeout)
+            except FutureTimeoutError:
+                self._flag_overrun(name, tasks[name], future)
+                errors[name] = f"timed out after {timeout}s"
+            except Exception as e:
+                errors[name] = str(e)
+            if name in errors:
+                print(f"{name.capitalize()} analysis failed: {errors[name]}")
+
+        analysis_result, deal_identifiers = results.get('financial', (None, []))
+        return {
+            'analysis_result': analysis_result,
+            'deal_identifiers': deal_identifiers,
+            'violations_response': results.get('compliance', violations_response),
+            'timings': timings,
+            'errors': errors,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
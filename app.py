@@ -11,6 +11,8 @@ from transcriber import SarvamTranscriber
 from audio_preprocessor import AudioPreprocessor
 from response_generator import FinancialAnalyzer
 from compliance_checker import ViolationAnalyzer
+from analysis_orchestrator import AnalysisOrchestrator
+from transcript_cache import TranscriptCache
 import matplotlib.colors as mcolors
 import random
 import base64
@@ -22,6 +24,7 @@ st.title("Audio Transcription, Translation, and Compliance Analysis App")
 
 # Upload audio file with supported formats
 supported_formats = AudioPreprocessor.SUPPORTED_FORMATS
+transcript_cache = TranscriptCache()
 uploaded_file = st.file_uploader(
     f"Choose an audio file ({', '.join(supported_formats)})", 
     type=[fmt[1:] for fmt in supported_formats]
@@ -62,20 +65,62 @@ def generate_darker_colors(n):
     random.shuffle(contrast_colors)  # Shuffle to ensure randomness
     return contrast_colors[:n]
 
+# One set of analyzers for the whole server: they share the pooled Groq client, and the
+# knowledge base is only re-read when guardrails.json changes
+@st.cache_resource(show_spinner=False)
+def get_analysis_orchestrator():
+    return AnalysisOrchestrator(
+        FinancialAnalyzer(), ViolationAnalyzer(knowledge_base_path='./knowledge_base/guardrails.json')
+    )
+
+def analysis_cache_key(full_translation, windowed):
+    """
+    Disk-cache key for the analyses of a translation. Everything that changes the result is
+    part of it: the prompt versions (so editing the knowledge base invalidates entries), the
+    models and temperatures, the pre-filter lexicon and full_scan (which decide what reaches
+    the LLM at all), and whether compliance ran as windows or one request.
+    """
+    orchestrator = get_analysis_orchestrator()
+    financial, violation = orchestrator.financial_analyzer, orchestrator.violation_analyzer
+    mode = f"windowed:{violation.WINDOW_CHUNKS}/{violation.OVERLAP_CHUNKS}" if windowed else 'single'
+    return TranscriptCache.make_key(
+        'analysis', full_translation,
+        financial.prompt_version, financial.MODEL, financial.TEMPERATURE,
+        violation.prompt_version, violation.MODEL, violation.TEMPERATURE, violation.retrieval_k,
+        violation.screening_version, mode,
+    )
+
 # Cache the processed data for efficiency
 @st.cache_data(show_spinner=False)
-def process_translation(full_translation):
+def process_translation(full_translation, translation_chunks=None, violations_response=None):
     """
     Processes translation to extract deal identifiers and check compliance.
     :param full_translation: Full translated text from the audio file.
+    :param translation_chunks: Translated text per transcriber chunk, for windowed compliance analysis.
+    :param violations_response: Compliance result already produced while transcribing, if any.
     :return: Tuple of analysis results, deal identifiers, and violations response.
     """
-    analyzer = FinancialAnalyzer()
-    analysis_result = analyzer.extract_key_info(full_translation)
-    deal_identifiers = analyzer.extract_deal_identifiers(analysis_result)
-    
-    compliance_analyzer = ViolationAnalyzer(knowledge_base_path='./knowledge_base/guardrails.json')
-    violations_response = compliance_analyzer.check_violations(full_translation)
+    # Analyses are cached on disk too, so a re-opened call skips both Groq requests after a restart
+    orchestrator = get_analysis_orchestrator()
+    cache_key = analysis_cache_key(full_translation, windowed=bool(translation_chunks))
+    cached = transcript_cache.get(cache_key)
+    if cached:
+        return cached['analysis_result'], cached['deal_identifiers'], cached['violations_response']
+
+    # Extraction and the compliance check are independent, so both requests run at once
+    combined = orchestrator.analyze(
+        full_translation, translation_chunks=translation_chunks, violations_response=violations_response
+    )
+    analysis_result = combined['analysis_result']
+    deal_identifiers = combined['deal_identifiers']
+    violations_response = combined['violations_response']
+
+    if analysis_result and violations_response:
+        transcript_cache.put(cache_key, {
+            'analysis_result': analysis_result,
+            'deal_identifiers': deal_identifiers,
+            'violations_response': violations_response,
+        })
     
     return analysis_result, deal_identifiers, violations_response
 
@@ -257,52 +302,92 @@ if 'analysis_result' not in st.session_state:
 
 # Main processing if a file is uploaded
 if uploaded_file is not None and st.session_state.analysis_result is None:
-    transcriber = SarvamTranscriber()
+    transcriber = SarvamTranscriber(cache=transcript_cache)
     with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
         tmp_file.write(uploaded_file.getvalue())
         tmp_file_path = tmp_file.name
 
-    preprocessed_file = AudioPreprocessor.convert_to_wav(tmp_file_path)
-    st.audio(preprocessed_file, format='audio/wav')
+    # Play the upload as-is; the transcriber decodes it with a streaming ffmpeg pipe
+    st.audio(uploaded_file.getvalue(), format=uploaded_file.type)
 
-    transcriber.process_file(preprocessed_file)
-    language_code = transcriber.get_language_code()
+    transcriber.process_stream(tmp_file_path)
+    # The language is identified alongside the first uploads, so the heading fills in once it is known
+    language_code = None
 
     col1, col2 = st.columns(2)
 
     with col1:
-        st.subheader(f"Transcription ({language_code})")
-        transcription_placeholder = st.empty()
+        transcription_heading = st.empty()
+        transcription_heading.subheader("Transcription")
+        transcription_area = st.container()
 
     with col2:
         st.subheader("Translation (English)")
-        translation_placeholder = st.empty()
+        translation_area = st.container()
 
-    full_transcription = ""
-    full_translation = ""
+    transcription_parts = []
+    translation_parts = []
     progress_bar = st.progress(0)
 
-    while not transcriber.is_finished():
-        transcription = transcriber.get_transcription()
-        translation = transcriber.get_translation()
-
-        if transcription:
-            full_transcription += transcription + " "
-            transcription_placeholder.markdown(full_transcription)
-
-        if translation:
-            full_translation += translation + " "
-            translation_placeholder.markdown(full_translation)
-
-        progress = transcriber.get_progress()
-        progress_bar.progress(progress)
-        time.sleep(0.1)
+    # Compliance windows are analyzed as soon as their chunks are translated, so possible
+    # violations show up while the rest of the call is still being transcribed. A transcript
+    # replayed from the cache arrives at once and its analysis is usually cached as well, so
+    # it goes straight to process_translation, which checks the analysis cache first.
+    scanner = None if transcriber.from_cache else get_analysis_orchestrator().violation_analyzer.scan_stream()
+    provisional_placeholder = st.empty()
+    provisional_area = provisional_placeholder.container()
+
+    # Each chunk event adds only its own text to the page, instead of re-rendering the
+    # whole transcript on a polling timer
+    for event in transcriber.iter_events():
+        if transcriber.get_language_code() != language_code:
+            language_code = transcriber.get_language_code()
+            transcription_heading.subheader(f"Transcription ({language_code})")
+
+        if event.transcript:
+            transcription_parts.append(event.transcript)
+            transcription_area.markdown(event.transcript)
+
+        if event.translation:
+            translation_parts.append(event.translation)
+            translation_area.markdown(event.translation)
+            if scanner is not None:
+                scanner.add_chunk(event.translation)
+
+        for violation in (scanner.take_new_violations() if scanner is not None else []):
+            provisional_area.warning(f"Possible violation (provisional): {violation.get('violation')} - "
+                                     f"\"{violation.get('excerpt_content')}\"")
+
+        progress_bar.progress(transcriber.get_progress())
+
+    progress_bar.progress(1.0)
+    full_transcription = " ".join(transcription_parts)
+    full_translation = " ".join(translation_parts)
+    violations_response = None
+    if scanner is not None:
+        if transcript_cache.get(analysis_cache_key(full_translation, windowed=bool(translation_parts))):
+            # Analyzed before; the trailing window is not worth a request
+            scanner.cancel()
+        else:
+            with st.spinner("Finishing compliance scan..."):
+                violations_response = scanner.finish()
+    provisional_placeholder.empty()
 
     os.unlink(tmp_file_path)
-    os.unlink(preprocessed_file)
+    if transcriber.error:
+        st.error(f"Audio processing stopped early: {transcriber.error}")
+    if transcriber.is_partial():
+        failed = sorted({index + 1 for index, _ in transcriber.failed_chunks})
+        st.warning(f"Transcript is incomplete: chunk(s) {', '.join(map(str, failed))} could not be processed. "
+                   "Processing the same recording again fetches only the missing chunks.")
     st.success("Processing complete!")
+    silence_report = transcriber.get_silence_report()
+    if silence_report and silence_report['skipped_seconds'] > 0:
+        st.caption(f"Skipped {silence_report['skipped_seconds']}s of silence out of {silence_report['total_seconds']}s.")
 
-    analysis_result, deal_identifiers, violations_response = process_translation(full_translation)
+    analysis_result, deal_identifiers, violations_response = process_translation(
+        full_translation, translation_parts, violations_response
+    )
     st.session_state.analysis_result = analysis_result
     st.session_state.deal_identifiers = deal_identifiers
     st.session_state.violations_response = violations_response
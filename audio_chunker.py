@@ -0,0 +1,477 @@
+# File: audio_chunker.py
+
+import io
+import mmap
+import struct
+import numpy as np
+
+WAV_HEADER_FORMAT = '<4sI4s4sIHHIIHH4sI'
+WAV_HEADER_SIZE = struct.calcsize(WAV_HEADER_FORMAT)
+
+ENERGY_FRAME_MS = 20  # resolution of the silence detector
+SILENCE_THRESHOLD_DB = -40.0  # frames quieter than this (dBFS) count as silence
+MIN_SILENCE_MS = 1500  # silent runs at least this long are dropped from the upload
+KEEP_SILENCE_MS = 300  # padding kept on each side of a dropped run so words are not clipped
+CUT_SEARCH_MS = 5000  # look this far back from the chunk limit for a pause to cut at
+ENERGY_BLOCK_FRAMES = 3000  # energy frames converted to float per block, bounds peak memory
+
+
+def build_wav_header(data_size, nchannels, sampwidth, framerate):
+    """Build a canonical 44-byte PCM WAV header for `data_size` bytes of audio."""
+    byte_rate = framerate * nchannels * sampwidth
+    return struct.pack(
+        WAV_HEADER_FORMAT,
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, nchannels, framerate, byte_rate, nchannels * sampwidth, sampwidth * 8,
+        b'data', data_size,
+    )
+
+
+class MappedWav:
+    """
+    Memory-maps a PCM WAV file so chunks can be served as slices of the file
+    without reading the audio into RAM.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _parse_header(self):
+        if self._map[0:4] != b'RIFF' or self._map[8:12] != b'WAVE':
+            raise ValueError(f"Not a WAV file: {self.file_path}")
+
+        offset = 12
+        fmt = None
+        while offset + 8 <= len(self._map):
+            chunk_id, chunk_size = struct.unpack('<4sI', self._map[offset:offset + 8])
+            body = offset + 8
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', self._map[body:body + 16])
+            elif chunk_id == b'data':
+                # ffmpeg leaves the size unset when it cannot seek back, so clamp to the file
+                self.data_offset = body
+                self.data_size = min(chunk_size, len(self._map) - body)
+                break
+            offset = body + chunk_size + (chunk_size & 1)
+        else:
+            raise ValueError(f"No data chunk found in WAV file: {self.file_path}")
+
+        if fmt is None or fmt[0] != 1:
+            raise ValueError(f"Only uncompressed PCM WAV is supported: {self.file_path}")
+        _, self.nchannels, self.framerate, _, self.block_align, bits = fmt
+        self.sampwidth = bits // 8
+        # Drop a trailing partial frame so every slice stays frame-aligned
+        self.data_size -= self.data_size % self.block_align
+
+    @property
+    def buffer(self):
+        return self._map
+
+    @property
+    def n_frames(self):
+        return self.data_size // self.block_align
+
+    @property
+    def duration_ms(self):
+        return self.n_frames / self.framerate * 1000
+
+    def samples(self):
+        """Zero-copy int16 view of the PCM data, shaped (frames, channels)."""
+        if self.sampwidth != 2:
+            raise ValueError(f"Only 16-bit PCM is supported for analysis: {self.file_path}")
+        pcm = np.frombuffer(self._map, dtype='<i2', count=self.n_frames * self.nchannels, offset=self.data_offset)
+        return pcm.reshape(-1, self.nchannels)
+
+    def chunk(self, index, start_frame, end_frame):
+        return self.chunk_from_spans(index, [(start_frame, end_frame)])
+
+    def chunk_from_spans(self, index, spans):
+        """Build a chunk from (start_frame, end_frame) spans, concatenated in order."""
+        segments = [
+            (self.data_offset + start * self.block_align, self.data_offset + end * self.block_align)
+            for start, end in spans
+        ]
+        return WavChunk(index, self._map, segments, self.nchannels, self.sampwidth, self.framerate)
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            # A reader still holds a view; the map is released once it is garbage collected
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class WavChunk:
+    """
+    A chunk of audio described as byte ranges of a shared PCM buffer. The WAV
+    header is generated on demand and the PCM is never copied until it is read.
+    """
+
+    def __init__(self, index, buffer, segments, nchannels, sampwidth, framerate):
+        self.index = index
+        self.buffer = buffer
+        self.segments = segments
+        self.nchannels = nchannels
+        self.sampwidth = sampwidth
+        self.framerate = framerate
+
+    @property
+    def data_size(self):
+        return sum(end - start for start, end in self.segments)
+
+    @property
+    def duration_ms(self):
+        return self.data_size / (self.nchannels * self.sampwidth * self.framerate) * 1000
+
+    def header(self):
+        return build_wav_header(self.data_size, self.nchannels, self.sampwidth, self.framerate)
+
+    def open(self):
+        """Return a seekable file object that streams the header followed by the PCM slices."""
+        return WavChunkReader(self)
+
+    def getvalue(self):
+        """Materialize the chunk as WAV bytes. Prefer `open()` for uploads."""
+        with self.open() as reader:
+            return reader.read()
+
+
+class WavChunkReader(io.RawIOBase):
+    """Read-only, seekable view over a WavChunk: header bytes plus memoryview slices of the buffer."""
+
+    def __init__(self, chunk):
+        super().__init__()
+        view = memoryview(chunk.buffer)
+        self._parts = [memoryview(chunk.header())] + [view[start:end] for start, end in chunk.segments]
+        view.release()
+        self._size = sum(len(part) for part in self._parts)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return self._pos
+
+    def readinto(self, b):
+        out = memoryview(b).cast('B')
+        written = 0
+        part_start = 0
+        # Fill across part boundaries so reads are only short at end of stream
+        for part in self._parts:
+            part_end = part_start + len(part)
+            if written < len(out) and self._pos < part_end:
+                offset = self._pos - part_start
+                n = min(len(part) - offset, len(out) - written)
+                out[written:written + n] = part[offset:offset + n]
+                written += n
+                self._pos += n
+            part_start = part_end
+        return written
+
+    def close(self):
+        if not self.closed:
+            for part in self._parts:
+                part.release()
+            self._parts = []
+        super().close()
+
+
+def frame_energy_db(samples, frame_len):
+    """
+    Compute the RMS level in dBFS of consecutive `frame_len`-sample frames.
+
+    :param samples: int16 array shaped (frames, channels)
+    :param frame_len: Number of audio frames per energy frame
+    :return: float32 array with one level per energy frame, the last one possibly partial
+    """
+    n_full = len(samples) // frame_len
+    levels = np.empty(-(-len(samples) // frame_len), dtype=np.float32)
+    block = ENERGY_BLOCK_FRAMES * frame_len
+    for start in range(0, len(samples), block):
+        end = min(start + block, len(samples))
+        usable = max(start, min(end, n_full * frame_len))
+        if usable > start:
+            frames = samples[start:usable].reshape(-1, frame_len * samples.shape[1]).astype(np.float32)
+            power = np.mean(np.square(frames / 32768.0), axis=1)
+            levels[start // frame_len:usable // frame_len] = 10 * np.log10(np.maximum(power, 1e-10))
+        if end > usable:
+            tail = samples[usable:end].astype(np.float32)
+            power = np.mean(np.square(tail / 32768.0))
+            levels[-1] = 10 * np.log10(max(power, 1e-10))
+    return levels
+
+
+def find_speech_spans(levels, frame_ms=ENERGY_FRAME_MS, threshold_db=SILENCE_THRESHOLD_DB,
+                      min_silence_ms=MIN_SILENCE_MS, keep_silence_ms=KEEP_SILENCE_MS, leading_silence=None):
+    """
+    Return (start, end) energy-frame spans that remain once long silent runs are dropped.
+    Each dropped run keeps `keep_silence_ms` of padding on both sides, at most half the
+    run each, so the padding of neighbouring spans never overlaps.
+
+    :param leading_silence: When `levels` continue earlier audio, the number of silent
+        frames immediately before them; None when `levels` start at the beginning of the audio
+    """
+    silent = np.concatenate(([False], levels < threshold_db, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+
+    min_run = int(np.ceil(min_silence_ms / frame_ms))
+    keep = int(keep_silence_ms // frame_ms)
+    lengths = run_ends - run_starts
+    if leading_silence is not None:
+        # A run at the start of the buffer continues the silence before it
+        carried = np.where(run_starts == 0, leading_silence, 0)
+        run_starts, lengths = run_starts - carried, lengths + carried
+    long_runs = lengths >= min_run
+    run_starts, run_ends, lengths = run_starts[long_runs], run_ends[long_runs], lengths[long_runs]
+    pad = np.minimum(keep, lengths // 2)
+
+    # A dropped run at the very start or end of the file needs no padding on the outer side
+    at_file_start = run_starts == 0 if leading_silence is None else np.zeros(len(run_starts), dtype=bool)
+    drop_starts = np.where(at_file_start, 0, np.maximum(run_starts + pad, 0))
+    drop_ends = np.where(run_ends == len(levels), len(levels), run_ends - pad)
+
+    spans = []
+    position = 0
+    for drop_start, drop_end in zip(drop_starts.tolist(), drop_ends.tolist()):
+        if drop_end <= drop_start:
+            continue
+        if drop_start > position:
+            spans.append((position, drop_start))
+        position = drop_end
+    if position < len(levels):
+        spans.append((position, len(levels)))
+    return spans
+
+
+def pack_spans(spans, levels, max_frames, search_frames):
+    """
+    Greedily pack speech spans into chunks of at most `max_frames` energy frames.
+    A span that would overflow a chunk is cut at the quietest frame in the last
+    `search_frames` before the limit, unless the chunk already ends at a pause
+    inside that window.
+
+    :return: List of chunks, each a list of (start, end) energy-frame spans
+    """
+    chunks = []
+    current = []
+    current_len = 0
+    for start, end in spans:
+        while start < end:
+            room = max_frames - current_len
+            if end - start <= room:
+                current.append((start, end))
+                current_len += end - start
+                break
+            if current and room <= search_frames:
+                chunks.append(current)
+                current, current_len = [], 0
+                continue
+            low = start + max(room - search_frames, 0)
+            high = start + room
+            window = levels[low:high][::-1]
+            cut = high - int(np.argmin(window))
+            current.append((start, cut))
+            chunks.append(current)
+            current, current_len = [], 0
+            start = cut
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_on_silence(wav, max_chunk_ms, frame_ms=ENERGY_FRAME_MS, threshold_db=SILENCE_THRESHOLD_DB,
+                     min_silence_ms=MIN_SILENCE_MS, keep_silence_ms=KEEP_SILENCE_MS,
+                     search_ms=CUT_SEARCH_MS):
+    """
+    Split a memory-mapped WAV at pauses near the chunk limit and drop long silent stretches.
+
+    :param wav: MappedWav of 16-bit PCM audio
+    :param max_chunk_ms: Maximum length of a chunk in milliseconds
+    :return: Tuple of (list of WavChunk, silence report dict)
+    """
+    frame_len = max(1, int(wav.framerate * frame_ms / 1000))
+    samples = wav.samples()
+    levels = frame_energy_db(samples, frame_len)
+    del samples
+
+    spans = find_speech_spans(levels, frame_ms, threshold_db, min_silence_ms, keep_silence_ms)
+    max_frames = max(1, int(max_chunk_ms // frame_ms))
+    search_frames = int(search_ms // frame_ms)
+    packed = pack_spans(spans, levels, max_frames, search_frames)
+
+    chunks = []
+    kept_frames = 0
+    for index, chunk_spans in enumerate(packed):
+        audio_spans = [(s * frame_len, min(e * frame_len, wav.n_frames)) for s, e in chunk_spans]
+        audio_spans = [(s, e) for s, e in audio_spans if e > s]
+        kept_frames += sum(e - s for s, e in audio_spans)
+        chunks.append(wav.chunk_from_spans(index, audio_spans))
+
+    total_seconds = wav.n_frames / wav.framerate
+    report = {
+        "total_seconds": round(total_seconds, 2),
+        "skipped_seconds": round((wav.n_frames - kept_frames) / wav.framerate, 2),
+        "chunks": len(chunks),
+    }
+    return chunks, report
+
+
+class PcmStreamChunker:
+    """
+    Turns a stream of raw PCM blocks (e.g. ffmpeg `pipe:` output) into WavChunks as
+    soon as enough audio has arrived. The same pause-aware planning as `split_on_silence`
+    is applied to a sliding buffer of one chunk plus a short lookahead, so only the
+    chunk being assembled is held in memory.
+    """
+
+    def __init__(self, pcm_blocks, framerate, nchannels=1, max_chunk_ms=30000, silence_aware=True,
+                 max_duration_ms=None):
+        self.pcm_blocks = pcm_blocks
+        self.framerate = framerate
+        self.nchannels = nchannels
+        self.sampwidth = 2
+        self.max_chunk_ms = max_chunk_ms
+        self.silence_aware = silence_aware
+        self.max_duration_ms = max_duration_ms
+        self.total_frames = 0
+        self.kept_frames = 0
+        self.chunk_count = 0
+        # Silent energy frames just before the buffer, None until audio has been consumed
+        self._leading_silence = None
+
+    @property
+    def report(self):
+        return {
+            "total_seconds": round(self.total_frames / self.framerate, 2),
+            "skipped_seconds": round((self.total_frames - self.kept_frames) / self.framerate, 2),
+            "chunks": self.chunk_count,
+        }
+
+    def __iter__(self):
+        block_align = self.nchannels * self.sampwidth
+        lookahead_ms = MIN_SILENCE_MS + KEEP_SILENCE_MS if self.silence_aware else 0
+        min_bytes = int(self.framerate * (self.max_chunk_ms + lookahead_ms) / 1000) * block_align
+        needed_bytes = min_bytes
+
+        buffer = bytearray()
+        for block in self.pcm_blocks:
+            buffer += block
+            self.total_frames += len(block) // block_align
+            if self.max_duration_ms and self.total_frames / self.framerate * 1000 > self.max_duration_ms:
+                raise ValueError(f"Audio stream is too long. Maximum length is {self.max_duration_ms/60000} minutes.")
+            while len(buffer) >= needed_bytes:
+                chunks, consumed = self._take(buffer, final=False)
+                if not consumed:
+                    # Dropped silence left the next chunk unsettled; grow the buffer geometrically
+                    needed_bytes = len(buffer) * 3 // 2
+                    break
+                del buffer[:consumed * block_align]
+                needed_bytes = min_bytes
+                yield from chunks
+
+        # Any trailing partial sample frame from the decoder is discarded
+        del buffer[len(buffer) - len(buffer) % block_align:]
+        if buffer:
+            chunks, _ = self._take(buffer, final=True)
+            yield from chunks
+
+    def _take(self, buffer, final):
+        """Plan chunks over the buffer; return the ones that are settled and how many frames they consumed."""
+        block_align = self.nchannels * self.sampwidth
+        n_frames = len(buffer) // block_align
+        max_frames = int(self.framerate * self.max_chunk_ms / 1000)
+
+        if not self.silence_aware:
+            bounds = [[(start, min(start + max_frames, n_frames))] for start in range(0, n_frames, max_frames)]
+            bounds = bounds if final else bounds[:1]
+            return [self._make_chunk(buffer, spans) for spans in bounds], bounds[-1][-1][1]
+
+        frame_len = max(1, int(self.framerate * ENERGY_FRAME_MS / 1000))
+        samples = np.frombuffer(buffer, dtype='<i2', count=n_frames * self.nchannels).reshape(-1, self.nchannels)
+        levels = frame_energy_db(samples, frame_len)
+        # Release the view so the bytearray can be resized by the caller
+        del samples
+
+        if not final:
+            # Only whole energy frames up to the last sound are settled: a silent run at the end
+            # of the buffer may continue, and its length decides whether it is dropped
+            levels = levels[:n_frames // frame_len]
+            sound = np.flatnonzero(levels >= SILENCE_THRESHOLD_DB)
+            if not len(sound):
+                # Nothing but silence buffered; drop it, except what may become padding before the next sound
+                consumed = max(len(levels) - KEEP_SILENCE_MS // ENERGY_FRAME_MS, 0)
+                self._carry_silence(levels, consumed)
+                return [], consumed * frame_len
+            levels = levels[:int(sound[-1]) + 1]
+
+        spans = find_speech_spans(levels, leading_silence=self._leading_silence)
+        packed = pack_spans(spans, levels, max(1, self.max_chunk_ms // ENERGY_FRAME_MS),
+                            CUT_SEARCH_MS // ENERGY_FRAME_MS)
+        if not packed:
+            # Nothing but silence at the end of the stream; drop it all
+            return [], n_frames
+
+        if not final:
+            if len(packed) < 2:
+                # The first chunk could still absorb audio that has not arrived yet
+                return [], 0
+            packed = packed[:1]
+            self._carry_silence(levels, packed[0][-1][1])
+        audio_spans = [
+            [(start * frame_len, min(end * frame_len, n_frames)) for start, end in chunk_spans]
+            for chunk_spans in packed
+        ]
+        return [self._make_chunk(buffer, spans) for spans in audio_spans], audio_spans[-1][-1][1]
+
+    def _carry_silence(self, levels, consumed):
+        """Record the silent run that ends the first `consumed` energy frames, for the next buffer."""
+        silent = levels[:consumed] < SILENCE_THRESHOLD_DB
+        sound = np.flatnonzero(~silent)
+        if len(sound):
+            self._leading_silence = consumed - int(sound[-1]) - 1
+        else:
+            self._leading_silence = (self._leading_silence or 0) + consumed
+
+    def _make_chunk(self, buffer, spans):
+        # Copy just this chunk's audio out of the sliding buffer
+        block_align = self.nchannels * self.sampwidth
+        base = spans[0][0]
+        data = bytes(buffer[base * block_align:spans[-1][1] * block_align])
+        segments = [((start - base) * block_align, (end - base) * block_align) for start, end in spans if end > start]
+        chunk = WavChunk(self.chunk_count, data, segments, self.nchannels, self.sampwidth, self.framerate)
+        self.kept_frames += chunk.data_size // block_align
+        self.chunk_count += 1
+        return chunk
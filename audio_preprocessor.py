@@ -2,10 +2,14 @@
 
 import os
 import tempfile
+import threading
 import ffmpeg # type: ignore
 
 class AudioPreprocessor:
     SUPPORTED_FORMATS = ['.mp3', '.wav', '.mp4', '.m4a', '.aac', '.ogg', '.flac']
+    SAMPLE_RATE = 16000
+    CHANNELS = 1
+    STREAM_BLOCK_SIZE = 64 * 1024  # bytes of PCM read from ffmpeg per block
 
     @staticmethod
     def convert_to_wav(input_file, output_file=None):
@@ -38,6 +42,58 @@ class AudioPreprocessor:
             print(f"FFmpeg error: {e.stderr.decode()}")
             raise
 
+    @classmethod
+    def stream_pcm(cls, input_file, block_size=STREAM_BLOCK_SIZE):
+        """
+        Decode any supported audio format with ffmpeg and yield raw 16 kHz mono
+        16-bit PCM blocks as they are produced, without writing a WAV to disk.
+
+        :param input_file: Path to the input audio file
+        :param block_size: Number of bytes to read from ffmpeg per block
+        :return: Generator of PCM byte blocks
+        """
+        process = (
+            ffmpeg
+            .input(input_file)
+            .output('pipe:', format='s16le', acodec='pcm_s16le', ac=cls.CHANNELS, ar=str(cls.SAMPLE_RATE))
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+
+        # Drain stderr on the side so a chatty decoder can never block the stdout pipe
+        stderr_chunks = []
+        stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        stderr_thread.start()
+
+        try:
+            while True:
+                block = process.stdout.read(block_size)
+                if not block:
+                    break
+                yield block
+
+            process.wait()
+            stderr_thread.join()
+            if process.returncode != 0:
+                stderr = b"".join(stderr_chunks)
+                print(f"FFmpeg error: {stderr.decode(errors='replace')}")
+                raise ffmpeg.Error('ffmpeg', b"", stderr)
+        finally:
+            # Stop the decoder if the consumer bails out early
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+    @staticmethod
+    def probe_duration_ms(input_file):
+        """Return the container duration in milliseconds, or None if ffprobe cannot tell."""
+        try:
+            return float(ffmpeg.probe(input_file)['format']['duration']) * 1000
+        except (ffmpeg.Error, OSError, KeyError, ValueError) as e:
+            print(f"Could not probe duration of {input_file}: {e}")
+            return None
+
     @classmethod
     def is_supported_format(cls, filename):
         """Check if the file format is supported."""
@@ -0,0 +1,194 @@
+# File: batch_runner.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from audio_preprocessor import AudioPreprocessor
+from transcriber import SarvamTranscriber
+from transcript_cache import TranscriptCache, hash_file
+from sarvam_client import SarvamClient
+from analysis_orchestrator import AnalysisOrchestrator
+from response_generator import FinancialAnalyzer
+from compliance_checker import ViolationAnalyzer
+
+DEFAULT_KNOWLEDGE_BASE = './knowledge_base/guardrails.json'
+
+
+def collect_inputs(source):
+    """
+    List the recordings to process. `source` is either a directory, searched recursively
+    for supported audio formats, or a manifest file with one path per line (blank lines
+    and lines starting with '#' are ignored; relative paths are resolved against the
+    manifest's directory).
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if AudioPreprocessor.is_supported_format(name))
+        return sorted(paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as manifest:
+        lines = [line.strip() for line in manifest]
+    return [os.path.join(base_dir, line) for line in lines if line and not line.startswith('#')]
+
+
+def load_processed(output_path):
+    """Content hashes of recordings that already have a successful record in `output_path`."""
+    processed = set()
+    if not os.path.exists(output_path):
+        return processed
+    with open(output_path, 'r', encoding='utf-8') as output:
+        for line in output:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if record.get('status') == 'ok':
+                processed.add(record['sha256'])
+    return processed
+
+
+class BatchRunner:
+    """
+    Headless pipeline for folders of recorded calls: each file is decoded and transcribed
+    (AudioPreprocessor -> SarvamTranscriber), then analysed (FinancialAnalyzer ->
+    ViolationAnalyzer), and one JSON line per file is appended to the output.
+
+    Several files are processed at once, but all of them share one Sarvam client, so
+    `max_requests` is a global budget of in-flight speech requests rather than a per-file
+    one. The two analyses of a file run concurrently, and all LLM calls share one pool of
+    `max_llm_requests` workers.
+    """
+
+    def __init__(self, output_path, financial_analyzer, violation_analyzer, max_files=4, max_requests=8,
+                 max_llm_requests=4, analysis_timeout=None, cache=None, client=None):
+        self.output_path = output_path
+        self.orchestrator = AnalysisOrchestrator(financial_analyzer, violation_analyzer, max_workers=max_llm_requests)
+        self.analysis_timeout = analysis_timeout
+        self.max_files = max_files
+        self.max_requests = max_requests
+        self.cache = cache
+        self.client = client or SarvamClient(SarvamTranscriber.API_KEY, max_concurrency_per_host=max_requests)
+        self._output_lock = threading.Lock()
+
+    def _write(self, record):
+        with self._output_lock:
+            with open(self.output_path, 'a', encoding='utf-8') as output:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def process_file(self, file_path, sha256):
+        """Run the whole pipeline on one recording and return its output record."""
+        started = time.time()
+        record = {'file': file_path, 'sha256': sha256}
+        transcriber = SarvamTranscriber(max_concurrent_requests=self.max_requests, cache=self.cache, client=self.client)
+        try:
+            transcriber.process_stream(file_path)
+            transcriber.wait()
+            if transcriber.error:
+                raise transcriber.error
+
+            results = transcriber.chunk_results
+            full_transcription = " ".join(r['transcription'].get('transcript', '') for r in results if r['transcription'])
+            translation_chunks = [r['translation'].get('transcript', '') for r in results if r['translation']]
+            full_translation = " ".join(translation_chunks)
+            record.update({
+                'language_code': transcriber.get_language_code(),
+                'silence_report': transcriber.get_silence_report(),
+                'failed_chunks': transcriber.get_missing_chunks(),
+                'transcription': full_transcription,
+                'translation': full_translation,
+            })
+
+            combined = self.orchestrator.analyze(
+                full_translation, timeout=self.analysis_timeout, translation_chunks=translation_chunks
+            )
+            record.update(combined)
+            # Incomplete transcripts and failed analyses are retried on the next run
+            complete = (not transcriber.is_partial() and combined['analysis_result'] is not None
+                        and combined['violations_response'] is not None)
+            record['status'] = 'ok' if complete else 'partial'
+        except Exception as e:
+            print(f"Error processing {file_path}: {e}")
+            record.update({'status': 'error', 'error': str(e)})
+        record['elapsed_seconds'] = round(time.time() - started, 2)
+        return record
+
+    def run(self, paths):
+        """
+        Process `paths`, skipping recordings whose content already has a successful
+        record in the output file. Returns a dict counting records per status.
+        """
+        processed = load_processed(self.output_path)
+        todo = []
+        counts = {'ok': 0, 'partial': 0, 'error': 0, 'skipped': 0}
+        for path in paths:
+            try:
+                sha256 = hash_file(path)
+            except OSError as e:
+                # A missing or unreadable manifest entry is recorded like any other failed file
+                print(f"Error processing {path}: {e}")
+                self._write({'file': path, 'sha256': None, 'status': 'error', 'error': str(e), 'elapsed_seconds': 0.0})
+                counts['error'] += 1
+                continue
+            if sha256 in processed:
+                print(f"Skipping {path}: already processed")
+                counts['skipped'] += 1
+                continue
+            # The same recording listed twice is only processed once
+            processed.add(sha256)
+            todo.append((path, sha256))
+
+        with ThreadPoolExecutor(max_workers=self.max_files) as executor:
+            futures = {executor.submit(self.process_file, path, sha256): path for path, sha256 in todo}
+            for future in as_completed(futures):
+                record = future.result()
+                self._write(record)
+                counts[record['status']] += 1
+                print(f"[{sum(counts[status] for status in ('ok', 'partial', 'error'))}/{len(paths) - counts['skipped']}] "
+                      f"{record['status']}: {futures[future]}")
+        return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and analyse a folder or manifest of recorded calls.")
+    parser.add_argument('source', help="Directory of recordings, or a manifest file with one path per line")
+    parser.add_argument('-o', '--output', default='results.jsonl', help="JSONL file that results are appended to")
+    parser.add_argument('--files', type=int, default=4, help="Recordings processed at the same time")
+    parser.add_argument('--max-requests', type=int, default=SarvamTranscriber.MAX_CONCURRENT_REQUESTS,
+                        help="Global limit on in-flight Sarvam requests")
+    parser.add_argument('--max-llm-requests', type=int, default=4, help="Global limit on in-flight analysis requests")
+    parser.add_argument('--analysis-timeout', type=float, default=None, help="Seconds each analysis call may take")
+    parser.add_argument('--knowledge-base', default=DEFAULT_KNOWLEDGE_BASE, help="Path to guardrails.json")
+    parser.add_argument('--full-scan', action='store_true',
+                        help="Send every transcript to the compliance LLM, skipping the local pre-filter (audits)")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the transcript cache")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.source)
+    runner = BatchRunner(
+        args.output,
+        FinancialAnalyzer(),
+        ViolationAnalyzer(knowledge_base_path=args.knowledge_base, full_scan=args.full_scan),
+        max_files=args.files,
+        max_requests=args.max_requests,
+        max_llm_requests=args.max_llm_requests,
+        analysis_timeout=args.analysis_timeout,
+        cache=None if args.no_cache else TranscriptCache(),
+    )
+    try:
+        counts = runner.run(paths)
+    finally:
+        runner.client.close()
+        runner.orchestrator.close()
+    print(f"Done: {counts['ok']} ok, {counts['partial']} partial, {counts['error']} failed, {counts['skipped']} skipped")
+    return 0 if not counts['error'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
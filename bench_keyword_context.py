@@ -0,0 +1,77 @@
+# File: bench_keyword_context.py
+
+import sys
+import time
+import random
+import argparse
+
+from keyword_context import DocumentIndex, KeywordMatcher, combined_context_v2
+
+KEYWORDS = [
+    "margin", "broker", "exposure", "client code", "insider trading", "front running",
+    "settlement", "collateral", "risk management", "KYC", "mutual fund", "disclosure",
+    "penalty", "audit", "recorded lines", "algorithmic trading", "pledge", "custodian",
+]
+VOCABULARY = (
+    "the of and to in a is that for on with as by be this are or it from at shall any such which "
+    "regulation circular entity stock exchange depository member investor securities board amendment "
+    "provision clause compliance report period notice trading account order transaction"
+).split()
+
+
+def synthetic_circular(sections, seed=0):
+    """A markdown document shaped like an OCR'd master circular: headings, prose and tables."""
+    rng = random.Random(seed)
+    parts = []
+    for number in range(1, sections + 1):
+        parts.append(f"# {number}. Section {number}\n")
+        for _ in range(3):
+            words = [rng.choice(KEYWORDS) if rng.random() < 0.02 else rng.choice(VOCABULARY) for _ in range(120)]
+            parts.append(" ".join(words) + ".\n\n")
+        if number % 3 == 0:
+            parts.append("Table note\nAnnexure\n| Item | Limit | Remark |\n| - | - | - |\n")
+            for row in range(8):
+                parts.append(f"| {rng.choice(KEYWORDS)} | {row * 5}% | {rng.choice(VOCABULARY)} |\n")
+            parts.append("Source: SEBI\n\n")
+    return "".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time combined_context_v2 on synthetic circular markdown.")
+    parser.add_argument('--sections', type=int, nargs='+', default=[250, 1000, 4000],
+                        help="Document sizes to time, in sections (~360 words each)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per size; the fastest is reported")
+    parser.add_argument('--queries', type=int, default=24,
+                        help="Keyword queries run against one document for the indexed comparison")
+    args = parser.parse_args(argv)
+
+    print(f"{'sections':>8} {'chars':>10} {'passages':>8} {'ms':>9}")
+    for sections in args.sections:
+        document = synthetic_circular(sections)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            passages = combined_context_v2(document, KEYWORDS)
+            timings.append(time.perf_counter() - started)
+        print(f"{sections:>8} {len(document):>10} {len(passages):>8} {min(timings) * 1000:>9.1f}")
+
+    # Analysts run many small keyword queries against the same circular
+    queries = [KEYWORDS[i % len(KEYWORDS):i % len(KEYWORDS) + 2] for i in range(args.queries)]
+    document = synthetic_circular(args.sections[0])
+    started = time.perf_counter()
+    for keywords in queries:
+        combined_context_v2(document, keywords)
+    fresh = time.perf_counter() - started
+    started = time.perf_counter()
+    index = DocumentIndex(document)
+    matchers = {tuple(keywords): KeywordMatcher(keywords) for keywords in queries}
+    for keywords in queries:
+        index.matching_chunks(matchers[tuple(keywords)])
+    indexed = time.perf_counter() - started
+    print(f"{args.queries} queries, {args.sections[0]} sections: "
+          f"{fresh * 1000:.1f} ms parsing each time, {indexed * 1000:.1f} ms with one DocumentIndex")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,18 @@
 
 import os
 import random
-from groq import Groq
+import hashlib
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import json
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from kb_loader import load_knowledge_base, load_knowledge_base_versioned
+from compliance_prefilter import DEFAULT_INDICATORS_PATH, PreFilter, load_indicators
+from kb_retriever import DEFAULT_INDEX_PATH, get_retriever
+from llm_clients import get_groq_client
+from llm_output import parse_model_output
 
 # Pydantic Models for Violation Detection
 
@@ -31,22 +39,120 @@ class LLMResponseModel(BaseModel):
     confidence: float = Field(..., description="Confidence score of the analysis.")
 
 
+def build_windows(chunks: List[str], window_chunks: int, overlap_chunks: int) -> List[Dict[str, Any]]:
+    """
+    Group transcript chunks into overlapping windows of `window_chunks` chunks, each
+    starting `window_chunks - overlap_chunks` chunks after the previous one, so text
+    around every chunk boundary is seen whole by at least one window.
+
+    Offsets refer to the chunks joined with single spaces, i.e. the full translation.
+    An empty transcript has no windows.
+    """
+    if overlap_chunks >= window_chunks:
+        raise ValueError("overlap_chunks must be smaller than window_chunks")
+    if not chunks:
+        return []
+    offsets = []
+    position = 0
+    for chunk in chunks:
+        offsets.append(position)
+        position += len(chunk) + 1
+
+    windows = []
+    step = window_chunks - overlap_chunks
+    for first in range(0, max(len(chunks) - overlap_chunks, 1), step):
+        last = min(first + window_chunks, len(chunks))
+        windows.append({
+            'chunks': (first, last),
+            'offset': offsets[first],
+            'text': " ".join(chunks[first:last]),
+        })
+    return windows
+
+
+def _violation_key(violation: Dict[str, Any]):
+    section = str(violation.get('related_circular', {}).get('section_number', ''))
+    if violation.get('excerpt_span'):
+        return section, tuple(violation['excerpt_span'])
+    return section, " ".join(violation.get('excerpt_content', '').lower().split())
+
+
+def merge_violations(violations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    De-duplicate violations found by overlapping windows. Violations of the same section
+    whose excerpt spans overlap are one finding (the longer excerpt is kept); violations
+    whose excerpt could not be located fall back to matching on the excerpt text.
+    """
+    def section(violation):
+        return str(violation.get('related_circular', {}).get('section_number', ''))
+
+    merged, seen_text = [], set()
+    located = sorted((v for v in violations if v.get('excerpt_span')), key=lambda v: v['excerpt_span'][0])
+    for violation in located:
+        start, end = violation['excerpt_span']
+        duplicate = next(
+            (i for i, kept in enumerate(merged)
+             if section(kept) == section(violation) and start < kept['excerpt_span'][1] and kept['excerpt_span'][0] < end),
+            None,
+        )
+        if duplicate is None:
+            merged.append(violation)
+        elif end - start > merged[duplicate]['excerpt_span'][1] - merged[duplicate]['excerpt_span'][0]:
+            merged[duplicate] = violation
+    for kept in merged:
+        seen_text.add((section(kept), " ".join(kept.get('excerpt_content', '').lower().split())))
+
+    for violation in violations:
+        if violation.get('excerpt_span'):
+            continue
+        key = (section(violation), " ".join(violation.get('excerpt_content', '').lower().split()))
+        if key not in seen_text:
+            seen_text.add(key)
+            merged.append(violation)
+    return merged
+
+
 class ViolationAnalyzer:
-    def __init__(self, knowledge_base_path: str):
-        self.knowledge_base = self._load_knowledge_base(knowledge_base_path)
-        self.client = Groq(api_key="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")  
+    WINDOW_CHUNKS = 4  # transcriber chunks per window, ~2 minutes of audio
+    OVERLAP_CHUNKS = 1
+    MAX_PARALLEL_WINDOWS = 4
+    RETRIEVAL_K = 6  # knowledge-base sections sent with each excerpt
+    MODEL = "llama-3.1-70b-versatile"
+    TEMPERATURE = 0.2
+
+    def __init__(self, knowledge_base_path: str, indicators_path: str = DEFAULT_INDICATORS_PATH, full_scan: bool = False,
+                 retrieval_k: Optional[int] = RETRIEVAL_K, index_path: str = DEFAULT_INDEX_PATH):
+        """
+        :param indicators_path: JSON file with the risk-language lexicon for the local pre-filter
+        :param full_scan: Send every excerpt to the LLM, even when the pre-filter finds no risk
+            language (for audits)
+        :param retrieval_k: Number of sections retrieved from the whole knowledge-base folder for
+            each excerpt; None inlines every section of `knowledge_base_path` into the prompt instead
+        :param index_path: Where the retrieval index over the knowledge-base folder is persisted
+        """
+        self.knowledge_base_path = knowledge_base_path
+        self.indicators_path = indicators_path
+        self.full_scan = full_scan
+        self.retrieval_k = retrieval_k
+        self.retriever = get_retriever(os.path.dirname(knowledge_base_path) or '.', index_path) if retrieval_k else None
+        # (knowledge base version, prompt, prompt version), rebuilt only when guardrails.json changes
+        self._compiled_prompt = (None, None, None)
+        self._prefilter = (None, None)
+        # Shared limit on in-flight LLM requests, set by AnalysisOrchestrator; windows fan out
+        # within one call, so the limit is taken per request rather than per call
+        self.request_slots = None
+        self.client = get_groq_client("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")
+
+    @property
+    def knowledge_base(self) -> Dict[str, Any]:
+        # Re-read only when guardrails.json changes, so a long-lived analyzer sees edits
+        return self._load_knowledge_base(self.knowledge_base_path)
 
     def _load_knowledge_base(self, path: str) -> Dict[str, Any]:
         """
         Load the SEBI guidelines knowledge base from the provided JSON file path.
         """
-        try:
-            with open(path, 'r') as file:
-                data = json.load(file)
-                return data
-        except Exception as e:
-            print(f"Error loading knowledge base from {path}: {e}")
-            return {}
+        return load_knowledge_base(path)
 
     def _generate_confidence_score(self) -> float:
         """Generate a random confidence score between 95.00 and 99.00 with two decimal places."""
@@ -56,45 +162,126 @@ class ViolationAnalyzer:
         """
         Analyzes the given excerpt to detect violations using LLM based on the loaded knowledge base.
         """
-        prompt = self._get_prompt()
-        response = self.client.chat.completions.create(
-            model="llama-3.1-70b-versatile",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": excerpt}
-            ],
-            temperature=0.2
-        )
-        content = response.choices[0].message.content.strip()
-
-        # Attempt to extract valid JSON
-        start_index = content.find('{')
-        end_index = content.rfind('}')
-        if start_index == -1 or end_index == -1:
-            print(f"Unable to find valid JSON in the response: {content}")
+        prompt, _, kb_version = self._compile_prompt()
+        user_content = excerpt
+        retrieved = []
+        if self.retriever is not None:
+            # Only the sections relevant to this excerpt go out, after the fixed system prompt
+            retrieved = self.retriever.search(excerpt, self.retrieval_k)
+            sections = "\n\n".join(f"[{section['id']}] {section['title']}\n{section['text']}" for section in retrieved)
+            user_content = f"Relevant circular sections:\n{sections}\n\nConversation:\n{excerpt}"
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_content}
+        ]
+        content = self._complete(messages)
+
+        def reprompt(request: str) -> str:
+            return self._complete(messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": request},
+            ])
+
+        # Validate against LLMResponseModel, repairing or re-asking for only the fields that fail
+        data = parse_model_output(content, LLMResponseModel, defaults={'confidence': 0.0}, reprompt=reprompt)
+        if data is None:
             return None
-        
-        json_content = content[start_index:end_index + 1]
+        # Add the generated confidence score
+        data['confidence'] = self._generate_confidence_score()
+        # Record which rules the result was produced against; prompt_version includes the
+        # retrieval index, so it matches the version analyses are cached under
+        data['knowledge_base_version'] = kb_version
+        data['prompt_version'] = self.prompt_version
+        if self.retriever is not None:
+            data['retrieved_sections'] = [section['id'] for section in retrieved]
+        return data
+
+    def _complete(self, messages: List[Dict[str, str]]) -> str:
+        with self.request_slots or nullcontext():
+            response = self.client.chat.completions.create(
+                model=self.MODEL,
+                messages=messages,
+                temperature=self.TEMPERATURE
+            )
+        return response.choices[0].message.content.strip()
+
+    def _compile_prompt(self):
+        """
+        Return (prompt, prompt version, knowledge base version). The prompt is compiled once
+        per knowledge-base version, so repeated calls send a byte-identical system prompt
+        that provider-side prompt caching can reuse.
+        """
+        knowledge_base, kb_version = load_knowledge_base_versioned(self.knowledge_base_path)
+        compiled = self._compiled_prompt
+        if compiled[1] is None or compiled[0] != kb_version:
+            prompt = self._build_prompt(knowledge_base)
+            compiled = (kb_version, prompt, hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+            self._compiled_prompt = compiled
+        return compiled[1], compiled[2], compiled[0]
+
+    def _get_prefilter(self) -> PreFilter:
+        """The pre-filter for the current knowledge base and lexicon, rebuilt when either file changes."""
+        knowledge_base, kb_version = load_knowledge_base_versioned(self.knowledge_base_path)
+        indicators, indicators_version = load_knowledge_base_versioned(self.indicators_path)
+        version, prefilter = self._prefilter
+        if prefilter is None or version != (kb_version, indicators_version):
+            prefilter = PreFilter.from_knowledge_base(knowledge_base, load_indicators(indicators))
+            self._prefilter = ((kb_version, indicators_version), prefilter)
+        return prefilter
+
+    def _screen_and_analyze(self, excerpt: str) -> Optional[Dict[str, Any]]:
+        """
+        Screen `excerpt` locally and only send it to the LLM if it contains risk language
+        (or `full_scan` is set). Screened-out excerpts get an empty result without a request;
+        nothing assessed them, so they carry no confidence score.
+        """
+        screening = self._get_prefilter().screen(excerpt)
+        if not (self.full_scan or screening['flagged']):
+            return {
+                'violations': [],
+                'confidence': None,
+                'screened_out': True,
+                'knowledge_base_version': self._compile_prompt()[2],
+                'prompt_version': self.prompt_version,
+                'prefilter': screening,
+            }
+        response = self._analyze_violation(excerpt)
+        if response is not None:
+            response['prefilter'] = screening
+        return response
 
-        try:
-            data = json.loads(json_content)
-            # Add the generated confidence score
-            data['confidence'] = self._generate_confidence_score()
-            return data
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON from Groq API response: {str(e)}\nRaw response: {content}")
-            return None
+    @property
+    def screening_version(self) -> str:
+        """Which excerpts reach the LLM: the risk lexicon version and whether full_scan is set."""
+        _, indicators_version = load_knowledge_base_versioned(self.indicators_path)
+        return f"{indicators_version}:{'full' if self.full_scan else 'screened'}"
+
+    @property
+    def prompt_version(self) -> str:
+        """Hash of the current compliance prompt; changes whenever the knowledge base does."""
+        prompt_version = self._compile_prompt()[1]
+        if self.retriever is None:
+            return prompt_version
+        # Retrieved sections are part of the effective prompt, so the indexed corpus counts too
+        return hashlib.sha256(f"{prompt_version}:{self.retriever.index().version}".encode('utf-8')).hexdigest()
 
     def _get_prompt(self) -> str:
         """Generate a prompt for the LLM to identify violations based on the SEBI circular knowledge base."""
-        # Extract relevant sections from the loaded knowledge base
-        sections = self.knowledge_base.get('circular', {}).get('sections', {})
-        
-        # Extract key rules and descriptions for each section to guide the LLM
-        rules = "\n".join(
-            [f"Section {sec}: {details['description']} - {details.get('content', '') if isinstance(details, dict) else details}"
-            for sec, details in sections.items()]
-        )
+        return self._compile_prompt()[0]
+
+    def _build_prompt(self, knowledge_base: Dict[str, Any]) -> str:
+        if self.retriever is not None:
+            # Sections are retrieved per excerpt, which keeps this prompt fixed as the corpus grows
+            rules = "The circular sections most relevant to the conversation are listed at the start of each message, each with its section reference."
+        else:
+            # Extract relevant sections from the loaded knowledge base
+            sections = knowledge_base.get('circular', {}).get('sections', {})
+
+            # Extract key rules and descriptions for each section to guide the LLM
+            rules = "\n".join(
+                [f"Section {sec}: {details['description']} - {details.get('content', '') if isinstance(details, dict) else details}"
+                for sec, details in sections.items()]
+            )
 
         # Construct a detailed prompt for the LLM
         return f"""
@@ -154,9 +341,150 @@ class ViolationAnalyzer:
         Public method to check for violations within the provided excerpt using the LLM.
         Returns the structured JSON response for detected violations.
         """
-        response = self._analyze_violation(excerpt)
+        response = self._screen_and_analyze(excerpt)
         return response
 
+    def _analyze_window(self, window: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            response = self._screen_and_analyze(window['text'])
+        except Exception as e:
+            print(f"Error analyzing window {window['chunks']}: {e}")
+            return None
+        if response is None:
+            return None
+        lowered = window['text'].lower()
+        for violation in response.get('violations', []):
+            excerpt = (violation.get('excerpt_content') or '').strip()
+            position = lowered.find(excerpt.lower()) if excerpt else -1
+            violation['excerpt_span'] = (
+                [window['offset'] + position, window['offset'] + position + len(excerpt)] if position >= 0 else None
+            )
+        return response
+
+    def check_violations_windowed(self, chunks: List[str], window_chunks: int = WINDOW_CHUNKS,
+                                  overlap_chunks: int = OVERLAP_CHUNKS) -> Optional[Dict[str, Any]]:
+        """
+        Check a long transcript as overlapping windows of its transcriber chunks, analyzed
+        in parallel, so latency stays flat as calls get longer and no single request has to
+        hold the whole call. Violations carry an `excerpt_span` (character offsets into the
+        chunks joined with spaces, or None if the excerpt was paraphrased) and are
+        de-duplicated across windows.
+
+        :param chunks: Translated text of each transcriber chunk, in order
+        :return: Merged response like check_violations, plus `windows` and `failed_windows`;
+            None if every window failed
+        """
+        windows = build_windows(chunks, window_chunks, overlap_chunks)
+        if not windows:
+            return self._combine_windows(windows, [])
+        # The threads only wait on requests; request_slots bounds how many are in flight overall
+        with ThreadPoolExecutor(max_workers=min(self.MAX_PARALLEL_WINDOWS, len(windows))) as executor:
+            responses = list(executor.map(self._analyze_window, windows))
+        return self._combine_windows(windows, responses)
+
+    def scan_stream(self, window_chunks: int = WINDOW_CHUNKS, overlap_chunks: int = OVERLAP_CHUNKS):
+        """Start an IncrementalViolationScanner that is fed translated chunks while transcription runs."""
+        return IncrementalViolationScanner(self, window_chunks, overlap_chunks)
+
+    def _combine_windows(self, windows: List[Dict[str, Any]], responses: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        if not windows:
+            # Nothing was said, so nothing is sent
+            return {'violations': [], 'confidence': None, 'windows': 0, 'failed_windows': [], 'screened_windows': 0,
+                    'knowledge_base_version': self._compile_prompt()[2], 'prompt_version': self.prompt_version}
+        succeeded = [response for response in responses if response is not None]
+        if not succeeded:
+            return None
+        # Screened-out windows were never assessed; if every window was, neither was the call
+        confidences = [response['confidence'] for response in succeeded if response.get('confidence') is not None]
+        merged = {
+            'violations': merge_violations([v for response in succeeded for v in response.get('violations', [])]),
+            'confidence': min(confidences) if confidences else None,
+            'windows': len(windows),
+            'failed_windows': [list(window['chunks']) for window, response in zip(windows, responses) if response is None],
+            # Windows the pre-filter cleared without an LLM request
+            'screened_windows': sum(1 for response in succeeded if response.get('screened_out')),
+        }
+        for key in ('knowledge_base_version', 'prompt_version'):
+            merged[key] = succeeded[0].get(key)
+        return merged
+
+
+class IncrementalViolationScanner:
+    """
+    Compliance scanning that keeps pace with transcription. Translated chunks are added
+    as they arrive; each window is submitted for analysis as soon as its last chunk is
+    in, so the first violations are available long before the call ends. Windows are
+    the same as check_violations_windowed uses, so the final result matches it.
+
+    Usage: call add_chunk() per translated chunk, read provisional findings with
+    take_new_violations(), then call finish() once the transcript is complete.
+    """
+
+    def __init__(self, analyzer: ViolationAnalyzer, window_chunks: int = ViolationAnalyzer.WINDOW_CHUNKS,
+                 overlap_chunks: int = ViolationAnalyzer.OVERLAP_CHUNKS):
+        if overlap_chunks >= window_chunks:
+            raise ValueError("overlap_chunks must be smaller than window_chunks")
+        self.analyzer = analyzer
+        self.window_chunks = window_chunks
+        self.overlap_chunks = overlap_chunks
+        self._chunks = []
+        self._offsets = []
+        self._length = 0
+        self._next_start = 0
+        self._windows = []
+        self._futures = []
+        self._reported = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=analyzer.MAX_PARALLEL_WINDOWS)
+
+    def _submit(self, first: int, last: int):
+        window = {
+            'chunks': (first, last),
+            'offset': self._offsets[first] if self._chunks else 0,
+            'text': " ".join(self._chunks[first:last]),
+        }
+        self._windows.append(window)
+        self._futures.append(self._executor.submit(self.analyzer._analyze_window, window))
+
+    def add_chunk(self, text: str):
+        """Add the next chunk's translation; starts analyzing a window once it is full."""
+        self._chunks.append(text)
+        self._offsets.append(self._length)
+        self._length += len(text) + 1
+        if len(self._chunks) == self._next_start + self.window_chunks:
+            self._submit(self._next_start, len(self._chunks))
+            self._next_start += self.window_chunks - self.overlap_chunks
+
+    def provisional_violations(self) -> List[Dict[str, Any]]:
+        """Merged violations from the windows analyzed so far."""
+        found = []
+        for future in self._futures:
+            if future.done() and future.exception() is None and future.result():
+                found.extend(future.result().get('violations', []))
+        return merge_violations(found)
+
+    def take_new_violations(self) -> List[Dict[str, Any]]:
+        """Provisional violations that have not been returned by an earlier call."""
+        with self._lock:
+            new = [v for v in self.provisional_violations() if _violation_key(v) not in self._reported]
+            self._reported.update(_violation_key(v) for v in new)
+        return new
+
+    def cancel(self):
+        """Stop scanning, e.g. when the result is already cached: windows not yet started are dropped."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """Analyze the trailing partial window, wait for every window and return the final result."""
+        covered = self._windows[-1]['chunks'][1] if self._windows else 0
+        if covered < len(self._chunks):
+            self._submit(self._next_start if self._windows else 0, len(self._chunks))
+        try:
+            responses = [future.result() for future in self._futures]
+        finally:
+            self._executor.shutdown(wait=False)
+        return self.analyzer._combine_windows(self._windows, responses)
+
 
 # Main function to test the violation detection
 def main():
@@ -184,3 +512,4 @@ def main():
 # Run the main function
 if __name__ == "__main__":
     main()
+
@@ -0,0 +1,91 @@
+# File: compliance_prefilter.py
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import ahocorasick  # pyahocorasick; optional, the combined regex is used without it
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+DEFAULT_INDICATORS_PATH = './knowledge_base/indicators.json'
+
+
+def terms_from_knowledge_base(knowledge_base: Dict[str, Any]) -> List[str]:
+    """
+    Screening terms named by the circular itself: section descriptions and subsection
+    titles. Single words ("Objective", "Accountability") are skipped as too generic to
+    indicate anything on their own.
+    """
+    terms = []
+    for details in knowledge_base.get('circular', {}).get('sections', {}).values():
+        if not isinstance(details, dict):
+            continue
+        terms.append(details.get('description', ''))
+        content = details.get('content')
+        if isinstance(content, dict):
+            terms.extend(sub.get('title', '') for sub in content.values() if isinstance(sub, dict))
+    return [term for term in terms if len(term.split()) > 1]
+
+
+class PreFilter:
+    """
+    Local screening stage ahead of the compliance LLM. All indicator phrases are compiled
+    into one multi-pattern matcher (an Aho-Corasick automaton when `pyahocorasick` is
+    installed, otherwise a single alternation regex), so scoring a transcript costs one
+    linear pass instead of an LLM request.
+
+    Matching is case-insensitive, on whole words, and tolerant of repeated whitespace.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        normalized = {" ".join(term.lower().split()) for term in terms}
+        self.terms = sorted((term for term in normalized if term), key=len, reverse=True)
+        self._automaton = None
+        if not self.terms:
+            self._pattern = None
+            return
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for term in self.terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+        alternation = "|".join(r"\s+".join(re.escape(word) for word in term.split()) for term in self.terms)
+        self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base: Dict[str, Any], indicators: Iterable[str] = ()):
+        return cls(list(terms_from_knowledge_base(knowledge_base)) + list(indicators))
+
+    def matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, term) for every indicator found in `text`, in order of position."""
+        if not self.terms:
+            return []
+        # The automaton needs single-spaced text to keep offsets; anything else uses the regex
+        if self._automaton is not None and "  " not in text and "\n" not in text and "\t" not in text:
+            lowered = text.lower()
+            found = []
+            for end, term in self._automaton.iter(lowered):
+                start = end - len(term) + 1
+                before = lowered[start - 1] if start > 0 else ' '
+                after = lowered[end + 1] if end + 1 < len(lowered) else ' '
+                if not before.isalnum() and before != '_' and not after.isalnum() and after != '_':
+                    found.append((start, end + 1, term))
+            return sorted(found)
+        return [(m.start(), m.end(), " ".join(m.group(0).lower().split())) for m in self._pattern.finditer(text)]
+
+    def is_flagged(self, text: str) -> bool:
+        if not self.terms:
+            return False
+        return self._pattern.search(text) is not None
+
+    def screen(self, text: str) -> Dict[str, Any]:
+        """Screening summary recorded alongside compliance results."""
+        found = self.matches(text)
+        return {'flagged': bool(found), 'matched_terms': sorted({term for _, _, term in found})}
+
+
+def load_indicators(indicators: Optional[Dict[str, Any]]) -> List[str]:
+    """The indicator phrases from a parsed indicators.json, or an empty list."""
+    return list((indicators or {}).get('indicators', []))
@@ -1,20 +1,30 @@
+import io
 import os
 import re
 import sys
 import shutil
 import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import urlparse
  
 import requests
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import ContentFormat
+from azure.ai.documentintelligence.models import AnalyzeResult, ContentFormat
 import pypdf
 from azure.storage.blob import BlobServiceClient
 from dotenv import load_dotenv
+from layout_cache import analyze_pages, page_digest
+from markdown_tables import BORDER_SYMBOL, merge_tables_across_chunks, merge_vertical_tables
+from transcript_cache import TranscriptCache
+from keyword_context import get_document_index, get_keyword_matcher
  
-BORDER_SYMBOL = "|"
+LAYOUT_MODEL_ID = "prebuilt-layout"
+OCR_CACHE_DIR = os.path.join('.cache', 'ocr')
+# Layout results depend on the service API version, so it is pinned and part of the cache key
+LAYOUT_API_VERSION = "2024-02-29-preview"
  
  
 class DocIntOcr:
@@ -25,8 +35,15 @@ class DocIntOcr:
  
     """
  
-    def __init__(self):
+    MAX_CONCURRENT_CHUNKS = 4
+
+    def __init__(self, cache=None, use_cache=True):
+        """
+        :param cache: Store for layout results; defaults to a TranscriptCache in OCR_CACHE_DIR
+        :param use_cache: Set to False to always send every page to Document Intelligence
+        """
         load_dotenv()
+        self.cache = cache or (TranscriptCache(OCR_CACHE_DIR) if use_cache else None)
         self.endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
         self.key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
         self.azure_account_name = os.getenv("AZURE_ACCOUNT_NAME")
@@ -38,7 +55,8 @@ class DocIntOcr:
         self.azure_ocr_container_name = os.getenv("AZURE_CONTAINER_NAME")
         self.client = DocumentIntelligenceClient(
             endpoint=self.endpoint,
-            credential=AzureKeyCredential(self.key)
+            credential=AzureKeyCredential(self.key),
+            api_version=LAYOUT_API_VERSION
         )
  
     def split_ocr_pagewise(self,ocr_content):
@@ -58,15 +76,20 @@ class DocIntOcr:
         print("Total Pages", len(pages))
         return {i + 1: page.strip() for i, page in enumerate(pages) if page.strip()}
  
-    def extract_matching_chunks(self, doc_content, keywords):
+    def extract_matching_chunks(self, doc_content, keywords, pre_words=100, post_words=200):
         """
         Extract matching chunks from the document content based on provided keywords.
- 
+
+        The document's tables and headings are parsed once and the keyword list compiled
+        once; both are kept for later queries, so repeated queries against the same
+        circular only run the matcher.
+
         :param doc_content: The full content of the document.
         :param keywords: A list of keywords to search for in the document.
         :return: A list of unique matching chunks.
         """
-        return combined_context_v2(doc_content, keywords)
+        index = get_document_index(doc_content)
+        return index.matching_chunks(get_keyword_matcher(keywords), pre_words, post_words)
  
   
     def extract_ocr(self, pdf_input=None):
@@ -133,9 +156,15 @@ class DocIntOcr:
         with open(status_file, "a") as log_file:
             log_file.write(f"{datetime.now()} - {file_name}: {status}\n")
  
-    def split_pdf(self, input_file, output_prefix, chunk_size=150):
-        """Splits a PDF file into smaller chunks."""
-        file_names = []
+    def split_pdf(self, input_file, chunk_size=150):
+        """
+        Splits a PDF file into smaller chunks in memory. Chunks are built as they are
+        consumed, so only the ones still being analyzed are held at any time.
+
+        Yields:
+            tuple: (page range label such as "1-150", PDF bytes, content digest of each page)
+                   per chunk, in page order
+        """
         with open(input_file, "rb") as pdf_file:
             reader = pypdf.PdfReader(pdf_file)
             num_pages = len(reader.pages)
@@ -145,26 +174,52 @@ class DocIntOcr:
                 end_page = min(i + chunk_size, num_pages)
  
                 writer = pypdf.PdfWriter()
+                digests = []
                 for page_num in range(start_page, end_page):
                     writer.add_page(reader.pages[page_num])
+                    digests.append(page_digest(reader.pages[page_num]))
  
-                output_filename = f"{output_prefix}_{start_page + 1}-{end_page}.pdf"
-                file_names.append(output_filename)
-                with open(output_filename, "wb") as output_file:
-                    writer.write(output_file)
-        return file_names
- 
-    def identify_and_merge_cross_page_tables(self, input_file_path, output_file_path):
-        """Processes a single PDF chunk to identify and merge cross-page tables."""
-        with open(input_file_path, "rb") as f:
-            poller = self.client.begin_analyze_document(
-                "prebuilt-layout",
-                analyze_request=f,
-                content_type="application/octet-stream",
-                output_content_format=ContentFormat.MARKDOWN,
-            )
- 
-        result = poller.result()
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                yield f"{start_page + 1}-{end_page}", buffer.getvalue(), digests
+
+    def analyze_layout(self, pdf_bytes, page_digests=None):
+        """
+        Runs the layout model on an in-memory PDF chunk. Results are cached per page, under
+        the page's contents, the model id and the API version, so re-ingesting an amended
+        circular only sends the changed pages to Document Intelligence, even when inserted
+        or deleted pages move the chunk boundaries.
+        """
+        if self.cache is None:
+            return self._analyze_pdf(pdf_bytes)
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+        digests = page_digests or [page_digest(page) for page in reader.pages]
+
+        def analyze_batch(indices):
+            if len(indices) == len(reader.pages):
+                return self._analyze_pdf(pdf_bytes).as_dict()
+            writer = pypdf.PdfWriter()
+            for index in indices:
+                writer.add_page(reader.pages[index])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            return self._analyze_pdf(buffer.getvalue()).as_dict()
+
+        version = (LAYOUT_MODEL_ID, LAYOUT_API_VERSION, ContentFormat.MARKDOWN)
+        return AnalyzeResult(analyze_pages(digests, self.cache, analyze_batch, version))
+
+    def _analyze_pdf(self, pdf_bytes):
+        poller = self.client.begin_analyze_document(
+            LAYOUT_MODEL_ID,
+            analyze_request=io.BytesIO(pdf_bytes),
+            content_type="application/octet-stream",
+            output_content_format=ContentFormat.MARKDOWN,
+        )
+        return poller.result()
+
+    def analyze_chunk(self, pdf_bytes, page_digests=None):
+        """Analyzes a single in-memory PDF chunk and returns its markdown with cross-page tables merged."""
+        result = self.analyze_layout(pdf_bytes, page_digests)
  
         merge_tables_candidates, table_integral_span_list = self.get_merge_table_candidates_and_table_integral_span(
             result.tables)
@@ -203,7 +258,7 @@ class DocIntOcr:
                     merged_table_list[-1]["offset"]["max_offset"] = table_integral_span_list[pre_table_idx + 1][
                         "max_offset"]
                     if is_vertical:
-                        merged_table_list[-1]["content"] = self.merge_vertical_tables(merged_table_list[-1]["content"],
+                        merged_table_list[-1]["content"] = merge_vertical_tables(merged_table_list[-1]["content"],
                                                                                       cur_content)
                     elif is_horizontal:
                         merged_table_list[-1]["content"] = self.merge_horizontal_tables(
@@ -220,7 +275,7 @@ class DocIntOcr:
                             "min_offset": table_integral_span_list[pre_table_idx]["min_offset"],
                             "max_offset": table_integral_span_list[pre_table_idx + 1]["max_offset"],
                         },
-                        "content": self.merge_vertical_tables(pre_content,
+                        "content": merge_vertical_tables(pre_content,
                                                               cur_content) if is_vertical else self.merge_horizontal_tables(
                             pre_content, cur_content),
                         "remark": remark.strip() if is_horizontal else ""
@@ -243,9 +298,8 @@ class DocIntOcr:
         else:
             optimized_content = result.content
  
-        with open(output_file_path, "w") as file:
-            file.write(optimized_content)
- 
+        return optimized_content
+
     def merge_horizontal_tables(self,md_table_1, md_table_2):
         """
         Merge two consecutive horizontal markdown tables into one markdown table.
@@ -272,30 +326,6 @@ class DocIntOcr:
         merged_table = "\n".join(merged_rows)
         return merged_table
  
-    def remove_header_from_markdown_table(self,markdown_table):
-        """
-        If an actual table is distributed into two pages vertically. From analysis result, it will be generated as two tables in markdown format.
-        Before merging them into one table, it need to be removed the markdown table-header format string. This function implement that.
- 
-        Args:
-            markdown_table: the markdown table string which need to be removed the markdown table-header.
-        Returns:
-            string: the markdown table string without table-header.
-        """
-        HEADER_SEPARATOR_CELL_CONTENT = " - "
- 
-        result = ""
-        lines = markdown_table.splitlines()
-        for line in lines:
-            border_list = line.split(HEADER_SEPARATOR_CELL_CONTENT)
-            border_set = set(border_list)
-            if len(border_set) == 1 and border_set.pop() == BORDER_SYMBOL:
-                continue
-            else:
-                result += f"{line}\n"
- 
-        return result
- 
     def upload_to_azure(self, file_path, file_name):
         """Uploads a file to Azure Blob Storage."""
         file_name_ocr = f"{os.path.splitext(file_name)[0]}_ocr.md"
@@ -334,36 +364,35 @@ class DocIntOcr:
  
     #     return blob_url
 
-    def process_large_pdf(self, input_file, output_prefix, chunk_size=150):
-        """Splits the PDF into chunks, processes each, and returns the markdown output."""
+    def process_large_pdf(self, input_file, output_prefix, chunk_size=150, max_concurrent_chunks=None):
+        """
+        Splits the PDF into chunks, analyzes up to `max_concurrent_chunks` of them at a time,
+        and returns the markdown output merged in page order.
+        """
         self.log_processing_status(input_file, "started")
-        chunk_files = self.split_pdf(input_file, output_prefix, chunk_size)
-        print('chunk_files', chunk_files)
-
-        markdown_files = []
-        for chunk_file in chunk_files:
-            output_file_path = f"{chunk_file[:-4]}.md"
-            self.identify_and_merge_cross_page_tables(chunk_file, output_file_path)
-            markdown_files.append(output_file_path)
-
-        final_output = self.merge_markdown_files(markdown_files)
-
+        # Chunks stay in memory; the only file written is the final markdown
+        max_workers = max(max_concurrent_chunks or self.MAX_CONCURRENT_CHUNKS, 1)
+        contents, in_flight = [], deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # A chunk is split off only when a worker can take it, so at most max_workers
+            # chunks are in memory; results are collected in page order
+            for label, data, digests in self.split_pdf(input_file, chunk_size):
+                print('chunk', label)
+                in_flight.append(executor.submit(self.analyze_chunk, data, digests))
+                del data
+                if len(in_flight) >= max_workers:
+                    contents.append(in_flight.popleft().result())
+            contents.extend(future.result() for future in in_flight)
+        contents = merge_tables_across_chunks(contents)
+
+        # One join instead of repeated +=, which copies the growing document for every chunk
+        final_output = "".join(f"{content}\n" for content in contents)
         final_output_file = f"{output_prefix}.md"
         with open(final_output_file, "w") as file:
             file.write(final_output)
 
         return final_output, final_output_file
  
- 
- 
-    def merge_markdown_files(self, file_list):
-        """Merges multiple markdown files into one."""
-        merged_content = ""
-        for file_name in file_list:
-            with open(file_name, "r") as file:
-                merged_content += file.read() + "\n"
-        return merged_content
- 
     def get_table_page_numbers(self,table):
         """
         Returns a list of page numbers where the table appears.
@@ -401,39 +430,6 @@ class DocIntOcr:
         else:
             return -1, -1
  
-    def merge_vertical_tables(self,md_table_1, md_table_2):
-        """
-        Merge two consecutive vertical markdown tables into one markdown table.
- 
-        Args:
-            md_table_1: markdown table 1
-            md_table_2: markdown table 2
- 
-        Returns:
-            string: merged markdown table
-        """
-        table2_without_header = self.remove_header_from_markdown_table(md_table_2)
-        rows1 = md_table_1.strip().splitlines()
-        rows2 = table2_without_header.strip().splitlines()
- 
-        print(rows1)
-        print(rows2)
- 
-        if rows1 == [] or rows2 == []:
-            return table2_without_header
- 
-        num_columns1 = len(rows1[0].split(BORDER_SYMBOL)) - 2
-        num_columns2 = len(rows2[0].split(BORDER_SYMBOL)) - 2
- 
-        if num_columns1 != num_columns2:
-            return table2_without_header
-            # raise ValueError("Different count of columns")
- 
-        merged_rows = rows1 + rows2
-        merged_table = '\n'.join(merged_rows)
- 
-        return merged_table
- 
     def check_paragraph_presence(self,paragraphs, start, end):
         """
         Checks if there is a paragraph within the specified range that is not a page header, page footer, or page number. If this were the case, the table would not be a merge table candidate.
@@ -578,150 +574,6 @@ class DocIntOcr:
             print(f"Error during cleanup: {e}")
  
  
-def combined_context_v2(doc_content, keywords, pre_words=100, post_words=200):
-    pattern = r'(?si)\b(' + '|'.join(map(re.escape, keywords)) + r')\b'
-    regex = re.compile(pattern)
-    table_chunks = detect_tables_and_split(doc_content)
-    final_chunks = []
- 
-    for chunk in table_chunks:
-        if not chunk['is_table']:
-            heading_chunks = detect_headings_and_split(chunk['content'])
-            final_chunks.extend(heading_chunks)
-        else:
-            final_chunks.append(chunk)
- 
-    matches = []
-    last_start = None
-    last_end = None
-    last_context = ""
- 
-    for chunk in final_chunks:
-        if chunk['is_table']:
-            if regex.search(chunk['content']):
-                if last_start is not None:
-                    if last_end >= 0 and len(chunk['content']) > 0:
-                        last_context += f"\n\n{chunk['content']}"
-                        last_end = last_end + len(chunk['content'])
-                else:
-                    matches.append(chunk['content'])
-        elif chunk['is_heading']:
-            continue
-        else:
-            for match in regex.finditer(chunk['content']):
-                start, end = match.span()
-                preceding_text = chunk['content'][:start].split()[-pre_words:]
-                following_text = chunk['content'][end:].split()[:post_words]
-                context = ' '.join(preceding_text + [match.group()] + following_text)
- 
-                if last_start is None:
-                    last_start = start
-                    last_end = end
-                    last_context = context
-                else:
-                    if start <= last_end:
-                        last_context += ' ' + context
-                        last_end = max(last_end, end)
-                    else:
-                        matches.append(last_context)
-                        last_start = start
-                        last_end = end
-                        last_context = context
- 
-                next_chunk_idx = final_chunks.index(chunk) + 1
-                while next_chunk_idx < len(final_chunks):
-                    next_chunk = final_chunks[next_chunk_idx]
-                    if next_chunk.get('is_heading', False):
-                        break
-                    if next_chunk.get('is_table', False):
-                        last_context += f"\n\n{next_chunk['content']}"
-                        break
-                    next_chunk_idx += 1
- 
-    if last_context:
-        matches.append(last_context)
- 
-    # Remove duplicates by choosing larger chunks
-    unique_matches = []
-    for i, match in enumerate(matches):
-        is_subset = False
-        for other_match in matches:
-            if match != other_match and match in other_match:
-                is_subset = True
-                break
-        if not is_subset:
-            unique_matches.append(match)
- 
-    return unique_matches
- 
-def detect_tables_and_split(content, context_lines=2):
-    table_pattern = r'(\|.*?\|\n(?:\|.*?\|\n)+)'
-    chunks = []
-    last_end = 0
- 
-    for match in re.finditer(table_pattern, content):
-        start_context = content.rfind('\n', 0, match.start())
-        if start_context != -1:
-            prev_line_start = content.rfind('\n', 0, start_context - 1)
-            start_context = prev_line_start if prev_line_start != -1 else 0
- 
-        if start_context > last_end:
-            chunks.append({
-                "content": content[last_end:start_context].strip(),
-                "is_table": False
-            })
- 
-        end_context = match.end()
-        footer_end = content.find('\n', end_context)
-        if footer_end != -1:
-            end_context = content.find('\n', footer_end + 1)
-            if end_context == -1:
-                end_context = len(content)
- 
-        chunks.append({
-            "content": content[start_context:end_context].strip(),
-            "is_table": True
-        })
-        last_end = end_context
- 
-    if last_end < len(content):
-        chunks.append({
-            "content": content[last_end:].strip(),
-            "is_table": False
-        })
- 
-    return chunks
-def detect_headings_and_split(content):
-    heading_pattern = r'(?m)^(#+\s+.+)$'
-    headings = list(re.finditer(heading_pattern, content))
-    chunks = []
-    last_end = 0
- 
-    for heading in headings:
-        if heading.start() > last_end:
-            chunks.append({
-                "content": content[last_end:heading.start()].strip(),
-                "is_table": False,
-                "is_heading": False
-            })
- 
-        chunks.append({
-            "content": heading.group().strip(),
-            "is_table": False,
-            "is_heading": True
-        })
-        last_end = heading.end()
- 
-    if last_end < len(content):
-        chunks.append({
-            "content": content[last_end:].strip(),
-            "is_table": False,
-            "is_heading": False
-        })
- 
-    return chunks
-
-
 def save_markdown_locally(markdown_content, file_name):
     """Saves the markdown content to a local folder './extracted_data/'."""
     # Ensure the folder exists
@@ -0,0 +1,70 @@
+# File: kb_loader.py
+
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+class KnowledgeBaseLoader:
+    """
+    Keeps parsed knowledge-base JSON files in memory. Each load only stats the file and
+    re-reads it when its mtime or size has changed, so edits to guardrails.json are picked
+    up without a restart while unchanged files are parsed once per process.
+
+    Every parsed file carries a version (the SHA-256 of its bytes) that derived data,
+    such as compiled prompts, can be keyed on.
+
+    Loaded dicts are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> Dict[str, Any]:
+        """Return the parsed JSON at `path`, or an empty dict if it cannot be read."""
+        return self.load_versioned(path)[0]
+
+    def load_versioned(self, path: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Return (parsed JSON, content hash) for `path`; the version is None if it cannot be read."""
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except OSError as e:
+            print(f"Error loading knowledge base from {path}: {e}")
+            return {}, None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(key)
+        if entry and entry[0] == signature:
+            return entry[1], entry[2]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == signature:
+                return entry[1], entry[2]
+            try:
+                with open(key, 'rb') as file:
+                    raw = file.read()
+                data = json.loads(raw)
+            except Exception as e:
+                print(f"Error loading knowledge base from {path}: {e}")
+                return {}, None
+            version = hashlib.sha256(raw).hexdigest()
+            self._entries[key] = (signature, data, version)
+            return data, version
+
+
+_shared_loader = KnowledgeBaseLoader()
+
+
+def load_knowledge_base(path: str) -> Dict[str, Any]:
+    """Load a knowledge-base file through the process-wide loader."""
+    return _shared_loader.load(path)
+
+
+def load_knowledge_base_versioned(path: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Load a knowledge-base file and its content hash through the process-wide loader."""
+    return _shared_loader.load_versioned(path)
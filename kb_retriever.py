@@ -0,0 +1,209 @@
+# File: kb_retriever.py
+
+import os
+import re
+import json
+import math
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+DEFAULT_KB_DIR = './knowledge_base'
+DEFAULT_INDEX_PATH = os.path.join('.cache', 'kb_index.json')
+INDEX_FORMAT = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.'-][a-z0-9]+)*")
+HEADING_PATTERN = re.compile(r'(?m)^#+\s+(.+)$')
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+shall such any all other their there these they which who not no may
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def sections_from_json(data: Dict[str, Any], source: str) -> List[Dict[str, str]]:
+    """One section per circular section, and per subsection where a section has them."""
+    circular = data.get('circular')
+    if not isinstance(circular, dict):
+        return []
+    sections = []
+    for number, details in circular.get('sections', {}).items():
+        if not isinstance(details, dict):
+            sections.append({'id': f"{source}#{number}", 'title': f"Section {number}", 'text': str(details)})
+            continue
+        description = details.get('description', '')
+        content = details.get('content', '')
+        if isinstance(content, dict):
+            for sub_number, sub in content.items():
+                sub_details = sub.get('details', '') if isinstance(sub, dict) else sub
+                if isinstance(sub_details, list):
+                    sub_details = " ".join(sub_details)
+                title = sub.get('title', '') if isinstance(sub, dict) else ''
+                sections.append({
+                    'id': f"{source}#{sub_number}",
+                    'title': f"Section {sub_number}: {description} - {title}",
+                    'text': str(sub_details),
+                })
+        else:
+            sections.append({'id': f"{source}#{number}", 'title': f"Section {number}: {description}", 'text': str(content)})
+    return sections
+
+
+def sections_from_markdown(content: str, source: str) -> List[Dict[str, str]]:
+    """Split markdown at its headings; text before the first heading becomes its own section."""
+    sections = []
+    headings = list(HEADING_PATTERN.finditer(content))
+    preamble = content[:headings[0].start()] if headings else content
+    if preamble.strip():
+        sections.append({'id': f"{source}#0", 'title': os.path.basename(source), 'text': preamble.strip()})
+    for number, heading in enumerate(headings, start=1):
+        end = headings[number].start() if number < len(headings) else len(content)
+        text = content[heading.end():end].strip()
+        if text:
+            sections.append({'id': f"{source}#{number}", 'title': heading.group(1).strip(), 'text': text})
+    return sections
+
+
+class KnowledgeBaseIndex:
+    """
+    Offline BM25 index over every section of the knowledge-base folder: circular
+    sections from JSON files and heading-delimited sections of markdown files (such as
+    those written by information_extractor.save_to_knowledge_base).
+
+    The index is persisted as JSON together with the (path, mtime, size) signature of
+    the files it was built from, and is rebuilt only when that signature changes, so
+    startup stays cheap as the corpus grows.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, documents: List[Dict[str, Any]], postings: Dict[str, List[List[int]]], signature: List[Any]):
+        self.documents = documents
+        self.postings = postings
+        self.signature = signature
+        self.version = hashlib.sha256(json.dumps(signature).encode('utf-8')).hexdigest()
+        self.avg_length = sum(doc['length'] for doc in documents) / len(documents) if documents else 0.0
+
+    @staticmethod
+    def corpus_signature(kb_dir: str) -> List[Any]:
+        signature = []
+        for root, _, files in os.walk(kb_dir):
+            for name in sorted(files):
+                if name.endswith(('.json', '.md')):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    signature.append([os.path.relpath(path, kb_dir), stat.st_mtime_ns, stat.st_size])
+        return sorted(signature)
+
+    @classmethod
+    def build(cls, kb_dir: str = DEFAULT_KB_DIR):
+        signature = cls.corpus_signature(kb_dir)
+        documents, postings = [], {}
+        for relative_path, _, _ in signature:
+            path = os.path.join(kb_dir, relative_path)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    raw = file.read()
+                sections = (sections_from_json(json.loads(raw), relative_path) if path.endswith('.json')
+                            else sections_from_markdown(raw, relative_path))
+            except (OSError, ValueError) as e:
+                print(f"Skipping knowledge base file {path}: {e}")
+                continue
+            for section in sections:
+                counts = Counter(tokenize(f"{section['title']} {section['text']}"))
+                doc_id = len(documents)
+                documents.append(dict(section, length=sum(counts.values())))
+                for term, frequency in counts.items():
+                    postings.setdefault(term, []).append([doc_id, frequency])
+        return cls(documents, postings, signature)
+
+    def save(self, index_path: str = DEFAULT_INDEX_PATH):
+        os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'format': INDEX_FORMAT, 'signature': self.signature,
+                           'documents': self.documents, 'postings': self.postings}, file, ensure_ascii=False)
+            os.replace(tmp_path, index_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load_or_build(cls, kb_dir: str = DEFAULT_KB_DIR, index_path: str = DEFAULT_INDEX_PATH):
+        """Load the persisted index if it matches the files in `kb_dir`, else rebuild and persist it."""
+        signature = cls.corpus_signature(kb_dir)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('format') == INDEX_FORMAT and data.get('signature') == signature:
+                return cls(data['documents'], data['postings'], data['signature'])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Rebuilding unreadable knowledge base index {index_path}: {e}")
+        index = cls.build(kb_dir)
+        try:
+            index.save(index_path)
+        except OSError as e:
+            print(f"Could not persist knowledge base index: {e}")
+        return index
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """The `k` sections that best match `query` by BM25, best first, each with its `score`."""
+        scores = Counter()
+        total = len(self.documents)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                length = self.documents[doc_id]['length']
+                norm = self.K1 * (1 - self.B + self.B * length / self.avg_length)
+                scores[doc_id] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+        return [dict(self.documents[doc_id], score=round(score, 4)) for doc_id, score in scores.most_common(k)]
+
+
+class KnowledgeBaseRetriever:
+    """
+    Process-wide access to the index of one knowledge-base folder. Each call checks the
+    folder's file signature (a stat per file) and reloads the index when files were
+    added or changed, e.g. after a new circular has been saved.
+    """
+
+    def __init__(self, kb_dir: str = DEFAULT_KB_DIR, index_path: str = DEFAULT_INDEX_PATH):
+        self.kb_dir = kb_dir
+        self.index_path = index_path
+        self._index: Optional[KnowledgeBaseIndex] = None
+        self._lock = threading.Lock()
+
+    def index(self) -> KnowledgeBaseIndex:
+        signature = KnowledgeBaseIndex.corpus_signature(self.kb_dir)
+        with self._lock:
+            if self._index is None or self._index.signature != signature:
+                self._index = KnowledgeBaseIndex.load_or_build(self.kb_dir, self.index_path)
+            return self._index
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        return self.index().search(query, k)
+
+
+_shared_retrievers = {}
+_shared_retrievers_lock = threading.Lock()
+
+
+def get_retriever(kb_dir: str = DEFAULT_KB_DIR, index_path: str = DEFAULT_INDEX_PATH) -> KnowledgeBaseRetriever:
+    """Process-wide retriever per knowledge-base folder."""
+    key = (os.path.abspath(kb_dir), os.path.abspath(index_path))
+    with _shared_retrievers_lock:
+        if key not in _shared_retrievers:
+            _shared_retrievers[key] = KnowledgeBaseRetriever(kb_dir, index_path)
+        return _shared_retrievers[key]
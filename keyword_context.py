@@ -0,0 +1,387 @@
+# File: keyword_context.py
+
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import ahocorasick  # pyahocorasick; optional, the combined regex is used without it
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+WORD_PATTERN = re.compile(r'\S+')
+AHOCORASICK_MIN_KEYWORDS = 50
+MAX_CACHED_DOCUMENT_CHARS = 8 * 1024 * 1024  # an index holds about four times its document's size
+MAX_CACHED_MATCHERS = 256
+
+
+def split_into_chunks(doc_content):
+    """Table chunks and heading-delimited text chunks of a markdown document, in order."""
+    final_chunks = []
+    for chunk in detect_tables_and_split(doc_content):
+        if not chunk['is_table']:
+            final_chunks.extend(detect_headings_and_split(chunk['content']))
+        else:
+            final_chunks.append(chunk)
+    return final_chunks
+
+
+def following_tables(chunks):
+    """
+    For each chunk, the index of the first table after it within the same section (before
+    the next heading), or None. One backward pass over the chunks.
+    """
+    follow = [None] * len(chunks)
+    next_table = None
+    for idx in range(len(chunks) - 1, -1, -1):
+        follow[idx] = next_table
+        if chunks[idx].get('is_heading'):
+            next_table = None
+        elif chunks[idx]['is_table']:
+            next_table = idx
+    return follow
+
+
+def merge_intervals(intervals):
+    """Merge sorted, possibly overlapping or touching (start, end) intervals."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def context_windows(content, spans, pre_words=100, post_words=200, words=None):
+    """
+    Word windows around character `spans` of `content` (in order): `pre_words` words
+    before each span and `post_words` after it, overlapping windows merged.
+
+    Word positions are counted incrementally between consecutive span boundaries, so the
+    text is scanned once however many spans there are.
+
+    :param words: `content.split()`, if the caller already has it
+    :return: List of (first word, end word) index pairs and the list of words
+    """
+    words = content.split() if words is None else words
+    intervals = []
+    position, starts_before = 0, 0
+
+    def count_starts(target):
+        # Words starting in content[position:target]; a word running across `position` started earlier
+        nonlocal position, starts_before
+        if target > position:
+            runs = len(WORD_PATTERN.findall(content, position, target))
+            straddles = position > 0 and not content[position - 1].isspace() and not content[position].isspace()
+            starts_before += runs - straddles
+            position = target
+        return starts_before
+
+    for start, end in spans:
+        first_word = count_starts(start)
+        if start > 0 and not content[start - 1].isspace() and not content[start].isspace():
+            first_word -= 1  # the span starts inside a word, e.g. "(margin"
+        end_word = max(count_starts(end), first_word + 1)
+        intervals.append((max(first_word - pre_words, 0), min(end_word + post_words, len(words))))
+    return merge_intervals(intervals), words
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """
+    A keyword list compiled once for repeated searches. Matches are those of the regex
+    `(?i)\\b(?:keyword|keyword|...)\\b` over the list in the caller's order: leftmost
+    first and, at a position, the earliest keyword in the list that matches a whole word.
+
+    Matching runs on lowercased text with a case-sensitive pattern whose leading word
+    boundary is checked by hand: without `(?i)` and a leading `\\b` the regex engine can
+    skip ahead to the keywords' first characters, which is several times faster. Large
+    lists use an Aho-Corasick automaton instead when `pyahocorasick` is installed, so the
+    cost of a search does not grow with the number of keywords.
+    """
+
+    def __init__(self, keywords):
+        # Order matters as in a regex alternation, so duplicates are dropped without reordering
+        self.keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+        self._automaton = None
+        self._pattern = None
+        self._fallback = None
+        if not self.keywords:
+            return
+        self._pattern = re.compile(r'(?:' + '|'.join(re.escape(keyword.lower()) for keyword in self.keywords) + r')\b')
+        # For text whose length changes when lowercased, where offsets would not line up
+        self._fallback = re.compile(r'(?i)\b(?:' + '|'.join(map(re.escape, self.keywords)) + r')\b')
+        if AHOCORASICK_AVAILABLE and len(self.keywords) >= AHOCORASICK_MIN_KEYWORDS:
+            self._automaton = ahocorasick.Automaton()
+            for rank, keyword in reversed(list(enumerate(self.keywords))):
+                # Keywords equal when lowercased keep the rank of the first one
+                self._automaton.add_word(keyword.lower(), (rank, len(keyword)))
+            self._automaton.make_automaton()
+
+    @staticmethod
+    def _boundary(text, position):
+        before = position > 0 and _is_word_char(text[position - 1])
+        after = position < len(text) and _is_word_char(text[position])
+        return before != after
+
+    def _automaton_spans(self, lowered):
+        candidates = []
+        for last, (rank, length) in self._automaton.iter(lowered):
+            start, end = last - length + 1, last + 1
+            if self._boundary(lowered, start) and self._boundary(lowered, end):
+                candidates.append((start, rank, end))
+        # Leftmost first, then the keyword the alternation would try first
+        found, covered = [], 0
+        for start, _, end in sorted(candidates):
+            if start >= covered:
+                covered = end
+                found.append((start, end))
+        return found
+
+    def _regex_spans(self, lowered):
+        found, position = [], 0
+        search = self._pattern.search
+        while True:
+            match = search(lowered, position)
+            if match is None:
+                return found
+            start, end = match.span()
+            if self._boundary(lowered, start):
+                found.append((start, end))
+                position = end
+            else:
+                # The leading \b only depends on the position, so no keyword matches here
+                position = start + 1
+
+    def spans(self, text, lowered=None):
+        """
+        (start, end) of every non-overlapping keyword match in `text`, in order.
+
+        :param lowered: `text.lower()`, if the caller already has it
+        """
+        if not self.keywords:
+            return []
+        lowered = text.lower() if lowered is None else lowered
+        if len(lowered) != len(text):
+            return [match.span() for match in self._fallback.finditer(text)]
+        if self._automaton is not None:
+            return self._automaton_spans(lowered)
+        return self._regex_spans(lowered)
+
+    def search(self, text, lowered=None):
+        """Whether `text` contains any keyword."""
+        if not self.keywords:
+            return False
+        lowered = text.lower() if lowered is None else lowered
+        if len(lowered) != len(text):
+            return self._fallback.search(text) is not None
+        match = self._pattern.search(lowered)
+        while match is not None:
+            if self._boundary(lowered, match.start()):
+                return True
+            match = self._pattern.search(lowered, match.start() + 1)
+        return False
+
+
+class DocumentIndex:
+    """
+    A markdown document split into table and heading-delimited chunks once, with the table
+    following each chunk and the words of each chunk, so any number of keyword queries can
+    run against it without re-parsing.
+    """
+
+    def __init__(self, doc_content):
+        self.chunks = split_into_chunks(doc_content)
+        self.follow = following_tables(self.chunks)
+        self._words = {}
+        self._lowered = {}
+
+    def lowered(self, idx):
+        """The lowercased content of chunk `idx`, computed on first use."""
+        lowered = self._lowered.get(idx)
+        if lowered is None:
+            lowered = self._lowered[idx] = self.chunks[idx]['content'].lower()
+        return lowered
+
+    def words(self, idx):
+        """The words of chunk `idx`, split on first use."""
+        words = self._words.get(idx)
+        if words is None:
+            words = self._words[idx] = self.chunks[idx]['content'].split()
+        return words
+
+    def matching_chunks(self, matcher, pre_words=100, post_words=200):
+        """
+        The passages that mention any keyword of `matcher` (a KeywordMatcher or a keyword
+        list). Each text chunk contributes one passage per group of nearby matches: the
+        words around them, with overlapping windows merged, followed by the first table of
+        the same section if there is one. Tables that mention a keyword themselves are
+        returned on their own unless they were already attached to a passage. Passages are
+        returned in document order, without duplicates.
+        """
+        if not isinstance(matcher, KeywordMatcher):
+            matcher = KeywordMatcher(matcher)
+        if not matcher.keywords:
+            return []
+        chunks, follow = self.chunks, self.follow
+
+        passages = []  # (chunk index, text, attached table index or None)
+        attached = set()
+        for idx, chunk in enumerate(chunks):
+            if chunk['is_table'] or chunk.get('is_heading'):
+                continue
+            spans = matcher.spans(chunk['content'], self.lowered(idx))
+            if not spans:
+                continue
+            windows, words = context_windows(chunk['content'], spans, pre_words, post_words, self.words(idx))
+            for first_word, end_word in windows:
+                passages.append((idx, ' '.join(words[first_word:end_word]), follow[idx]))
+            if follow[idx] is not None:
+                attached.add(follow[idx])
+
+        for idx, chunk in enumerate(chunks):
+            if chunk['is_table'] and idx not in attached and chunk['content'] and matcher.search(chunk['content'], self.lowered(idx)):
+                passages.append((idx, chunk['content'], None))
+        passages.sort(key=lambda passage: passage[0])
+
+        unique_matches, seen = [], set()
+        for _, text, table_idx in passages:
+            if table_idx is not None and chunks[table_idx]['content']:
+                text = f"{text}\n\n{chunks[table_idx]['content']}"
+            if text not in seen:
+                seen.add(text)
+                unique_matches.append(text)
+        return unique_matches
+
+
+class _LruCache:
+    """Thread-safe LRU cache that evicts once the total `size(key)` of its entries exceeds `limit`."""
+
+    def __init__(self, limit, size=lambda key: 1):
+        self.limit = limit
+        self.size = size
+        self.total = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = build()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self.total += self.size(key)
+            while self.total > self.limit and self._entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.total -= self.size(evicted)
+        return value
+
+
+# Documents are bounded by their total size: a few large circulars can outweigh many small ones
+_document_indexes = _LruCache(MAX_CACHED_DOCUMENT_CHARS, size=len)
+_keyword_matchers = _LruCache(MAX_CACHED_MATCHERS)
+
+
+def get_document_index(doc_content):
+    """
+    Process-wide DocumentIndex for `doc_content`. The most recent documents are kept, up to
+    MAX_CACHED_DOCUMENT_CHARS characters in all; a larger document is indexed but not kept.
+    """
+    return _document_indexes.get(doc_content, lambda: DocumentIndex(doc_content))
+
+
+def get_keyword_matcher(keywords):
+    """Process-wide KeywordMatcher for a keyword list, compiled on first use."""
+    keywords = tuple(keywords)
+    return _keyword_matchers.get(keywords, lambda: KeywordMatcher(keywords))
+
+
+def combined_context_v2(doc_content, keywords, pre_words=100, post_words=200):
+    """
+    Extract the passages of a markdown document that mention any of `keywords`; see
+    DocumentIndex.matching_chunks.
+
+    The document is split once, following tables are found in one backward pass, words are
+    counted in one pass per chunk, and duplicates are found with a set, so the cost is
+    linear in the size of the document and the number of matches. Callers running several
+    queries should keep the DocumentIndex and KeywordMatcher instead.
+    """
+    return DocumentIndex(doc_content).matching_chunks(KeywordMatcher(keywords), pre_words, post_words)
+
+
+def detect_tables_and_split(content, context_lines=2):
+    table_pattern = r'(\|.*?\|\n(?:\|.*?\|\n)+)'
+    chunks = []
+    last_end = 0
+
+    for match in re.finditer(table_pattern, content):
+        start_context = content.rfind('\n', 0, match.start())
+        if start_context != -1:
+            prev_line_start = content.rfind('\n', 0, start_context - 1)
+            start_context = prev_line_start if prev_line_start != -1 else 0
+
+        if start_context > last_end:
+            chunks.append({
+                "content": content[last_end:start_context].strip(),
+                "is_table": False
+            })
+
+        end_context = match.end()
+        footer_end = content.find('\n', end_context)
+        if footer_end != -1:
+            end_context = content.find('\n', footer_end + 1)
+            if end_context == -1:
+                end_context = len(content)
+
+        chunks.append({
+            "content": content[start_context:end_context].strip(),
+            "is_table": True
+        })
+        last_end = end_context
+
+    if last_end < len(content):
+        chunks.append({
+            "content": content[last_end:].strip(),
+            "is_table": False
+        })
+
+    return chunks
+
+
+def detect_headings_and_split(content):
+    heading_pattern = r'(?m)^(#+\s+.+)$'
+    headings = list(re.finditer(heading_pattern, content))
+    chunks = []
+    last_end = 0
+
+    for heading in headings:
+        if heading.start() > last_end:
+            chunks.append({
+                "content": content[last_end:heading.start()].strip(),
+                "is_table": False,
+                "is_heading": False
+            })
+
+        chunks.append({
+            "content": heading.group().strip(),
+            "is_table": False,
+            "is_heading": True
+        })
+        last_end = heading.end()
+
+    if last_end < len(content):
+        chunks.append({
+            "content": content[last_end:].strip(),
+            "is_table": False,
+            "is_heading": False
+        })
+
+    return chunks
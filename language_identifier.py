@@ -1,13 +1,17 @@
 # File: language_identifier.py
 
 import os
-from groq import Groq
+import threading
+from collections import Counter
 from dotenv import load_dotenv
+from llm_clients import get_groq_client
 
 class LanguageIdentifier:
+    MODEL = "whisper-large-v3"
+
     def __init__(self):
         load_dotenv()
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = get_groq_client(os.getenv("GROQ_API_KEY"))
         print(f"Groq API Key: {os.getenv('GROQ_API_KEY')[:5]}...") # Print first 5 characters of API key
 
     def identify_language(self, file_path):
@@ -20,16 +24,20 @@ class LanguageIdentifier:
             print(f"Unsupported file format: {file_extension}")
             return None
 
+        with open(file_path, "rb") as file:
+            print(f"File opened successfully: {file_path}")
+            return self.identify_language_from_audio(file.read(), file_path)
+
+    def identify_language_from_audio(self, audio_bytes, file_name="sample.wav"):
+        """Identify the language of in-memory audio, e.g. a WAV chunk from the streaming decoder."""
         try:
-            with open(file_path, "rb") as file:
-                print(f"File opened successfully: {file_path}")
-                response = self.client.audio.transcriptions.create(
-                    file=(file_path, file.read()),
-                    model="whisper-large-v3",
-                    prompt = "Identify the language of this audio if it is Hindi, Gujrati, Bengali or English. Please give attention to the greetings and words carefully to recognise the language. Respond with only the two-letter language code (e.g., 'en' for English, 'hi' for Hindi).",
-                    response_format="text",
-                    temperature=0.0
-                )
+            response = self.client.audio.transcriptions.create(
+                file=(file_name, audio_bytes),
+                model=self.MODEL,
+                prompt = "Identify the language of this audio if it is Hindi, Gujrati, Bengali or English. Please give attention to the greetings and words carefully to recognise the language. Respond with only the two-letter language code (e.g., 'en' for English, 'hi' for Hindi).",
+                response_format="text",
+                temperature=0.0
+            )
             print(f"Raw API response: {response}")
             
             identified_language = response.lower() if isinstance(response, str) else response.text.lower()
@@ -60,6 +68,137 @@ class LanguageIdentifier:
             print(f"An error occurred during language identification: {str(e)}")
             return "hi-IN"  # Default to Hindi in case of any error
 
+_shared_identifier = None
+_shared_identifier_lock = threading.Lock()
+
+def get_language_identifier():
+    """Process-wide LanguageIdentifier, so the Groq client and its connections are reused."""
+    global _shared_identifier
+    with _shared_identifier_lock:
+        if _shared_identifier is None:
+            _shared_identifier = LanguageIdentifier()
+        return _shared_identifier
+
 def identify_language(audio_path):
-    identifier = LanguageIdentifier()
-    return identifier.identify_language(audio_path)
\ No newline at end of file
+    return get_language_identifier().identify_language(audio_path)
+
+def identify_language_from_audio(audio_bytes, file_name="sample.wav"):
+    return get_language_identifier().identify_language_from_audio(audio_bytes, file_name)
+
+
+class LanguageDetection:
+    """
+    Identifies the language of a call from a few leading audio samples in background
+    threads, so it runs alongside the first API requests instead of before them.
+
+    The first answer is available as a provisional code; once every sample has been
+    voted on, the majority (ties go to the earliest sample) becomes the final code.
+    Callers that acted on the provisional code compare it with the final one and redo
+    their work if it changed. Instead of waiting on the `provisional` and `final` events,
+    callers can register callbacks with when_provisional() and when_final(), so no thread
+    is held while identification runs.
+    """
+
+    def __init__(self, identify=identify_language_from_audio, max_samples=2):
+        self.identify = identify
+        self.max_samples = max_samples
+        self.language_code = None
+        self.provisional = threading.Event()
+        self.final = threading.Event()
+        self._votes = {}
+        self._submitted = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._callbacks = {'provisional': [], 'final': []}
+
+    @classmethod
+    def known(cls, language_code):
+        """A detection that is already settled, e.g. from a cached run."""
+        detection = cls(max_samples=0)
+        detection.language_code = language_code
+        detection.provisional.set()
+        detection.final.set()
+        return detection
+
+    def add_sample(self, audio_bytes):
+        """Start identifying one more leading sample; ignored once `max_samples` were taken."""
+        with self._lock:
+            if self._closed or self._submitted >= self.max_samples:
+                return False
+            order = self._submitted
+            self._submitted += 1
+        threading.Thread(target=self._vote, args=(order, audio_bytes), daemon=True).start()
+        return True
+
+    def when_provisional(self, callback):
+        """Call `callback()` once a language code is available; immediately if it already is."""
+        self._when('provisional', self.provisional, callback)
+
+    def when_final(self, callback):
+        """Call `callback()` once the vote is settled; immediately if it already is."""
+        self._when('final', self.final, callback)
+
+    def _when(self, stage, event, callback):
+        with self._lock:
+            if not event.is_set():
+                self._callbacks[stage].append(callback)
+                return
+        callback()
+
+    def _take_callbacks(self):
+        # Called with the lock held; the callbacks run after it is released, so they may register more
+        ready = []
+        for stage, event in (('provisional', self.provisional), ('final', self.final)):
+            if event.is_set():
+                ready.extend(self._callbacks[stage])
+                self._callbacks[stage] = []
+        return ready
+
+    @staticmethod
+    def _run(callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Language callback failed: {e}")
+
+    def close(self):
+        """No further samples will be added (e.g. the call has fewer chunks than `max_samples`)."""
+        with self._lock:
+            self._closed = True
+            self._maybe_finalize()
+            ready = self._take_callbacks()
+        self._run(ready)
+
+    def _vote(self, order, audio_bytes):
+        try:
+            language_code = self.identify(audio_bytes)
+        except Exception as e:
+            print(f"Language identification failed on sample {order}: {e}")
+            language_code = None
+        with self._lock:
+            self._votes[order] = language_code
+            if language_code and not self.provisional.is_set():
+                self.language_code = language_code
+                self.provisional.set()
+            self._maybe_finalize()
+            ready = self._take_callbacks()
+        self._run(ready)
+
+    def _maybe_finalize(self):
+        if self.final.is_set() or len(self._votes) < self._submitted:
+            return
+        if not self._closed and self._submitted < self.max_samples:
+            return
+        ordered = [code for _, code in sorted(self._votes.items()) if code]
+        if ordered:
+            counts = Counter(ordered)
+            best = max(counts.values())
+            final_code = next(code for code in ordered if counts[code] == best)
+            if self.language_code and final_code != self.language_code:
+                print(f"Language reconciled from {self.language_code} to {final_code}")
+            self.language_code = final_code
+        else:
+            self.language_code = self.language_code or "hi-IN"  # Default to Hindi, as identify_language does
+        self.provisional.set()
+        self.final.set()
\ No newline at end of file
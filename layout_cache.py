@@ -0,0 +1,111 @@
+# File: layout_cache.py
+
+import hashlib
+
+from transcript_cache import TranscriptCache
+
+# Page fields the table merging reads; words, lines and their polygons make up most of a result
+CACHED_PAGE_FIELDS = ("pageNumber", "width", "height", "unit", "angle", "spans")
+# Per-page elements of a layout result that are kept and re-assembled
+PAGE_ELEMENTS = ("paragraphs", "tables")
+# Put between the markdown of consecutive pages when they are re-assembled, as the service does
+PAGE_BREAK = "\n<!-- PageBreak -->\n"
+# Pages sent to Document Intelligence in one request; the service bills per page either way
+MAX_PAGES_PER_REQUEST = 50
+
+
+def page_digest(page):
+    """SHA-256 of what a PDF page shows: its content stream, page box and embedded XObjects."""
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    digest.update(repr([float(value) for value in page.mediabox]).encode('utf-8'))
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources is not None else None
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            xobject = xobjects[name].get_object()
+            digest.update(name.encode('utf-8'))
+            digest.update(xobject.get_data() if hasattr(xobject, "get_data") else repr(xobject).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def compact_layout_result(result):
+    """The parts of a serialized layout result needed to rebuild the markdown, for caching."""
+    compact = {key: value for key, value in result.items() if key not in ("pages", "styles")}
+    compact["pages"] = [{key: page[key] for key in CACHED_PAGE_FIELDS if key in page}
+                        for page in result.get("pages", [])]
+    return compact
+
+
+def _rebase(value, offset, pages):
+    """A copy of `value` with every span offset moved by `offset` and page number by `pages`."""
+    if isinstance(value, list):
+        return [_rebase(item, offset, pages) for item in value]
+    if not isinstance(value, dict):
+        return value
+    rebased = {key: _rebase(item, offset, pages) for key, item in value.items()}
+    if "offset" in rebased and "length" in rebased:
+        rebased["offset"] += offset
+    if "pageNumber" in rebased:
+        rebased["pageNumber"] += pages
+    return rebased
+
+
+def _page_range(page):
+    spans = page.get("spans") or [{"offset": 0, "length": 0}]
+    return min(span["offset"] for span in spans), max(span["offset"] + span["length"] for span in spans)
+
+
+def split_layout_result(result):
+    """
+    Split a serialized layout result into one result per page, each as if that page had
+    been analyzed alone: its own markdown, offsets from 0 and page number 1. Elements
+    spanning several pages go with the page they start on.
+    """
+    pages = []
+    for page in result.get("pages", []):
+        start, end = _page_range(page)
+        number = page["pageNumber"]
+        split = {"content": result.get("content", "")[start:end], "pages": [_rebase(page, -start, 1 - number)]}
+        for key in PAGE_ELEMENTS:
+            split[key] = [_rebase(element, -start, 1 - number) for element in result.get(key) or []
+                          if (element.get("boundingRegions") or [{}])[0].get("pageNumber") == number]
+        pages.append(split)
+    return pages
+
+
+def combine_page_results(page_results):
+    """Re-assemble per-page results, in order, into the result of one multi-page document."""
+    combined = {"content": PAGE_BREAK.join(page["content"] for page in page_results), "pages": []}
+    combined.update({key: [] for key in PAGE_ELEMENTS})
+    offset = 0
+    for number, page in enumerate(page_results):
+        for key in ("pages",) + PAGE_ELEMENTS:
+            combined[key].extend(_rebase(page.get(key) or [], offset, number))
+        offset += len(page["content"]) + len(PAGE_BREAK)
+    return combined
+
+
+def analyze_pages(digests, cache, analyze_batch, version, max_pages_per_request=MAX_PAGES_PER_REQUEST):
+    """
+    Layout result for a document whose pages have content `digests`, combined in page
+    order. Every page is cached on its own under its digest and `version` (the model and
+    API version), so an amended document only has its changed pages analyzed, however
+    its chunk boundaries moved. Pages missing from `cache` are sent in batches of up to
+    `max_pages_per_request` as analyze_batch(page indices) -> serialized layout result.
+    """
+    keys = [TranscriptCache.make_key('ocr-page', *version, digest) for digest in digests]
+    pages = [cache.get(key) for key in keys]
+    missing = [index for index, page in enumerate(pages) if page is None]
+    for first in range(0, len(missing), max_pages_per_request):
+        batch = missing[first:first + max_pages_per_request]
+        results = split_layout_result(compact_layout_result(analyze_batch(batch)))
+        if len(results) != len(batch):
+            raise ValueError(f"Layout result has {len(results)} pages, expected {len(batch)}")
+        for index, page in zip(batch, results):
+            cache.put(keys[index], page)
+            pages[index] = page
+    return combine_page_results(pages)
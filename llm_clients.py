@@ -0,0 +1,18 @@
+# File: llm_clients.py
+
+import threading
+from groq import Groq
+
+_groq_clients = {}
+_groq_clients_lock = threading.Lock()
+
+
+def get_groq_client(api_key, **client_kwargs):
+    """
+    Process-wide Groq client per API key. Groq clients are thread-safe, so every analyzer
+    and Streamlit session shares one connection pool instead of setting up its own.
+    """
+    with _groq_clients_lock:
+        if api_key not in _groq_clients:
+            _groq_clients[api_key] = Groq(api_key=api_key, **client_kwargs)
+        return _groq_clients[api_key]
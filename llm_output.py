@@ -0,0 +1,246 @@
+# File: llm_output.py
+
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+MAX_REPAIR_ROUNDS = 5
+CODE_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+LITERAL_SYNONYMS = {
+    'purchase': 'Buy', 'purchased': 'Buy', 'bought': 'Buy', 'buying': 'Buy', 'bid': 'Buy',
+    'sale': 'Sell', 'sold': 'Sell', 'selling': 'Sell', 'offer': 'Sell',
+}
+
+
+def _loads(text: str):
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # Trailing commas are the most common defect in model-written JSON
+        return orjson.loads(TRAILING_COMMA_PATTERN.sub(r"\1", text))
+
+
+def _balanced_objects(text: str):
+    """Yield every top-level {...} substring, respecting braces inside JSON strings."""
+    depth, start, in_string, escaped = 0, None, False, False
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = depth > 0
+        elif char == '{':
+            if depth == 0:
+                start = position
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                yield text[start:position + 1]
+
+
+def extract_json_object(content: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the JSON object in an LLM reply: the whole reply, a fenced code block, or the
+    first balanced object in surrounding prose, in that order.
+    """
+    candidates = [content.strip()]
+    candidates.extend(match.strip() for match in CODE_FENCE_PATTERN.findall(content))
+    candidates.extend(_balanced_objects(content))
+    for candidate in candidates:
+        try:
+            data = _loads(candidate)
+        except orjson.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _get(data, path):
+    for key in path:
+        data = data[key]
+    return data
+
+
+def _set(data, path, value):
+    parent = _get(data, path[:-1])
+    parent[path[-1]] = value
+
+
+def _coerce(value: Any, error: Dict[str, Any]) -> Tuple[bool, Any]:
+    """Local fix for one validation error; returns (fixed, new value)."""
+    kind = error['type']
+    if kind == 'string_type' and isinstance(value, (int, float, bool)):
+        return True, str(value)
+    if kind == 'string_type' and isinstance(value, list):
+        return True, ", ".join(str(item) for item in value)
+    if kind in ('float_parsing', 'float_type', 'int_parsing', 'int_type') and isinstance(value, str):
+        number = NUMBER_PATTERN.search(value.replace(',', ''))
+        return True, float(number.group()) if number else None
+    if kind == 'literal_error' and isinstance(value, str):
+        expected = re.findall(r"'([^']*)'", error.get('ctx', {}).get('expected', ''))
+        lowered = value.strip().lower()
+        match = next((option for option in expected if option.lower() == lowered), None)
+        match = match or (LITERAL_SYNONYMS.get(lowered) if LITERAL_SYNONYMS.get(lowered) in expected else None)
+        return (True, match) if match else (False, value)
+    if kind == 'list_type':
+        if value is None:
+            return True, []
+        if isinstance(value, (str, dict)):
+            return True, [value]
+    if kind in ('model_type', 'dict_type'):
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            # One object expected but several returned; the first is kept
+            return True, value[0]
+        if isinstance(value, str):
+            try:
+                parsed = _loads(value)
+            except orjson.JSONDecodeError:
+                return False, value
+            return isinstance(parsed, dict), parsed
+    if kind in ('less_than_equal', 'greater_than_equal') and isinstance(value, (int, float)):
+        upper = error.get('ctx', {}).get('le')
+        if upper == 1 and 1 < value <= 100:
+            # A percentage where a fraction was expected
+            return True, value / 100
+        lower = error.get('ctx', {}).get('ge')
+        return True, min(max(value, lower if lower is not None else value), upper if upper is not None else value)
+    return False, value
+
+
+def _error_path(error: Dict[str, Any]) -> Tuple:
+    return tuple(error['loc'])
+
+
+def _describe(errors: List[Dict[str, Any]]) -> str:
+    lines = []
+    for error in errors:
+        path = ".".join(str(part) for part in error['loc'])
+        current = 'missing' if error['type'] == 'missing' else json.dumps(error['input'], ensure_ascii=False)[:200]
+        lines.append(f"- {path}: {error['msg']} (current value: {current})")
+    return "\n".join(lines)
+
+
+def _drop(data: Dict[str, Any], errors: List[Dict[str, Any]]) -> bool:
+    """
+    Last resort: remove list items that failed validation, or null out the failing field
+    (its parent object if the field is missing or already null, for optional sub-objects).
+    Each item or field is removed once however many of its errors are reported.
+    """
+    items, fields = set(), set()
+    for error in errors:
+        path = _error_path(error)
+        list_positions = [i for i, part in enumerate(path) if isinstance(part, int)]
+        if list_positions:
+            items.add(path[:list_positions[-1] + 1])
+            continue
+        target = path[:-1] if error['type'] == 'missing' else path
+        try:
+            while target and _get(data, target) is None:
+                target = target[:-1]
+        except (KeyError, IndexError, TypeError):
+            continue
+        if target:
+            fields.add(target)
+
+    changed = False
+    # Shallowest paths first: nulling a parent makes its children moot
+    for target in sorted(fields, key=len):
+        if any(target[:len(done)] == done for done in fields if len(done) < len(target)):
+            continue
+        _set(data, target, None)
+        changed = True
+    # Last positions first, so earlier indices stay valid
+    for item in sorted(items, key=lambda path: [(0, part) if isinstance(part, int) else (1, str(part)) for part in path],
+                       reverse=True):
+        try:
+            del _get(data, item[:-1])[item[-1]]
+            changed = True
+        except (KeyError, IndexError, TypeError):
+            continue
+    return changed
+
+
+def parse_model_output(content: str, model: Type[BaseModel], defaults: Optional[Dict[str, Any]] = None,
+                       reprompt: Optional[Callable[[str], str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Parse an LLM reply into a dict validated against `model`, repairing instead of
+    discarding it:
+
+    1. the JSON object is located and parsed with orjson (tolerating fences, prose and
+       trailing commas);
+    2. fields that fail validation are fixed locally where the intent is clear (numbers
+       sent as strings, "purchase" for "Buy", a percentage for a fraction, ...);
+    3. fields that still fail are sent back through `reprompt` - only those fields, as a
+       list of paths with their errors - and the corrected values are merged in;
+    4. anything still invalid is dropped (list items) or nulled (optional fields).
+
+    :param defaults: Top-level values filled in when the reply omits them
+    :param reprompt: Callable taking a correction request and returning the model's reply
+    :return: The validated data as a plain dict, or None if no usable object could be recovered
+    """
+    data = extract_json_object(content)
+    if data is None and reprompt is not None:
+        print("No JSON object in the response; asking for it again")
+        data = extract_json_object(reprompt("Your reply did not contain a JSON object. Reply with only the JSON object."))
+    if data is None:
+        print(f"Unable to find valid JSON in the response: {content}")
+        return None
+    for key, value in (defaults or {}).items():
+        data.setdefault(key, value)
+
+    reprompted = False
+    for _ in range(MAX_REPAIR_ROUNDS):
+        try:
+            return model.model_validate(data).model_dump()
+        except ValidationError as e:
+            errors = e.errors()
+
+        unresolved = []
+        for error in errors:
+            path = _error_path(error)
+            try:
+                fixed, value = (False, None) if error['type'] == 'missing' else _coerce(_get(data, path), error)
+                if fixed:
+                    _set(data, path, value)
+                    continue
+            except (KeyError, IndexError, TypeError):
+                pass
+            unresolved.append(error)
+        if not unresolved:
+            continue
+
+        if reprompt is not None and not reprompted:
+            reprompted = True
+            print(f"Asking the model to correct {len(unresolved)} field(s)")
+            reply = extract_json_object(reprompt(
+                "These fields of your JSON are invalid:\n" + _describe(unresolved) +
+                "\nReply with only a JSON object mapping each field path above (exactly as written) to its corrected value."
+            )) or {}
+            for error in unresolved:
+                key = ".".join(str(part) for part in error['loc'])
+                if key in reply:
+                    try:
+                        _set(data, _error_path(error), reply[key])
+                    except (KeyError, IndexError, TypeError):
+                        pass
+            continue
+
+        if not _drop(data, unresolved):
+            break
+
+    try:
+        return model.model_validate(data).model_dump()
+    except ValidationError as e:
+        print(f"Response could not be repaired: {e}")
+        return None
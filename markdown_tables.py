@@ -0,0 +1,137 @@
+# File: markdown_tables.py
+
+import re
+
+BORDER_SYMBOL = "|"
+# Page header/footer/number/break markers and blank lines that Document Intelligence puts between pages
+PAGE_FURNITURE_PATTERN = re.compile(r'^\s*(?:<!--.*?-->)?\s*$')
+
+
+def remove_header_from_markdown_table(markdown_table):
+    """
+    If an actual table is distributed into two pages vertically. From analysis result, it will be generated as two tables in markdown format.
+    Before merging them into one table, it need to be removed the markdown table-header format string. This function implement that.
+
+    Args:
+        markdown_table: the markdown table string which need to be removed the markdown table-header.
+    Returns:
+        string: the markdown table string without table-header.
+    """
+    HEADER_SEPARATOR_CELL_CONTENT = " - "
+
+    result = ""
+    lines = markdown_table.splitlines()
+    for line in lines:
+        border_list = line.split(HEADER_SEPARATOR_CELL_CONTENT)
+        border_set = set(border_list)
+        if len(border_set) == 1 and border_set.pop() == BORDER_SYMBOL:
+            continue
+        else:
+            result += f"{line}\n"
+
+    return result
+
+
+def merge_vertical_tables(md_table_1, md_table_2):
+    """
+    Merge two consecutive vertical markdown tables into one markdown table.
+
+    Args:
+        md_table_1: markdown table 1
+        md_table_2: markdown table 2
+
+    Returns:
+        string: merged markdown table
+    """
+    table2_without_header = remove_header_from_markdown_table(md_table_2)
+    rows1 = md_table_1.strip().splitlines()
+    rows2 = table2_without_header.strip().splitlines()
+
+    if rows1 == [] or rows2 == []:
+        return table2_without_header
+
+    num_columns1 = len(rows1[0].split(BORDER_SYMBOL)) - 2
+    num_columns2 = len(rows2[0].split(BORDER_SYMBOL)) - 2
+
+    if num_columns1 != num_columns2:
+        return table2_without_header
+
+    return '\n'.join(rows1 + rows2)
+
+
+def split_boundary_tables(content):
+    """
+    Locate the markdown tables at the very start and very end of a chunk's content,
+    ignoring page headers, footers, numbers and blank lines around them.
+
+    Returns:
+        tuple: (leading, trailing), each a (start, end) line range of the table in
+               content.splitlines(), or None if the content does not start/end with a table.
+    """
+    lines = content.splitlines()
+    first = 0
+    while first < len(lines) and PAGE_FURNITURE_PATTERN.match(lines[first]):
+        first += 1
+    leading = None
+    if first < len(lines) and lines[first].lstrip().startswith(BORDER_SYMBOL):
+        end = first
+        while end < len(lines) and lines[end].lstrip().startswith(BORDER_SYMBOL):
+            end += 1
+        leading = (first, end)
+
+    last = len(lines)
+    while last > 0 and PAGE_FURNITURE_PATTERN.match(lines[last - 1]):
+        last -= 1
+    trailing = None
+    if last > 0 and lines[last - 1].lstrip().startswith(BORDER_SYMBOL):
+        start = last
+        while start > 0 and lines[start - 1].lstrip().startswith(BORDER_SYMBOL):
+            start -= 1
+        trailing = (start, last)
+    return leading, trailing
+
+
+def count_table_columns(markdown_table):
+    """Number of columns in the first row of a markdown table."""
+    first_row = markdown_table.strip().splitlines()[0].strip()
+    return len(first_row.strip(BORDER_SYMBOL).split(BORDER_SYMBOL))
+
+
+def merge_tables_across_chunks(contents):
+    """
+    Merge tables that continue from the last page of one chunk onto the first page of
+    the next (e.g. pages 150 and 151), which the per-chunk analysis cannot see. A table
+    ending one chunk and a table opening the next, with only page furniture between
+    them and the same number of columns, are merged vertically into the first chunk.
+    A table that fills a whole chunk stays open, so it keeps merging into the chunk after.
+
+    Args:
+        contents: markdown of each chunk, in page order
+
+    Returns:
+        list: the chunk markdown with boundary tables merged
+    """
+    contents = list(contents)
+    # The chunk whose trailing table the next chunk's leading table would continue
+    target = 0
+    for idx in range(1, len(contents)):
+        _, trailing = split_boundary_tables(contents[target])
+        leading, _ = split_boundary_tables(contents[idx])
+        if trailing is None or leading is None:
+            target = idx
+            continue
+        pre_lines = contents[target].splitlines()
+        next_lines = contents[idx].splitlines()
+        pre_table = "\n".join(pre_lines[trailing[0]:trailing[1]])
+        next_table = "\n".join(next_lines[leading[0]:leading[1]])
+        if count_table_columns(pre_table) != count_table_columns(next_table):
+            target = idx
+            continue
+        print(f"Merging table across chunks {target + 1} and {idx + 1}")
+        merged = merge_vertical_tables(pre_table, next_table)
+        contents[target] = "\n".join(pre_lines[:trailing[0]] + [merged] + pre_lines[trailing[1]:])
+        rest = next_lines[leading[1]:]
+        contents[idx] = "\n".join(rest)
+        if not all(PAGE_FURNITURE_PATTERN.match(line) for line in rest):
+            target = idx
+    return contents
@@ -326,11 +326,81 @@
 
 import os
 import random
-from groq import Groq
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from llm_clients import get_groq_client
+from llm_output import parse_model_output
+from spoken_numbers import annotate, reconcile_deal_fields
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any, Literal
+from typing import Optional, List, Dict, Any, Literal, Tuple
 import json
 
+# Phrases that open the next deal of a multi-deal call, e.g. "and the second is seven ninety-eight Haryana"
+DEAL_BOUNDARY_PATTERN = re.compile(
+    r"\b(?:the\s+(?:second|third|fourth|fifth|next|other|last)\s+(?:one|deal|trade|is)"
+    r"|(?:next|another)\s+(?:deal|trade)|one\s+more\s+(?:deal|trade))\b",
+    re.IGNORECASE,
+)
+
+
+def detect_deal_boundaries(text: str) -> List[int]:
+    """Character offsets in `text` where a new deal is introduced, in order."""
+    return [match.start() for match in DEAL_BOUNDARY_PATTERN.finditer(text)]
+
+
+def split_deals(text: str, max_chars: int) -> List[Tuple[int, str]]:
+    """
+    Split a long transcript at deal boundaries into (offset, segment) pairs of at most
+    `max_chars` characters where possible. Consecutive deals are packed into the same
+    segment; a single deal longer than `max_chars` is never cut.
+    """
+    if len(text) <= max_chars:
+        return [(0, text)]
+    cuts = [0] + [offset for offset in detect_deal_boundaries(text) if offset > 0] + [len(text)]
+    segments, start = [], 0
+    for previous, cut in zip(cuts, cuts[1:]):
+        if cut - start > max_chars and previous > start:
+            segments.append((start, text[start:previous]))
+            start = previous
+    segments.append((start, text[start:]))
+    return segments
+
+
+def call_header(text: str, max_chars: int) -> str:
+    """
+    The opening of a call, up to where its second deal is introduced and at most `max_chars`
+    long. Parties, the broker and the deal time are often stated there once for every deal.
+    """
+    boundaries = [offset for offset in detect_deal_boundaries(text) if offset > 0]
+    end = min(boundaries[0] if boundaries else len(text), max_chars)
+    return text[:end].strip()
+
+
+def locate_deals(deals: List[Dict[str, Any]], text: str, offset: int = 0):
+    """Set each deal's `transcript_span` from its verbatim excerpt, or None if it was paraphrased."""
+    lowered = text.lower()
+    for deal in deals:
+        excerpt = (deal.get('transcript_excerpt') or '').strip()
+        position = lowered.find(excerpt.lower()) if excerpt else -1
+        deal['transcript_span'] = [offset + position, offset + position + len(excerpt)] if position >= 0 else None
+
+
+def reconcile_deals(deals: List[Dict[str, Any]], text: str, offset: int = 0):
+    """
+    Fill and check each deal's figures against the part of `text` that discusses it: from
+    where the deal is introduced up to where the next located deal is. Deals that could not
+    be located are checked against the whole text when they are the only deal.
+    """
+    located = sorted((deal for deal in deals if deal.get('transcript_span')), key=lambda deal: deal['transcript_span'][0])
+    for number, deal in enumerate(located):
+        start = deal['transcript_span'][0] - offset if number else 0
+        end = located[number + 1]['transcript_span'][0] - offset if number + 1 < len(located) else len(text)
+        reconcile_deal_fields(deal, text[start:end])
+    if len(deals) == 1 and not located:
+        reconcile_deal_fields(deals[0], text)
+
 # Simplified Pydantic Models
 class DealDiscussed(BaseModel):
     deal_id: Optional[str] = None
@@ -345,9 +415,11 @@ class DealDiscussed(BaseModel):
     brokerage_money: Optional[float] = None
     face_value: Optional[str] = None
     additional_comments: Optional[str] = None
+    transcript_excerpt: Optional[str] = None
+    transcript_span: Optional[List[int]] = None
 
 class FinancialInfo(BaseModel):
-    deal_details: Optional[DealDiscussed] = None
+    deal_details: List[DealDiscussed] = Field(default_factory=list)
     additional_info: Optional[Dict[str, Any]] = None
 
 class AnalysisResponse(BaseModel):
@@ -355,48 +427,74 @@ class AnalysisResponse(BaseModel):
     confidence: float = Field(..., ge=0, le=1)
 
 class FinancialAnalyzer:
+    MAX_SEGMENT_CHARS = 6000  # longer calls are split at deal boundaries and extracted in parallel
+    MAX_PARALLEL_SEGMENTS = 4
+    MAX_CONTEXT_CHARS = 1500  # opening of the call sent with every later segment
+    MODEL = "llama-3.1-70b-versatile"
+    TEMPERATURE = 0.2
+
     def __init__(self):
-        self.client = Groq(api_key="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")
+        self.client = get_groq_client("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")
+        # The template is fixed, so it is built once and sent byte-identical on every call
+        self._prompt = self._build_prompt()
+        self.prompt_version = hashlib.sha256(self._prompt.encode('utf-8')).hexdigest()
+        # Shared limit on in-flight LLM requests, set by AnalysisOrchestrator; segments fan
+        # out within one call, so the limit is taken per request rather than per call
+        self.request_slots = None
 
     def _generate_confidence_score(self) -> float:
         """Generate a random confidence score between 95.00 and 99.00 with two decimal places."""
         return round(random.uniform(95, 99), 2)
 
-    def _analyze_conversation(self, english_translation: str, analysis_type: str) -> Optional[Dict[str, Any]]:
+    def _analyze_conversation(self, english_translation: str, analysis_type: str,
+                              context: Optional[str] = None) -> Optional[Dict[str, Any]]:
         prompt = self._get_prompt(analysis_type)
+        prompt_version = self.prompt_version
+        # Figures normalized locally go ahead of the conversation, which itself stays verbatim
+        notes = annotate(english_translation)
+        user_content = f"Normalized values:\n{notes}\n\nConversation:\n{english_translation}" if notes else english_translation
+        if context:
+            # Earlier in the same call; kept apart so deals are only taken from the conversation
+            conversation = user_content if notes else f"Conversation:\n{english_translation}"
+            user_content = f"Call context:\n{context}\n\n{conversation}"
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_content}
+        ]
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-70b-versatile",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": english_translation}
-                ],
-                temperature=0.2
-            )
-            content = response.choices[0].message.content.strip()
+            content = self._complete(messages)
         except Exception as e:
             print(f"Error during API request: {str(e)}")
             return None
 
-        # Attempt to extract valid JSON
-        start_index = content.find('{')
-        end_index = content.rfind('}')
-        if start_index == -1 or end_index == -1:
-            print(f"Unable to find valid JSON in the response: {content}")
-            return None
-        
-        json_content = content[start_index:end_index + 1]
+        def reprompt(request: str) -> str:
+            return self._complete(messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": request},
+            ])
 
-        try:
-            data = json.loads(json_content)
-            # Add the generated confidence score
-            data['confidence'] = self._generate_confidence_score()
-            return data
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON from Groq API response: {str(e)}\nRaw response: {content}")
+        # Validate against AnalysisResponse, repairing or re-asking for only the fields that fail
+        data = parse_model_output(content, AnalysisResponse, defaults={'confidence': 0.0}, reprompt=reprompt)
+        if data is None:
             return None
+        # Add the generated confidence score
+        data['confidence'] = self._generate_confidence_score()
+        data['prompt_version'] = prompt_version
+        return data
+
+    def _complete(self, messages: List[Dict[str, str]]) -> str:
+        with self.request_slots or nullcontext():
+            response = self.client.chat.completions.create(
+                model=self.MODEL,
+                messages=messages,
+                temperature=self.TEMPERATURE
+            )
+        return response.choices[0].message.content.strip()
 
     def _get_prompt(self, analysis_type: str) -> str:
+        return self._prompt
+
+    def _build_prompt(self) -> str:
         # Updated Prompt with Specific Instructions for Brokerage Extraction and Date Formatting
         return """
         You are an expert financial analyst. Extract key financial information from the given English conversation transcription.
@@ -404,20 +502,23 @@ class FinancialAnalyzer:
 
         {
             "financial_info": {
-                "deal_details": {
-                    "deal_id": "Unique identifier for the deal, if available",
-                    "parties_involved": ["List of involved parties"],
-                    "security_name": "Name of the security being traded",
-                    "maturity_date": "Maturity date of the security in DD-MM-YYYY format, if available",
-                    "price": "Price per unit of the security",
-                    "quantity": "Quantity of securities traded",
-                    "transaction_type": "Buy or Sell",
-                    "deal_timestamp": "Timestamp when the deal was made in DD-MM-YYYY format if date included, otherwise time only",
-                    "broker_name": "Name of the broker if mentioned, e.g., LKG",
-                    "brokerage_money": "Numeric value of the brokerage fee, e.g., 12500",
-                    "face_value": "Face value of the security, if available",
-                    "additional_comments": "Any additional relevant information"
-                },
+                "deal_details": [
+                    {
+                        "deal_id": "Unique identifier for the deal, if available",
+                        "parties_involved": ["List of involved parties"],
+                        "security_name": "Name of the security being traded",
+                        "maturity_date": "Maturity date of the security in DD-MM-YYYY format, if available",
+                        "price": "Price per unit of the security",
+                        "quantity": "Quantity of securities traded",
+                        "transaction_type": "Buy or Sell",
+                        "deal_timestamp": "Timestamp when the deal was made in DD-MM-YYYY format if date included, otherwise time only",
+                        "broker_name": "Name of the broker if mentioned, e.g., LKG",
+                        "brokerage_money": "Numeric value of the brokerage fee, e.g., 12500",
+                        "face_value": "Face value of the security, if available",
+                        "additional_comments": "Any additional relevant information",
+                        "transcript_excerpt": "The sentence of the conversation that introduces this deal, copied verbatim"
+                    }
+                ],
                 "additional_info": {
                     "key1": "value1",
                     ...
@@ -425,6 +526,17 @@ class FinancialAnalyzer:
             }
         }
 
+        Figures spoken in the conversation may be listed under "Normalized values" before it, each with the
+        words it was read from and its kind; use those values for price, quantity, brokerage_money and deal_timestamp.
+        A (coupon) value is the security's coupon rate, part of its name, never its price.
+
+        Part of a longer call may be preceded by "Call context", the opening of the same call. Use it only for
+        details the conversation does not restate, such as the parties, the broker or the deal time; do not
+        return deals that appear only in the context.
+
+        A conversation can discuss several deals. Return one entry in "deal_details" per distinct deal, in the order
+        they are discussed, and an empty list if no deal is discussed.
+
         Important Organizations:
         Recognize and correctly identify references to the following organizations:
         - HDFC MF
@@ -439,49 +551,98 @@ class FinancialAnalyzer:
         """
 
     def extract_key_info(self, english_translation: str) -> Optional[Dict[str, Any]]:
-        return self._analyze_conversation(english_translation, 'extract_key_info')
+        """
+        Extract every deal in the conversation. Each deal carries a `transcript_span`
+        (character offsets into `english_translation`, or None if its excerpt could not be
+        located) and `local_checks`, the outcome of checking its figures against the
+        rule-based parse of the transcript. Long multi-deal calls are split at deal
+        boundaries and the segments are extracted in parallel, each segment after the first
+        with the opening of the call as context; `segments` and `failed_segments` report how
+        it went either way.
+        """
+        segments = split_deals(english_translation, self.MAX_SEGMENT_CHARS)
+        if len(segments) == 1:
+            return self._combine_segments([self._extract_segment(segments[0])])
+        header = call_header(english_translation, self.MAX_CONTEXT_CHARS)
+        with ThreadPoolExecutor(max_workers=min(self.MAX_PARALLEL_SEGMENTS, len(segments))) as executor:
+            results = list(executor.map(lambda segment: self._extract_segment(segment, header if segment[0] else None),
+                                        segments))
+        return self._combine_segments(results)
+
+    def _extract_segment(self, segment: Tuple[int, str], context: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        offset, text = segment
+        try:
+            result = self._analyze_conversation(text, 'extract_key_info', context)
+        except Exception as e:
+            print(f"Error extracting deals at offset {offset}: {e}")
+            return None
+        if result is not None:
+            locate_deals(result['financial_info']['deal_details'], text, offset)
+            reconcile_deals(result['financial_info']['deal_details'], text, offset)
+        return result
+
+    @staticmethod
+    def _combine_segments(results: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        succeeded = [result for result in results if result is not None]
+        if not succeeded:
+            return None
+        additional_info = {}
+        for result in succeeded:
+            additional_info.update(result['financial_info'].get('additional_info') or {})
+        return {
+            'financial_info': {
+                'deal_details': [deal for result in succeeded for deal in result['financial_info']['deal_details']],
+                'additional_info': additional_info or None,
+            },
+            'confidence': min(result['confidence'] for result in succeeded),
+            'prompt_version': succeeded[0]['prompt_version'],
+            'segments': len(results),
+            'failed_segments': sum(1 for result in results if result is None),
+        }
 
-    def extract_deal_identifiers(self, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+    def extract_deal_identifiers(self, analysis_result: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Extracts DealDetailIdentifiers from the JSON output, focusing only on the key fields
-        that uniquely identify the financial deal.
+        that uniquely identify each financial deal. Returns one entry per deal, in order.
         """
         # Check if analysis_result and financial_info exist
         if not analysis_result or "financial_info" not in analysis_result or not analysis_result["financial_info"]:
             print("No valid financial information found.")
-            return {}
+            return []
 
         # Safely extract deal_details; it might be a list, dictionary, or something else entirely
-        deal_details = analysis_result["financial_info"].get("deal_details", {})
+        deal_details = analysis_result["financial_info"].get("deal_details", [])
 
-        # Convert deal_details to dict if it is a valid stringified JSON, else handle unexpected types
+        # Convert deal_details to a list if it is a valid stringified JSON, else handle unexpected types
         if isinstance(deal_details, str):
             try:
                 deal_details = json.loads(deal_details)
             except json.JSONDecodeError:
                 print(f"Error: deal_details could not be parsed as JSON. Received: {deal_details}")
-                return {}
-
-        # Check if deal_details is a list, and take the first element if so
-        if isinstance(deal_details, list) and len(deal_details) > 0:
-            deal_details = deal_details[0]
-
-        # If deal_details is not a dictionary after handling the list, log and return an empty result
-        if not isinstance(deal_details, dict):
-            print("Warning: deal_details is not in expected dictionary format.")
-            return {}
-
-        # Extract only the identifiers of the deal
-        deal_identifiers = {
-            "deal_id": deal_details.get("deal_id"),
-            "parties_involved": deal_details.get("parties_involved"),
-            "security_name": deal_details.get("security_name"),
-            "transaction_type": deal_details.get("transaction_type"),
-            "maturity_date": deal_details.get("maturity_date"),
-            "deal_timestamp": deal_details.get("deal_timestamp"),
-            "broker_name": deal_details.get("broker_name"),
-        }
-        return deal_identifiers
+                return []
+
+        # A single deal may still arrive as one dictionary
+        if isinstance(deal_details, dict):
+            deal_details = [deal_details]
+
+        if not isinstance(deal_details, list):
+            print("Warning: deal_details is not in expected list format.")
+            return []
+
+        # Extract only the identifiers of each deal
+        return [
+            {
+                "deal_id": deal.get("deal_id"),
+                "parties_involved": deal.get("parties_involved"),
+                "security_name": deal.get("security_name"),
+                "transaction_type": deal.get("transaction_type"),
+                "maturity_date": deal.get("maturity_date"),
+                "deal_timestamp": deal.get("deal_timestamp"),
+                "broker_name": deal.get("broker_name"),
+                "transcript_span": deal.get("transcript_span"),
+            }
+            for deal in deal_details if isinstance(deal, dict)
+        ]
 
 
 
@@ -0,0 +1,157 @@
+# File: sarvam_client.py
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401  # enables HTTP/2 in httpx when installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class AsyncSarvamClient:
+    """
+    Async client for the Sarvam speech endpoints built on one pooled httpx.AsyncClient.
+
+    Connections are kept alive and reused across chunks (HTTP/2 when `h2` is installed),
+    in-flight requests are capped per host, and transient failures are retried with
+    jittered exponential backoff that honours `Retry-After`.
+    """
+
+    BASE_URL = "https://api.sarvam.ai"
+    TRANSCRIBE_PATH = "/speech-to-text"
+    TRANSLATE_PATH = "/speech-to-text-translate"
+
+    def __init__(self, api_key, base_url=BASE_URL, max_concurrency_per_host=8, max_connections=16,
+                 timeout=30.0, max_retries=3, backoff_base=0.5, backoff_max=20.0, http2=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE if http2 is None else http2,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={"api-subscription-key": api_key},
+        )
+        self._host_slots = {}
+
+    def _slots_for(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self._host_slots[host]
+
+    def _backoff_delay(self, attempt, response=None):
+        """Seconds to wait before the next attempt: `Retry-After` if the server sent one, else full jitter."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    return min(max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def post_audio(self, path, chunk, data):
+        """
+        Upload a WavChunk to `path` and return the decoded JSON response, or None once
+        retries are exhausted or the request is rejected.
+        """
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries):
+            response = None
+            try:
+                async with self._slots_for(url):
+                    # A fresh reader per attempt so retries resend the whole chunk
+                    with chunk.open() as file:
+                        response = await self._client.post(
+                            url, files={'file': ('chunk.wav', file, 'audio/wav')}, data=data
+                        )
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    print(f"Error: {path} returned {response.status_code}: {response.text[:200]}")
+                    return None
+                error = f"{path} returned {response.status_code}"
+            except (httpx.TransportError, ValueError) as e:
+                error = e
+            if attempt == self.max_retries - 1:
+                print(f"Error: {error}")
+                return None
+            await asyncio.sleep(self._backoff_delay(attempt, response))
+
+    async def transcribe(self, chunk, language_code, model):
+        return await self.post_audio(self.TRANSCRIBE_PATH, chunk, {'language_code': language_code, 'model': model})
+
+    async def translate(self, chunk, model):
+        return await self.post_audio(self.TRANSLATE_PATH, chunk, {'model': model})
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class SarvamClient:
+    """
+    Synchronous facade over AsyncSarvamClient for thread-based callers. The async client
+    runs on a private event loop in a background thread; every call returns or blocks on
+    a concurrent.futures.Future that can be cancelled.
+    """
+
+    def __init__(self, api_key, **client_kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._client = self._run(self._create(api_key, client_kwargs)).result()
+
+    @staticmethod
+    async def _create(api_key, client_kwargs):
+        # Build the httpx client on the loop that will drive it
+        return AsyncSarvamClient(api_key, **client_kwargs)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def submit_transcribe(self, chunk, language_code, model):
+        return self._run(self._client.transcribe(chunk, language_code, model))
+
+    def submit_translate(self, chunk, model):
+        return self._run(self._client.translate(chunk, model))
+
+    def transcribe(self, chunk, language_code, model):
+        return self.submit_transcribe(chunk, language_code, model).result()
+
+    def translate(self, chunk, model):
+        return self.submit_translate(chunk, model).result()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self._run(self._client.aclose()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_key, **client_kwargs):
+    """Process-wide SarvamClient per API key, so all transcribers share one connection pool and limit."""
+    with _shared_clients_lock:
+        if api_key not in _shared_clients:
+            _shared_clients[api_key] = SarvamClient(api_key, **client_kwargs)
+        return _shared_clients[api_key]
@@ -0,0 +1,326 @@
+# File: spoken_numbers.py
+
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+UNITS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4,
+    'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9,
+}
+TEENS = {
+    'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14,
+    'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19,
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+}
+# Only accepted after a tens word ("twenty-fourth"); "second" on its own is rarely a number
+ORDINAL_UNITS = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
+    'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9,
+}
+REPEATS = {'double': 2, 'triple': 3}
+SCALES = {
+    'thousand': 10 ** 3, 'lakh': 10 ** 5, 'lakhs': 10 ** 5, 'lac': 10 ** 5, 'lacs': 10 ** 5,
+    'million': 10 ** 6, 'crore': 10 ** 7, 'crores': 10 ** 7, 'cr': 10 ** 7, 'billion': 10 ** 9,
+}
+# Amounts of at least this size are deal quantities (face value) rather than fees
+QUANTITY_SCALE = 10 ** 5
+
+TOKEN_PATTERN = re.compile(r"\d+(?:[.,:]\d+)*|[A-Za-z]+")
+# Security codes spoken or typed as coupon + issuer + maturity, e.g. "718G2037", and ISINs
+SECURITY_CODE_PATTERN = re.compile(r"\b(?:\d{1,2}\.?\d{2}\s?[A-Z]{1,3}\s?(?:19|20)\d{2}|IN[0-9A-Z]{10})\b")
+TIME_KEYWORDS = frozenset({'time', 'timing', 'clock', 'hours', 'hrs'})
+BROKERAGE_KEYWORDS = frozenset({'brokerage', 'broker', 'rupees', 'rs', 'inr'})
+# Only the fee itself outweighs size: "brokerage of one lakh" is a fee, "150 crores ... broker" is not
+FEE_KEYWORDS = frozenset({'brokerage'})
+# A decimal followed by a percent sign, or by a name and a maturity year ("7.38 Rajasthan 2026"), is a coupon
+PERCENT_PATTERN = re.compile(r"\s*(?:%|per\s?cent\b)", re.IGNORECASE)
+YEAR_PATTERN = re.compile(r"(?:19|20)\d{2}")
+CONTEXT_TOKENS = 4
+
+
+class Mention(NamedTuple):
+    """A number, price, time or code found in a transcript, with its character span."""
+    start: int
+    end: int
+    kind: str  # 'time', 'price', 'coupon', 'quantity', 'brokerage', 'code' or 'number'
+    value: Union[int, float, str]
+    text: str
+
+
+CLAUSE_BREAK_PATTERN = re.compile(r"[.,;:!?]")
+
+
+def _tokenize(text: str) -> List[Tuple[str, int, int, bool]]:
+    """(word, start, end, joined) per token; `joined` is False after clause punctuation."""
+    tokens, previous_end = [], 0
+    for m in TOKEN_PATTERN.finditer(text):
+        joined = not CLAUSE_BREAK_PATTERN.search(text, previous_end, m.start())
+        tokens.append((m.group(0).lower(), m.start(), m.end(), joined))
+        previous_end = m.end()
+    return tokens
+
+
+def _next(tokens, j) -> Optional[str]:
+    """The word at `j` if it continues the current phrase, else None."""
+    return tokens[j][0] if j < len(tokens) and tokens[j][3] else None
+
+
+def _is_digit_word(word: str) -> bool:
+    return word in UNITS or word in REPEATS
+
+
+def _read_digits(tokens, i) -> Tuple[str, int]:
+    """Digits spoken one by one ("two zero eight six", "triple two"); returns (digits, next index)."""
+    digits, first = "", i
+    while i < len(tokens) and (i == first or tokens[i][3]):
+        word = tokens[i][0]
+        if word in UNITS:
+            digits += str(UNITS[word])
+            i += 1
+        elif word in REPEATS and _next(tokens, i + 1) in UNITS:
+            digits += str(UNITS[tokens[i + 1][0]]) * REPEATS[word]
+            i += 2
+        else:
+            break
+    return digits, i
+
+
+def _read_time(tokens, i) -> Optional[Tuple[str, int]]:
+    """"twelve twenty-four", "nine oh five", "twelve twenty-fourth" -> ("HH:MM", next index)."""
+    if i >= len(tokens):
+        return None
+    word = tokens[i][0]
+    hour = UNITS.get(word) or TEENS.get(word)
+    if not hour:
+        return None
+    j = i + 1
+    minute_word = _next(tokens, j)
+    if minute_word in TEENS:
+        minute, j = TEENS[minute_word], j + 1
+    elif minute_word == 'oh' and _next(tokens, j + 1) in UNITS:
+        minute, j = UNITS[tokens[j + 1][0]], j + 2
+    elif minute_word in TENS and TENS[minute_word] < 60:
+        minute, j = TENS[minute_word], j + 1
+        unit = _next(tokens, j)
+        if unit in UNITS and UNITS[unit] or unit in ORDINAL_UNITS:
+            minute += UNITS.get(unit) or ORDINAL_UNITS[unit]
+            j += 1
+    else:
+        return None
+    return f"{hour:02d}:{minute:02d}", j
+
+
+def _read_number(tokens, i) -> Optional[Tuple[Union[int, float], str, int, int]]:
+    """
+    Read one spoken or written number starting at token `i`.
+
+    :return: (value, decimal digits as written, largest scale applied, next index), or None.
+        Decimals are returned as strings so that trailing zeros of prices survive.
+    """
+    word = tokens[i][0]
+    # Digits read out one by one: "one zero one point three two", "triple two"
+    if _is_digit_word(word) and _is_digit_word(_next(tokens, i + 1) or ''):
+        digits, j = _read_digits(tokens, i)
+        if len(digits) > 1:
+            return _read_fraction(tokens, j, int(digits))
+
+    total, current, scale, seen, last = 0, 0, 1, False, None
+    j = i
+    while j < len(tokens) and (j == i or tokens[j][3]):
+        word = tokens[j][0]
+        if re.fullmatch(r"\d+(?:,\d+)*(?:\.\d+)?", word) and not seen:
+            number = word.replace(',', '')
+            if '.' in number:
+                return _scaled_decimal(tokens, j + 1, number)
+            current, seen, last = int(number), True, 'digits'
+        elif word in UNITS and last not in ('unit', 'teen', 'digits'):
+            current += UNITS[word]
+            seen, last = True, 'unit'
+        elif word in TEENS and last not in ('unit', 'teen', 'tens', 'digits'):
+            current += TEENS[word]
+            seen, last = True, 'teen'
+        elif word in TENS and last not in ('unit', 'teen', 'tens', 'digits'):
+            current += TENS[word]
+            seen, last = True, 'tens'
+        elif word in ORDINAL_UNITS and last == 'tens':
+            current += ORDINAL_UNITS[word]
+            j += 1
+            break
+        elif word == 'hundred' and last != 'hundred':
+            current = (current or 1) * 100
+            seen, last = True, 'hundred'
+        elif word in SCALES and (last != 'scale' or SCALES[word] > scale):
+            value = SCALES[word]
+            if total and value > scale:
+                # "fifty thousand crore"
+                total = (total + current) * value
+            else:
+                total += (current or 1) * value
+            scale, current, seen, last = max(scale, value), 0, True, 'scale'
+        elif word == 'and' and seen and (_next(tokens, j + 1) or '') in {**UNITS, **TEENS, **TENS}:
+            # "one hundred and fifty"
+            last = 'and'
+        else:
+            break
+        j += 1
+    if not seen:
+        return None
+    return _read_fraction(tokens, j, total + current, scale)
+
+
+def _read_fraction(tokens, j, integer, scale=1):
+    if scale == 1 and _next(tokens, j) == 'point' and _is_digit_word(_next(tokens, j + 1) or ''):
+        digits, k = _read_digits(tokens, j + 1)
+        return _scaled_decimal(tokens, k, f"{integer}.{digits}")
+    return integer, "", scale, j
+
+
+def _scaled_decimal(tokens, j, number: str):
+    """A decimal, or an amount if a scale follows ("one point five crore")."""
+    word = _next(tokens, j)
+    if word in SCALES:
+        return round(float(number) * SCALES[word]), "", SCALES[word], j + 1
+    return number, number.split('.')[1], 1, j
+
+
+def _near(tokens, start, end, keywords) -> bool:
+    window = tokens[max(start - CONTEXT_TOKENS, 0):start] + tokens[end:end + CONTEXT_TOKENS]
+    return any(token[0] in keywords for token in window)
+
+
+def _is_coupon(text, tokens, end, j) -> bool:
+    """Whether the decimal ending at character `end` (next token `j`) is a coupon rate."""
+    if PERCENT_PATTERN.match(text, end):
+        return True
+    following = [token[0] for token in tokens[j:j + 2] if token[3]]
+    return bool(following) and following[0].isalpha() and any(YEAR_PATTERN.fullmatch(word) for word in following)
+
+
+def find_mentions(text: str) -> List[Mention]:
+    """
+    Every number, price, amount, time and security code in an Indian-English financial
+    conversation, in order. Spoken forms are normalized: "one hundred and fifty crores"
+    -> 1500000000, "hundred point two zero eight six" -> "100.2086", "triple two" -> 222,
+    "deal time twelve twenty-four" -> "12:24".
+
+    Kinds: 'time' (near a word like "time"), 'coupon' (a decimal followed by "%" or by a
+    security name and year, as in "7.38% Rajasthan 2026"), 'price' (any other decimal),
+    'quantity' (a lakh or larger amount), 'brokerage' (an amount near "broker"/"brokerage"/
+    "rupees", or any amount next to "brokerage"), 'code' (e.g. "718G2037") and 'number' for
+    anything else.
+    """
+    mentions = [Mention(m.start(), m.end(), 'code', re.sub(r"\s", "", m.group(0)), m.group(0))
+                for m in SECURITY_CODE_PATTERN.finditer(text)]
+    taken = [(m.start, m.end) for m in mentions]
+    tokens = [token for token in _tokenize(text) if not any(start <= token[1] < end for start, end in taken)]
+
+    i = 0
+    while i < len(tokens):
+        word, start = tokens[i][:2]
+        clock = re.fullmatch(r"(\d{1,2}):(\d{2})", word)
+        if clock and int(clock.group(1)) < 24 and int(clock.group(2)) < 60:
+            mentions.append(Mention(start, tokens[i][2], 'time', f"{int(clock.group(1)):02d}:{clock.group(2)}", word))
+            i += 1
+            continue
+        spoken_time = _read_time(tokens, i)
+        if spoken_time and _near(tokens, i, spoken_time[1], TIME_KEYWORDS):
+            value, j = spoken_time
+            end = tokens[j - 1][2]
+            mentions.append(Mention(start, end, 'time', value, text[start:end]))
+            i = j
+            continue
+        number = _read_number(tokens, i)
+        if number is None:
+            i += 1
+            continue
+        value, decimals, scale, j = number
+        end = tokens[j - 1][2]
+        if decimals:
+            kind = 'coupon' if _is_coupon(text, tokens, end, j) else 'price'
+        elif _near(tokens, i, j, FEE_KEYWORDS):
+            kind = 'brokerage'
+        elif scale >= QUANTITY_SCALE:
+            kind = 'quantity'
+        elif _near(tokens, i, j, BROKERAGE_KEYWORDS):
+            kind = 'brokerage'
+        else:
+            kind = 'number'
+        mentions.append(Mention(start, end, kind, value, text[start:end]))
+        i = j
+    return sorted(mentions)
+
+
+def to_number(text: Any) -> Optional[float]:
+    """The first number in `text` ("150 crores", "Rs. 27,000", "one lakh"), or None."""
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return float(text)
+    for mention in find_mentions(str(text or '')):
+        if mention.kind not in ('time', 'code'):
+            return float(mention.value)
+    return None
+
+
+def annotate(text: str) -> str:
+    """
+    Normalized values for the numbers spoken in `text`, one per line, to send ahead of the
+    transcript so the model reads figures instead of re-deriving them. Empty if there are none.
+    """
+    lines = [f'- "{mention.text}" = {mention.value} ({mention.kind})'
+             for mention in find_mentions(text) if mention.kind != 'number']
+    # Repeated confirmations of the same figure are listed once
+    return "\n".join(dict.fromkeys(lines))
+
+
+def local_deal_fields(text: str) -> Dict[str, Any]:
+    """
+    Deal fields read from the transcript of one deal without a model: the first price,
+    quantity and brokerage, and the last time mentioned (calls tend to correct the deal
+    time before hanging up). Fields that are not found are None.
+    """
+    mentions = find_mentions(text)
+
+    def first(kind):
+        return next((mention.value for mention in mentions if mention.kind == kind), None)
+
+    times = [mention.value for mention in mentions if mention.kind == 'time']
+    quantity = first('quantity')
+    brokerage = first('brokerage')
+    return {
+        'price': first('price'),
+        'quantity': str(int(quantity)) if quantity is not None else None,
+        'brokerage_money': float(brokerage) if brokerage is not None else None,
+        'deal_timestamp': times[-1] if times else None,
+    }
+
+
+def _same_time(llm_value: Any, local_value: str) -> bool:
+    clock = re.search(r"(\d{1,2}):(\d{2})", str(llm_value))
+    return bool(clock) and f"{int(clock.group(1)):02d}:{clock.group(2)}" == local_value
+
+
+def reconcile_deal_fields(deal: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """
+    Fill `deal`'s empty price/quantity/brokerage_money/deal_timestamp from the transcript of
+    that deal, and check the ones the model filled in. The outcome per field is recorded in
+    deal['local_checks'] as {'status': 'filled' | 'verified' | 'mismatch', 'value': local value};
+    on a mismatch the model's value is kept.
+    """
+    checks = {}
+    for field, local in local_deal_fields(text).items():
+        if local is None:
+            continue
+        current = deal.get(field)
+        if current in (None, ''):
+            deal[field] = local
+            status = 'filled'
+        elif field == 'deal_timestamp':
+            status = 'verified' if _same_time(current, local) else 'mismatch'
+        else:
+            number = to_number(current)
+            status = 'verified' if number is not None and abs(number - float(local)) < 1e-6 else 'mismatch'
+        checks[field] = {'status': status, 'value': local}
+    deal['local_checks'] = checks
+    return deal
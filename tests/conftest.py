@@ -0,0 +1,83 @@
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class SarvamStub:
+    """Local stand-in for the Sarvam speech endpoints.
+
+    Each response echoes the endpoint and the first PCM sample of the uploaded WAV, so
+    tests can check which chunk a transcript came from.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self.languages = []  # language_code of every transcription request
+        self.fail = set()  # (prefix, first_sample) pairs answered with 500
+        self.responses = []  # queued (status, headers) overrides, served first
+        self.delay = (0.001, 0.03)
+
+    def handle(self, path, body):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.calls += 1
+            override = self.responses.pop(0) if self.responses else None
+            language = re.search(rb'name="language_code"\r\n\r\n([^\r]+)', body)
+            if language:
+                self.languages.append(language.group(1).decode())
+        try:
+            time.sleep(random.uniform(*self.delay))
+            if override:
+                return override[0], override[1], b'{}'
+            riff = body.index(b'RIFF')
+            (first_sample,) = struct.unpack('<h', body[riff + 44:riff + 46])
+            prefix = 'T' if path.endswith('translate') else 'S'
+            if (prefix, first_sample) in self.fail:
+                return 500, {}, b'{"error": "boom"}'
+            return 200, {}, f'{{"transcript": "{prefix}{first_sample}"}}'.encode()
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def sarvam_stub():
+    stub = SarvamStub()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            status, headers, payload = stub.handle(self.path, body)
+            try:
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client cancelled the request
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stub.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield stub
+    server.shutdown()
+    server.server_close()
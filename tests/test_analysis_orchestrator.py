@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_orchestrator import AnalysisOrchestrator
+
+
+class SlowFinancialAnalyzer:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def extract_key_info(self, english_translation):
+        time.sleep(self.delay)
+        return {'financial_info': {'deal_details': {'security_name': english_translation}}}
+
+    def extract_deal_identifiers(self, analysis_result):
+        return {'security_name': analysis_result['financial_info']['deal_details']['security_name']}
+
+
+class SlowViolationAnalyzer:
+    def __init__(self, delay, error=None):
+        self.delay = delay
+        self.error = error
+
+    def check_violations(self, excerpt):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {'violations': [], 'confidence': 97.0}
+
+
+def test_both_analyses_run_at_the_same_time():
+    orchestrator = AnalysisOrchestrator(SlowFinancialAnalyzer(0.3), SlowViolationAnalyzer(0.3))
+    started = time.time()
+    combined = orchestrator.analyze('7.38 Rajasthan SDL')
+    elapsed = time.time() - started
+    orchestrator.close()
+
+    assert elapsed < 0.55
+    assert combined['deal_identifiers'] == {'security_name': '7.38 Rajasthan SDL'}
+    assert combined['violations_response'] == {'violations': [], 'confidence': 97.0}
+    assert set(combined['timings']) == {'financial', 'compliance'}
+    assert combined['errors'] == {}
+
+
+def test_timeouts_and_errors_are_reported_per_call():
+    orchestrator = AnalysisOrchestrator(SlowFinancialAnalyzer(1.0), SlowViolationAnalyzer(0, RuntimeError('rate limited')))
+    started = time.time()
+    combined = orchestrator.analyze('text', timeout=0.2)
+    elapsed = time.time() - started
+    orchestrator.close()
+
+    assert elapsed < 0.6
+    assert combined['analysis_result'] is None
+    assert combined['deal_identifiers'] == []
+    assert combined['violations_response'] is None
+    assert 'timed out' in combined['errors']['financial']
+    assert combined['errors']['compliance'] == 'rate limited'
+
+
+def test_time_queued_in_the_pool_does_not_count_against_the_timeout():
+    # One worker: the second call's requests wait behind the first call's
+    orchestrator = AnalysisOrchestrator(SlowFinancialAnalyzer(0.3), SlowViolationAnalyzer(0.3), max_workers=1)
+    with ThreadPoolExecutor(max_workers=2) as callers:
+        results = list(callers.map(lambda text: orchestrator.analyze(text, timeout=0.5), ['first', 'second']))
+    orchestrator.close()
+
+    assert [combined['errors'] for combined in results] == [{}, {}]
+
+
+def test_overrunning_call_is_flagged_until_it_returns():
+    orchestrator = AnalysisOrchestrator(SlowFinancialAnalyzer(0.4), SlowViolationAnalyzer(0))
+    combined = orchestrator.analyze('text', timeout=0.1)
+
+    assert 'timed out' in combined['errors']['financial']
+    assert orchestrator.overrunning == 1
+    time.sleep(0.5)
+    assert orchestrator.overrunning == 0
+    orchestrator.close()
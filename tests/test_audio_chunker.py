@@ -0,0 +1,146 @@
+import io
+import wave
+
+import numpy as np
+
+import pytest
+
+from audio_chunker import MappedWav, PcmStreamChunker, WavChunk, find_speech_spans, split_on_silence
+
+
+def _write_wav(path, samples, framerate=16000):
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(framerate)
+        wf.writeframes(samples.tobytes())
+
+
+def test_chunk_streams_header_and_pcm_slice(tmp_path):
+    samples = np.arange(48000, dtype=np.int16)
+    path = tmp_path / 'call.wav'
+    _write_wav(path, samples)
+
+    with MappedWav(str(path)) as wav:
+        assert (wav.nchannels, wav.sampwidth, wav.framerate, wav.n_frames) == (1, 2, 16000, 48000)
+        chunk = wav.chunk(1, 16000, 32000)
+        with chunk.open() as reader:
+            with wave.open(reader, 'rb') as wf:
+                assert wf.getframerate() == 16000
+                data = wf.readframes(wf.getnframes())
+
+    assert np.array_equal(np.frombuffer(data, dtype=np.int16), samples[16000:32000])
+
+
+def test_reader_is_seekable_and_spans_segments():
+    pcm = np.arange(100, dtype=np.int16).tobytes()
+    chunk = WavChunk(0, pcm, [(0, 20), (100, 140)], 1, 2, 16000)
+    expected = chunk.header() + pcm[0:20] + pcm[100:140]
+
+    with chunk.open() as reader:
+        assert reader.read() == expected
+        reader.seek(0)
+        assert reader.read(50) == expected[:50]
+        assert reader.seek(0, io.SEEK_END) == len(expected)
+    assert chunk.getvalue() == expected
+
+
+def _speech(seconds, rng, framerate=16000):
+    return (rng.standard_normal(int(framerate * seconds)) * 3000).astype(np.int16)
+
+
+def _silence(seconds, framerate=16000):
+    return np.zeros(int(framerate * seconds), dtype=np.int16)
+
+
+def test_long_silence_is_dropped_and_reported(tmp_path):
+    rng = np.random.default_rng(1)
+    samples = np.concatenate([_speech(10, rng), _silence(20), _speech(10, rng)])
+    path = tmp_path / 'call.wav'
+    _write_wav(path, samples)
+
+    with MappedWav(str(path)) as wav:
+        chunks, report = split_on_silence(wav, max_chunk_ms=30000)
+        durations = [chunk.duration_ms for chunk in chunks]
+
+    assert report['total_seconds'] == 40.0
+    # Only the 0.3 s padding on each side of the gap survives
+    assert report['skipped_seconds'] == 19.4
+    assert report['chunks'] == 1
+    assert durations == [20600.0]
+
+
+def test_padding_never_overlaps_between_spans():
+    levels = np.array([0.0] * 10 + [-90.0] * 4 + [0.0] * 10 + [-90.0] * 5 + [0.0] * 10, dtype=np.float32)
+
+    # 3 frames of padding each side of 4- and 5-frame runs would overlap; half a run is kept instead
+    spans = find_speech_spans(levels, frame_ms=20, min_silence_ms=80, keep_silence_ms=60)
+
+    assert spans == [(0, 26), (27, 39)]
+    assert all(end <= start for (_, end), (start, _) in zip(spans, spans[1:]))
+
+
+def test_cut_lands_on_pause_near_the_limit(tmp_path):
+    rng = np.random.default_rng(2)
+    # Short pauses are kept but give the splitter a place to cut before 30 s
+    samples = np.concatenate([_speech(27, rng), _silence(0.5), _speech(27, rng), _silence(0.5), _speech(10, rng)])
+    path = tmp_path / 'call.wav'
+    _write_wav(path, samples)
+
+    with MappedWav(str(path)) as wav:
+        chunks, report = split_on_silence(wav, max_chunk_ms=30000)
+        boundaries = [chunk.segments[0][0] - wav.data_offset for chunk in chunks]
+        assert all(chunk.duration_ms <= 30000 for chunk in chunks)
+
+    assert report['skipped_seconds'] == 0.0
+    cut_seconds = [b / 2 / 16000 for b in boundaries[1:]]
+    assert len(cut_seconds) == 2
+    assert 27.0 <= cut_seconds[0] <= 27.5
+    assert 54.5 <= cut_seconds[1] <= 55.0
+
+
+def _blocks(data, size=4096):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_stream_chunker_matches_file_splitter(tmp_path):
+    rng = np.random.default_rng(3)
+    samples = np.concatenate([_speech(27, rng), _silence(0.5), _speech(20, rng), _silence(8), _speech(40, rng)])
+    path = tmp_path / 'call.wav'
+    _write_wav(path, samples)
+
+    with MappedWav(str(path)) as wav:
+        file_chunks, file_report = split_on_silence(wav, max_chunk_ms=30000)
+        file_audio = [chunk.getvalue() for chunk in file_chunks]
+
+    chunker = PcmStreamChunker(_blocks(samples.tobytes()), framerate=16000, max_chunk_ms=30000)
+    stream_audio = [chunk.getvalue() for chunk in chunker]
+
+    assert stream_audio == file_audio
+    assert chunker.report == file_report
+
+
+def test_stream_chunker_carries_silence_across_buffers(tmp_path):
+    rng = np.random.default_rng(4)
+    # The first chunk ends 0.3 s into the 1.6 s gap, leaving a 1.3 s run at the start of the next buffer
+    samples = np.concatenate([_speech(25, rng), _silence(1.6), _speech(20, rng), _silence(3), _speech(5, rng)])
+    path = tmp_path / 'call.wav'
+    _write_wav(path, samples)
+
+    with MappedWav(str(path)) as wav:
+        file_chunks, file_report = split_on_silence(wav, max_chunk_ms=30000)
+        file_audio = [chunk.getvalue() for chunk in file_chunks]
+
+    chunker = PcmStreamChunker(_blocks(samples.tobytes()), framerate=16000, max_chunk_ms=30000)
+    stream_audio = [chunk.getvalue() for chunk in chunker]
+
+    assert len(file_audio) == 2
+    assert stream_audio == file_audio
+    assert chunker.report == file_report
+
+
+def test_stream_chunker_enforces_max_duration():
+    chunker = PcmStreamChunker(_blocks(_silence(5).tobytes()), framerate=16000, max_duration_ms=2000)
+    with pytest.raises(ValueError):
+        list(chunker)
@@ -0,0 +1,116 @@
+import json
+import wave
+
+import numpy as np
+import pytest
+
+import transcriber
+from batch_runner import BatchRunner, collect_inputs, load_processed
+from sarvam_client import SarvamClient
+
+
+class FakeFinancialAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    def extract_key_info(self, english_translation):
+        self.calls.append(english_translation)
+        return {'financial_info': {'deal_details': {'security_name': english_translation.split()[0]}}}
+
+    def extract_deal_identifiers(self, analysis_result):
+        return {'security_name': analysis_result['financial_info']['deal_details']['security_name']}
+
+
+class FakeViolationAnalyzer:
+    def check_violations(self, excerpt):
+        return {'violations': [], 'confidence': 97.0}
+
+    def check_violations_windowed(self, chunks):
+        return self.check_violations(" ".join(chunks))
+
+
+def _write_wav(path, seconds, seed):
+    samples = (np.random.default_rng(seed).standard_normal(16000 * seconds) * 3000).astype(np.int16)
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(samples.tobytes())
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch, sarvam_stub):
+    def stream_pcm(input_file, block_size=8192):
+        with wave.open(input_file, 'rb') as wf:
+            pcm = wf.readframes(wf.getnframes())
+        for start in range(0, len(pcm), block_size):
+            yield pcm[start:start + block_size]
+
+    monkeypatch.setattr(transcriber.AudioPreprocessor, 'stream_pcm', staticmethod(stream_pcm))
+    monkeypatch.setattr(transcriber.AudioPreprocessor, 'probe_duration_ms', staticmethod(lambda f: None))
+    monkeypatch.setattr(transcriber, 'identify_language_from_audio', lambda audio: 'hi-IN')
+    client = SarvamClient('test-key', base_url=sarvam_stub.base_url, max_concurrency_per_host=3, max_retries=1)
+    runner = BatchRunner(str(tmp_path / 'results.jsonl'), FakeFinancialAnalyzer(), FakeViolationAnalyzer(),
+                         max_files=2, max_requests=3, client=client)
+    yield runner
+    client.close()
+
+
+def test_collect_inputs_from_directory_and_manifest(tmp_path):
+    (tmp_path / 'calls' / 'day1').mkdir(parents=True)
+    for name in ['calls/a.wav', 'calls/day1/b.mp3', 'calls/notes.txt']:
+        (tmp_path / name).write_bytes(b'')
+    manifest = tmp_path / 'manifest.txt'
+    manifest.write_text("# overnight batch\ncalls/a.wav\n\ncalls/day1/b.mp3\n")
+
+    expected = [str(tmp_path / 'calls' / 'a.wav'), str(tmp_path / 'calls' / 'day1' / 'b.mp3')]
+    assert collect_inputs(str(tmp_path / 'calls')) == expected
+    assert collect_inputs(str(manifest)) == expected
+
+
+def test_batch_writes_one_record_per_file_and_skips_processed(tmp_path, runner, sarvam_stub):
+    paths = []
+    for seed in range(3):
+        path = tmp_path / f"call{seed}.wav"
+        _write_wav(path, 40, seed)
+        paths.append(str(path))
+
+    counts = runner.run(paths + [paths[0]])
+
+    assert counts == {'ok': 3, 'partial': 0, 'error': 0, 'skipped': 1}
+    with open(runner.output_path) as output:
+        records = [json.loads(line) for line in output]
+    assert sorted(r['file'] for r in records) == sorted(paths)
+    for record in records:
+        assert record['status'] == 'ok'
+        assert record['language_code'] == 'hi-IN'
+        assert record['translation'].startswith('T')
+        assert record['deal_identifiers'] == {'security_name': record['translation'].split()[0]}
+    assert sarvam_stub.peak <= 3
+    assert len(load_processed(runner.output_path)) == 3
+
+    calls = sarvam_stub.calls
+    assert runner.run(paths)['skipped'] == 3
+    assert sarvam_stub.calls == calls
+
+
+def test_failed_file_is_recorded_and_retried(tmp_path, runner):
+    broken = tmp_path / 'broken.wav'
+    broken.write_bytes(b'not audio')
+
+    counts = runner.run([str(broken)])
+
+    assert counts['error'] == 1
+    assert load_processed(runner.output_path) == set()
+
+
+def test_unreadable_manifest_entry_does_not_stop_the_batch(tmp_path, runner):
+    good = tmp_path / 'good.wav'
+    _write_wav(good, 5, seed=7)
+
+    counts = runner.run([str(tmp_path / 'missing.wav'), str(good)])
+
+    assert counts == {'ok': 1, 'partial': 0, 'error': 1, 'skipped': 0}
+    with open(runner.output_path, encoding='utf-8') as output:
+        records = {record['file']: record for record in map(json.loads, output)}
+    assert records[str(tmp_path / 'missing.wav')]['status'] == 'error'
@@ -0,0 +1,268 @@
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from analysis_orchestrator import AnalysisOrchestrator
+from compliance_checker import ViolationAnalyzer, build_windows, merge_violations
+from response_generator import FinancialAnalyzer
+
+GUARDRAILS = os.path.join(os.path.dirname(__file__), '..', 'knowledge_base', 'guardrails.json')
+
+
+def test_prompt_is_compiled_once_per_knowledge_base_version(tmp_path):
+    path = tmp_path / 'guardrails.json'
+    shutil.copy(GUARDRAILS, path)
+    analyzer = ViolationAnalyzer(str(path), retrieval_k=None)
+
+    prompt, prompt_version, kb_version = analyzer._compile_prompt()
+    assert analyzer._compile_prompt()[0] is prompt
+    assert 'Section 1: Objective' in prompt
+
+    data = json.loads(path.read_text())
+    data['circular']['sections']['1']['content'] = 'Revised objective.'
+    path.write_text(json.dumps(data))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    new_prompt, new_prompt_version, new_kb_version = analyzer._compile_prompt()
+    assert 'Revised objective.' in new_prompt
+    assert new_prompt_version != prompt_version
+    assert new_kb_version != kb_version
+    assert analyzer.prompt_version == new_prompt_version
+
+
+def test_financial_prompt_version_is_stable():
+    assert FinancialAnalyzer().prompt_version == FinancialAnalyzer().prompt_version
+
+
+def _violation(section, excerpt):
+    return {
+        'violation': 'Tip offered to the counterparty',
+        'related_circular': {'title': 'SEBI circular', 'issued_by': {}, 'section_number': section, 'description': ''},
+        'excerpt_content': excerpt,
+    }
+
+
+def test_windows_overlap_and_cover_every_chunk():
+    chunks = [f"chunk{i}" for i in range(10)]
+    windows = build_windows(chunks, window_chunks=4, overlap_chunks=1)
+
+    assert [w['chunks'] for w in windows] == [(0, 4), (3, 7), (6, 10)]
+    full = " ".join(chunks)
+    for window in windows:
+        assert full[window['offset']:window['offset'] + len(window['text'])] == window['text']
+    assert [w['chunks'] for w in build_windows(chunks[:3], 4, 1)] == [(0, 3)]
+    assert build_windows([], 4, 1) == []
+
+
+def test_windowed_check_merges_violations_seen_by_overlapping_windows(monkeypatch):
+    chunks = ["Confirming the trade.", "This is a direct trade.", "I will give you a tip of 2 %.",
+              "Keep it off the record.", "Okay, thanks sir.", "Bye."]
+    analyzer = ViolationAnalyzer(GUARDRAILS)
+
+    def analyze(text):
+        violations = []
+        if 'tip of 2 %' in text:
+            violations.append(_violation('3.5', 'I will give you a TIP of 2 %'))
+        if 'off the record' in text:
+            violations.append(_violation('3.6', 'Keep it off the record'))
+        if 'Bye' in text:
+            violations.append(_violation('3.6', 'paraphrased'))
+        return {'violations': violations, 'confidence': 96.5, 'prompt_version': 'p', 'knowledge_base_version': 'k'}
+
+    monkeypatch.setattr(analyzer, '_analyze_violation', analyze)
+    analyzer.full_scan = True
+    result = analyzer.check_violations_windowed(chunks, window_chunks=3, overlap_chunks=1)
+
+    full = " ".join(chunks)
+    spans = {v['excerpt_content']: v['excerpt_span'] for v in result['violations']}
+    assert len(result['violations']) == 3
+    start, end = spans['I will give you a TIP of 2 %']
+    assert full[start:end] == 'I will give you a tip of 2 %'
+    assert spans['paraphrased'] is None
+    assert result['windows'] == 3 and result['failed_windows'] == []
+    assert result['prompt_version'] == 'p'
+
+
+def test_merge_keeps_the_longer_overlapping_excerpt_per_section():
+    short = dict(_violation('3.6', 'off the record'), excerpt_span=[10, 24])
+    long = dict(_violation('3.6', 'keep it off the record'), excerpt_span=[5, 24])
+    other_section = dict(_violation('3.5', 'off the record'), excerpt_span=[10, 24])
+
+    assert merge_violations([short, long, other_section]) == [long, other_section]
+
+
+@pytest.mark.parametrize('count', [0, 1, 3, 4, 5, 7, 10])
+def test_incremental_scan_uses_the_same_windows(count, monkeypatch):
+    analyzer = ViolationAnalyzer(GUARDRAILS)
+    monkeypatch.setattr(analyzer, '_analyze_violation', lambda text: {'violations': [], 'confidence': 97.0})
+    chunks = [f"chunk{i}" for i in range(count)]
+
+    scanner = analyzer.scan_stream(window_chunks=4, overlap_chunks=1)
+    for chunk in chunks:
+        scanner.add_chunk(chunk)
+    result = scanner.finish()
+
+    assert scanner._windows == build_windows(chunks, 4, 1)
+    assert result['windows'] == len(scanner._windows)
+    if not count:
+        assert result['violations'] == [] and result['confidence'] is None
+
+
+def test_incremental_scan_reports_violations_before_the_call_ends(monkeypatch):
+    analyzer = ViolationAnalyzer(GUARDRAILS)
+    analyzed = []
+
+    def analyze(text):
+        analyzed.append(text)
+        violations = [_violation('3.5', 'tip of 2 %')] if 'tip of 2 %' in text else []
+        return {'violations': violations, 'confidence': 97.0}
+
+    monkeypatch.setattr(analyzer, '_analyze_violation', analyze)
+    scanner = analyzer.scan_stream(window_chunks=2, overlap_chunks=1)
+    scanner.add_chunk("Confirming the trade.")
+    scanner.add_chunk("I will give you a tip of 2 %.")
+
+    deadline = time.time() + 5
+    new = []
+    while not new:
+        assert time.time() < deadline, "window was not analyzed"
+        new = scanner.take_new_violations()
+        time.sleep(0.01)
+    assert [v['excerpt_content'] for v in new] == ['tip of 2 %']
+
+    scanner.add_chunk("Okay, thanks sir.")
+    result = scanner.finish()
+    assert scanner.take_new_violations() == []
+    assert len(result['violations']) == 1
+    assert analyzed == ["Confirming the trade. I will give you a tip of 2 %.",
+                        "I will give you a tip of 2 %. Okay, thanks sir."]
+
+
+def test_cancelled_scan_sends_no_further_windows(monkeypatch):
+    analyzer = ViolationAnalyzer(GUARDRAILS)
+    analyzed = []
+
+    def analyze(text):
+        analyzed.append(text)
+        time.sleep(0.1)
+        return {'violations': [], 'confidence': 97.0}
+
+    monkeypatch.setattr(analyzer, '_analyze_violation', analyze)
+    analyzer.full_scan = True
+    analyzer.MAX_PARALLEL_WINDOWS = 1
+    scanner = analyzer.scan_stream(window_chunks=1, overlap_chunks=0)
+    for i in range(4):
+        scanner.add_chunk(f"chunk{i}")
+    scanner.cancel()
+    time.sleep(0.3)
+
+    assert analyzed == ["chunk0"]
+
+
+def test_prefilter_sends_only_flagged_windows_to_the_llm(monkeypatch):
+    analyzer = ViolationAnalyzer(GUARDRAILS)
+    analyzed = []
+
+    def analyze(text):
+        analyzed.append(text)
+        return {'violations': [], 'confidence': 97.0}
+
+    monkeypatch.setattr(analyzer, '_analyze_violation', analyze)
+    chunks = ["Seven thirty-eight Rajasthan, purchase from Standard Chartered.", "Deal time twelve twenty-three.",
+              "Okay sir, thanks.", "Keep it OFF  the record, don't inform the board.", "Okay, done."]
+    result = analyzer.check_violations_windowed(chunks, window_chunks=2, overlap_chunks=0)
+
+    assert analyzed == [" ".join(chunks[2:4])]
+    assert result['screened_windows'] == 2
+    assert result['confidence'] == 97.0
+    screened = analyzer.check_violations("Fifty crores at hundred point nine two.")
+    assert screened['prefilter'] == {'flagged': False, 'matched_terms': []}
+    assert screened['screened_out'] and screened['confidence'] is None
+    assert len(analyzed) == 1
+    screened_version = analyzer.screening_version
+
+    analyzer.full_scan = True
+    assert 'screened_out' not in analyzer.check_violations("Fifty crores at hundred point nine two.")
+    assert len(analyzed) == 2
+    assert analyzer.screening_version != screened_version
+
+
+def test_retrieval_sends_only_relevant_sections(tmp_path, monkeypatch):
+    kb_dir = tmp_path / 'kb'
+    kb_dir.mkdir()
+    shutil.copy(GUARDRAILS, kb_dir / 'guardrails.json')
+    analyzer = ViolationAnalyzer(str(kb_dir / 'guardrails.json'), retrieval_k=2, index_path=str(tmp_path / 'index.json'))
+    sent = []
+
+    class Completions:
+        def create(self, model, messages, temperature):
+            sent.append(messages)
+            message = type('Message', (), {'content': '{"violations": [], "confidence": 0.9}'})
+            return type('Response', (), {'choices': [type('Choice', (), {'message': message})]})
+
+    monkeypatch.setattr(analyzer, 'client', type('Client', (), {'chat': type('Chat', (), {'completions': Completions()})}))
+    result = analyzer.check_violations("Don't inform the board or the trustees about this, keep the whistle blower out of it.")
+
+    system, user = sent[0]
+    assert 'Section 3.1' not in system['content']
+    assert user['content'].count('[guardrails.json#') == 2
+    assert 'guardrails.json#3.6' in result['retrieved_sections']
+    version = analyzer.prompt_version
+    assert result['prompt_version'] == version
+    (kb_dir / 'new_circular.md').write_text("# Insider trading\nNo trading on unpublished price sensitive information.")
+    assert analyzer.prompt_version != version
+
+
+def _fake_client(reply, delay=0.0):
+    state = {'active': 0, 'peak': 0, 'calls': 0}
+    lock = threading.Lock()
+
+    class Completions:
+        def create(self, model, messages, temperature):
+            with lock:
+                state['active'] += 1
+                state['calls'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(delay)
+            with lock:
+                state['active'] -= 1
+            message = type('Message', (), {'content': reply})
+            return type('Response', (), {'choices': [type('Choice', (), {'message': message})]})
+
+    client = type('Client', (), {'chat': type('Chat', (), {'completions': Completions()})})
+    return client, state
+
+
+def test_windows_share_the_orchestrator_request_limit(monkeypatch):
+    analyzer = ViolationAnalyzer(GUARDRAILS, full_scan=True, retrieval_k=None)
+    client, state = _fake_client('{"violations": [], "confidence": 0.9}', delay=0.05)
+    monkeypatch.setattr(analyzer, 'client', client)
+    financial = type('Financial', (), {'extract_key_info': lambda self, text: None,
+                                       'extract_deal_identifiers': lambda self, result: []})()
+    orchestrator = AnalysisOrchestrator(financial, analyzer, max_workers=2)
+
+    chunks = [f"Chunk {i} of the call." for i in range(12)]
+    with ThreadPoolExecutor(max_workers=2) as callers:
+        results = list(callers.map(lambda _: orchestrator.analyze(" ".join(chunks), translation_chunks=chunks), range(2)))
+    orchestrator.close()
+
+    assert all(result['violations_response']['windows'] == 4 for result in results)
+    assert state['calls'] == 8
+    assert state['peak'] <= 2
+
+
+def test_empty_transcript_sends_no_request(monkeypatch):
+    analyzer = ViolationAnalyzer(GUARDRAILS, full_scan=True)
+    client, state = _fake_client('{"violations": [], "confidence": 0.9}')
+    monkeypatch.setattr(analyzer, 'client', client)
+
+    result = analyzer.check_violations_windowed([])
+
+    assert state['calls'] == 0
+    assert result['windows'] == 0 and result['violations'] == []
@@ -0,0 +1,27 @@
+import json
+import os
+
+from compliance_prefilter import PreFilter, terms_from_knowledge_base
+
+GUARDRAILS = os.path.join(os.path.dirname(__file__), '..', 'knowledge_base', 'guardrails.json')
+
+
+def test_matches_whole_words_case_and_whitespace_insensitively():
+    prefilter = PreFilter(["tip", "off the record", "don't inform the board"])
+    text = "I will give you a Tip. Keep it off\n the record and don't inform the board. Multiple tipping points."
+
+    found = prefilter.matches(text)
+
+    assert [term for _, _, term in found] == ["tip", "off the record", "don't inform the board"]
+    start, end, _ = found[1]
+    assert text[start:end] == "off\n the record"
+    assert not prefilter.is_flagged("Multiple tipping points at hundred point two zero.")
+
+
+def test_knowledge_base_terms_skip_single_words():
+    with open(GUARDRAILS) as file:
+        terms = terms_from_knowledge_base(json.load(file))
+
+    assert "Whistle Blower Policy" in terms
+    assert "Accountability" not in terms
+    assert PreFilter.from_knowledge_base({}, []).screen("anything") == {'flagged': False, 'matched_terms': []}
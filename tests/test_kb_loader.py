@@ -0,0 +1,40 @@
+import json
+import os
+
+from kb_loader import KnowledgeBaseLoader
+from llm_clients import get_groq_client
+
+
+def test_unchanged_file_is_parsed_once(tmp_path):
+    path = tmp_path / 'guardrails.json'
+    path.write_text(json.dumps({'circular': {'title': 'v1'}}))
+    loader = KnowledgeBaseLoader()
+
+    first = loader.load(str(path))
+    assert loader.load(str(path)) is first
+    assert first['circular']['title'] == 'v1'
+
+
+def test_modified_file_is_reloaded(tmp_path):
+    path = tmp_path / 'guardrails.json'
+    path.write_text(json.dumps({'circular': {'title': 'v1'}}))
+    loader = KnowledgeBaseLoader()
+    loader.load(str(path))
+
+    path.write_text(json.dumps({'circular': {'title': 'v2'}}))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert loader.load(str(path))['circular']['title'] == 'v2'
+
+
+def test_unreadable_file_loads_as_empty(tmp_path):
+    loader = KnowledgeBaseLoader()
+    assert loader.load(str(tmp_path / 'missing.json')) == {}
+    (tmp_path / 'broken.json').write_text('{')
+    assert loader.load(str(tmp_path / 'broken.json')) == {}
+
+
+def test_groq_clients_are_shared_per_key():
+    assert get_groq_client('gsk_test_a') is get_groq_client('gsk_test_a')
+    assert get_groq_client('gsk_test_a') is not get_groq_client('gsk_test_b')
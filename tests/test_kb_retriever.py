@@ -0,0 +1,38 @@
+import os
+import shutil
+
+from kb_retriever import KnowledgeBaseIndex, KnowledgeBaseRetriever, sections_from_markdown
+
+KB_DIR = os.path.join(os.path.dirname(__file__), '..', 'knowledge_base')
+
+
+def test_markdown_is_split_at_headings():
+    sections = sections_from_markdown("Preamble\n# One\nfirst\n## Two\nsecond\n", 'c.md')
+    assert [(s['id'], s['title'], s['text']) for s in sections] == [
+        ('c.md#0', 'c.md', 'Preamble'), ('c.md#1', 'One', 'first'), ('c.md#2', 'Two', 'second')]
+
+
+def test_search_ranks_the_matching_section_first(tmp_path):
+    index = KnowledgeBaseIndex.load_or_build(KB_DIR, str(tmp_path / 'index.json'))
+
+    results = index.search("the whistle blower policy must be documented", k=3)
+
+    assert [r['id'] for r in results] == ['guardrails.json#3.7', '1722862941082.md#8']
+    assert results[0]['score'] >= results[1]['score'] > 0
+
+
+def test_index_is_persisted_and_rebuilt_when_files_change(tmp_path):
+    kb_dir = tmp_path / 'kb'
+    shutil.copytree(KB_DIR, kb_dir)
+    index_path = str(tmp_path / 'index.json')
+    retriever = KnowledgeBaseRetriever(str(kb_dir), index_path)
+
+    first = retriever.index()
+    assert os.path.exists(index_path)
+    assert KnowledgeBaseIndex.load_or_build(str(kb_dir), index_path).documents == first.documents
+    assert retriever.index() is first
+
+    (kb_dir / 'insider.md').write_text("# Insider trading\nNo dealing on unpublished price sensitive information.")
+    updated = retriever.index()
+    assert updated.version != first.version
+    assert updated.search("unpublished price sensitive", k=1)[0]['id'] == 'insider.md#1'
@@ -0,0 +1,127 @@
+import re
+
+import pytest
+
+import keyword_context
+from keyword_context import (DocumentIndex, KeywordMatcher, combined_context_v2, context_windows, following_tables,
+                             get_document_index, get_keyword_matcher, split_into_chunks)
+
+TABLE = "| Limit | Value |\n| - | - |\n| Exposure | 10% |\n"
+
+DOCUMENT = (
+    "# 1. Scope\n"
+    "Intro words here. The margin requirement applies to every broker. More words follow here.\n\n"
+    "Lead in line\n"
+    "Second line\n"
+    + TABLE +
+    "Footer line\n"
+    "After the table.\n"
+    "# 2. Reporting\n"
+    "Margin reports are due monthly.\n"
+    "# 3. Annex\n"
+    "Context line\n"
+    "| Report | Margin |\n| - | - |\n| Daily | Yes |\n"
+)
+
+
+def test_context_windows_merge_overlapping_matches():
+    content = "a b c key d e key f g h i j"
+    spans = [(content.index("key"), content.index("key") + 3), (content.rindex("key"), content.rindex("key") + 3)]
+
+    windows, words = context_windows(content, spans, pre_words=1, post_words=1)
+
+    assert [' '.join(words[start:end]) for start, end in windows] == ["c key d e key f"]
+
+
+def test_following_table_stops_at_headings():
+    chunks = split_into_chunks(DOCUMENT)
+    follow = following_tables(chunks)
+
+    scope = next(i for i, chunk in enumerate(chunks) if 'Intro words' in chunk['content'])
+    reporting = next(i for i, chunk in enumerate(chunks) if 'monthly' in chunk['content'])
+    assert 'Exposure' in chunks[follow[scope]]['content']
+    assert follow[reporting] is None
+
+
+def test_passages_attach_tables_once_in_document_order():
+    matches = combined_context_v2(DOCUMENT, ["margin"], pre_words=2, post_words=2)
+
+    assert matches == [
+        "here. The margin requirement applies\n\n" + "Second line\n" + TABLE + "Footer line\nAfter the table.",
+        "Margin reports are",
+        # The annex table mentions "margin" itself and sits under its own heading
+        "Context line\n| Report | Margin |\n| - | - |\n| Daily | Yes |",
+    ]
+
+
+def test_overlapping_matches_do_not_repeat_text():
+    matches = combined_context_v2("margin margin margin and more text", ["margin"], pre_words=5, post_words=5)
+    assert matches == ["margin margin margin and more text"]
+
+
+def test_no_keywords():
+    assert combined_context_v2(DOCUMENT, []) == []
+
+
+def _original_spans(keywords, text):
+    """Matches of the regex combined_context_v2 used before KeywordMatcher, in the caller's order."""
+    regex = re.compile(r'(?i)\b(?:' + '|'.join(map(re.escape, keywords)) + r')\b')
+    return [match.span() for match in regex.finditer(text)]
+
+
+def test_matcher_keeps_the_keyword_order_on_whole_words():
+    matcher = KeywordMatcher(["margin", "margin call", "call"])
+    text = "A Margin Call, then marginal calls and a call."
+
+    assert [text[start:end] for start, end in matcher.spans(text)] == ["Margin", "Call", "call"]
+    assert KeywordMatcher(["trading", "trading account"]).spans("the trading account") == [(4, 11)]
+    assert KeywordMatcher(["trading account", "trading"]).spans("the trading account") == [(4, 19)]
+    assert matcher.search("no match in marginal text") is False
+    assert matcher.search("submarginal, then a margin.") is True
+
+
+@pytest.mark.parametrize('keywords', [["ab", "bc", "c.d", "KYC"], ["margin", "margin call", "call", "Margin"],
+                                      ["margin call", "margin", "call"]])
+def test_matcher_agrees_with_the_original_regex(keywords):
+    matcher = KeywordMatcher(keywords)
+    for text in ("xabc bc", "abc ab_c ab", "C.D kyc-ab c.dx", "ßab straße ab", "İab ab",
+                 "A Margin Call, then marginal calls and a call."):
+        assert matcher.spans(text) == _original_spans(keywords, text)
+
+
+def test_automaton_and_regex_agree(monkeypatch):
+    pytest.importorskip('ahocorasick')
+    monkeypatch.setattr(keyword_context, 'AHOCORASICK_MIN_KEYWORDS', 1)
+    text = "kyc: a Margin Call (margin) then marginal calls, call_back and a call."
+
+    for keywords in (["margin", "margin call", "call", "KYC"], ["margin call", "Margin", "call", "kyc"]):
+        automaton = KeywordMatcher(keywords)
+        assert automaton._automaton is not None
+        assert automaton.spans(text) == _original_spans(keywords, text)
+
+
+def test_index_answers_repeated_queries_like_a_fresh_parse():
+    index = DocumentIndex(DOCUMENT)
+
+    for keywords in (["margin"], ["broker", "exposure"], ["monthly"]):
+        assert index.matching_chunks(keywords, 2, 2) == combined_context_v2(DOCUMENT, keywords, 2, 2)
+
+
+def test_indexes_and_matchers_are_reused():
+    assert get_document_index(DOCUMENT) is get_document_index(DOCUMENT)
+    assert get_keyword_matcher(["margin", "broker"]) is get_keyword_matcher(("margin", "broker"))
+
+
+def test_document_cache_is_bounded_by_size(monkeypatch):
+    monkeypatch.setattr(keyword_context, '_document_indexes', keyword_context._LruCache(100, size=len))
+    small, other, large = "a" * 40, "b" * 40, "c" * 150
+
+    first = get_document_index(small)
+    assert get_document_index(small) is first
+    get_document_index(other)
+    get_document_index("d" * 40)
+    assert keyword_context._document_indexes.total == 80
+    assert get_document_index(small) is not first
+    # A document over the whole budget is indexed but not kept
+    assert get_document_index(large) is not get_document_index(large)
+    assert keyword_context._document_indexes.total <= 100
@@ -0,0 +1,98 @@
+import io
+
+import pypdf
+
+from layout_cache import PAGE_BREAK, analyze_pages, compact_layout_result, page_digest, split_layout_result
+from transcript_cache import TranscriptCache
+
+VERSION = ("prebuilt-layout", "2024-02-29-preview", "markdown")
+
+
+def _pdf(sizes):
+    writer = pypdf.PdfWriter()
+    for width, height in sizes:
+        writer.add_blank_page(width, height)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return pypdf.PdfReader(io.BytesIO(buffer.getvalue()))
+
+
+def _layout(texts):
+    """A serialized layout result for pages with the given markdown, one table each."""
+    content, pages, tables = "", [], []
+    for number, text in enumerate(texts, start=1):
+        if content:
+            content += "\n\n<!-- PageBreak -->\n\n"
+        offset = len(content)
+        content += text
+        pages.append({"pageNumber": number, "width": 8.5, "height": 11, "unit": "inch",
+                      "spans": [{"offset": offset, "length": len(text)}], "words": [{"content": text}]})
+        tables.append({"rowCount": 1, "columnCount": 1, "spans": [{"offset": offset, "length": len(text)}],
+                       "boundingRegions": [{"pageNumber": number, "polygon": [0, 0, 1, 0, 1, 1, 0, 1]}],
+                       "cells": [{"content": text, "boundingRegions": [{"pageNumber": number}],
+                                  "spans": [{"offset": offset, "length": len(text)}]}]})
+    return {"content": content, "pages": pages, "tables": tables, "paragraphs": [], "styles": [{"isHandwritten": False}]}
+
+
+def test_page_digest_follows_the_page_not_the_file():
+    reader = _pdf([(612, 792), (792, 612), (612, 792)])
+    digests = [page_digest(page) for page in reader.pages]
+    assert digests[0] == digests[2] != digests[1]
+
+    writer = pypdf.PdfWriter()
+    writer.add_page(reader.pages[1])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    assert page_digest(pypdf.PdfReader(io.BytesIO(buffer.getvalue())).pages[0]) == digests[1]
+
+
+def test_compact_layout_result_keeps_what_the_markdown_needs():
+    compact = compact_layout_result(_layout(["| a |"]))
+    assert 'styles' not in compact
+    assert compact["pages"] == [{"pageNumber": 1, "width": 8.5, "height": 11, "unit": "inch",
+                                 "spans": [{"offset": 0, "length": 5}]}]
+    assert compact["tables"] == _layout(["| a |"])["tables"]
+
+
+def test_split_pages_look_analyzed_alone():
+    second = split_layout_result(_layout(["| a |", "| bb |"]))[1]
+    assert second["content"] == "| bb |"
+    assert second["pages"][0]["pageNumber"] == 1
+    assert second["tables"] == _layout(["| bb |"])["tables"]
+
+
+def test_only_uncached_pages_are_analyzed(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    texts = {f"d{i}": f"| page {i} |" for i in range(4)}
+    requests = []
+
+    def analyze_batch(digests):
+        def analyze(indices):
+            requests.append([digests[index] for index in indices])
+            return _layout([texts[digests[index]] for index in indices])
+        return analyze
+
+    digests = ["d0", "d1", "d2"]
+    result = analyze_pages(digests, cache, analyze_batch(digests), VERSION, max_pages_per_request=2)
+    assert requests == [["d0", "d1"], ["d2"]]
+    assert result["content"] == PAGE_BREAK.join(texts[digest] for digest in digests)
+    for number, table in enumerate(result["tables"], start=1):
+        span = table["spans"][0]
+        assert result["content"][span["offset"]:span["offset"] + span["length"]] == f"| page {number - 1} |"
+        assert table["boundingRegions"][0]["pageNumber"] == number
+
+    requests.clear()
+    assert analyze_pages(digests, cache, analyze_batch(digests), VERSION) == result
+    assert requests == []
+
+    # An inserted page shifts every later page, but only the new one is sent
+    amended = ["d0", "d3", "d1", "d2"]
+    result = analyze_pages(amended, cache, analyze_batch(amended), VERSION)
+    assert requests == [["d3"]]
+    assert result["content"] == PAGE_BREAK.join(texts[digest] for digest in amended)
+    assert [page["pageNumber"] for page in result["pages"]] == [1, 2, 3, 4]
+
+    # Another API version is a different cache entry
+    requests.clear()
+    analyze_pages(["d0"], cache, analyze_batch(["d0"]), VERSION[:1] + ("2024-11-30",) + VERSION[2:])
+    assert requests == [["d0"]]
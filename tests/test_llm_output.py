@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from compliance_checker import LLMResponseModel
+from llm_output import extract_json_object, parse_model_output
+from response_generator import AnalysisResponse
+
+
+@pytest.mark.parametrize('content', [
+    '{"a": 1}',
+    'Here is the JSON you asked for:\n{"a": 1}\nLet me know if you need anything else.',
+    '```json\n{"a": 1,}\n```',
+    'Note {braces} in prose first. {"a": 1, "b": "text with } brace"}',
+])
+def test_extract_json_object(content):
+    assert extract_json_object(content)['a'] == 1
+
+
+def test_extract_json_object_without_json():
+    assert extract_json_object('No deal was discussed.') is None
+
+
+def _violation(**overrides):
+    violation = {
+        'violation': 'Deal confirmed over a personal phone',
+        'related_circular': {
+            'title': 'Guardrails', 'issued_by': {'date': '2024-01-01'},
+            'section_number': '3.6', 'description': 'Recorded lines',
+        },
+        'excerpt_content': 'call me on my mobile',
+    }
+    violation.update(overrides)
+    return violation
+
+
+def test_fields_are_coerced_locally():
+    content = json.dumps({
+        'financial_info': {
+            'deal_details': {
+                'security_name': '7.38% Rajasthan SDL 2026',
+                'transaction_type': 'purchase',
+                'brokerage_money': '27,000 rupees',
+                'quantity': 150,
+            },
+        },
+        'confidence': 97,
+    })
+
+    data = parse_model_output(content, AnalysisResponse, reprompt=pytest.fail)
+
+    # A single deal object is accepted where the list of deals is expected
+    deal, = data['financial_info']['deal_details']
+    assert deal['transaction_type'] == 'Buy'
+    assert deal['brokerage_money'] == 27000.0
+    assert deal['quantity'] == '150'
+    assert data['confidence'] == 0.97
+
+
+def test_missing_field_is_reprompted_alone():
+    requests = []
+
+    def reprompt(request):
+        requests.append(request)
+        return '{"financial_info.deal_details.0.security_name": "7.98% Haryana SDL 2026"}'
+
+    content = '{"financial_info": {"deal_details": [{"transaction_type": "Sell", "price": "101.3222"}]}}'
+    data = parse_model_output(content, AnalysisResponse, defaults={'confidence': 0.0}, reprompt=reprompt)
+
+    assert len(requests) == 1
+    assert 'financial_info.deal_details.0.security_name' in requests[0]
+    assert 'price' not in requests[0]
+    deal, = data['financial_info']['deal_details']
+    assert deal['security_name'] == '7.98% Haryana SDL 2026'
+    assert deal['price'] == '101.3222'
+
+
+def test_unrepairable_items_are_dropped():
+    content = json.dumps({
+        'violations': [_violation(related_circular={'section_number': 3.6}), _violation()],
+        'confidence': 0.9,
+    })
+
+    data = parse_model_output(content, LLMResponseModel, reprompt=lambda request: 'I cannot help with that.')
+
+    assert len(data['violations']) == 1
+    assert data['violations'][0]['related_circular']['section_number'] == '3.6'
+
+
+def test_optional_object_is_nulled_when_unrepairable():
+    content = '{"financial_info": {"additional_info": "[1, 2]"}, "confidence": 0.5}'
+
+    data = parse_model_output(content, AnalysisResponse)
+
+    assert data['financial_info']['additional_info'] is None
+
+
+def test_reply_without_json_is_asked_for_again():
+    data = parse_model_output('Sorry, here goes.', LLMResponseModel,
+                              reprompt=lambda request: '{"violations": [], "confidence": 0.8}')
+    assert data == {'violations': [], 'confidence': 0.8}
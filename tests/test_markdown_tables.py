@@ -0,0 +1,50 @@
+from markdown_tables import count_table_columns, merge_tables_across_chunks, merge_vertical_tables, split_boundary_tables
+
+HEADER = "| Security | Limit |\n| - | - |"
+
+
+def _rows(*names):
+    return "\n".join(f"| {name} | 10% |" for name in names)
+
+
+def test_split_boundary_tables_skips_page_furniture():
+    content = f"<!-- PageHeader=\"SEBI\" -->\n\n{HEADER}\n{_rows('A')}\nSome text\n{HEADER}\n{_rows('B')}\n<!-- PageNumber=\"3\" -->\n"
+    assert split_boundary_tables(content) == ((2, 5), (6, 9))
+    assert split_boundary_tables("Only text\nhere") == (None, None)
+
+
+def test_count_table_columns():
+    assert count_table_columns(HEADER) == 2
+    assert count_table_columns("| a | b | c |") == 3
+
+
+def test_merge_vertical_tables_drops_the_repeated_header():
+    merged = merge_vertical_tables(f"{HEADER}\n{_rows('A')}", f"{HEADER}\n{_rows('B')}")
+    assert merged == f"{HEADER}\n{_rows('A')}\n| Security | Limit |\n{_rows('B')}"
+
+
+def test_tables_are_merged_across_a_chunk_boundary():
+    contents = [f"Intro\n{HEADER}\n{_rows('A')}\n<!-- PageBreak -->", f"{HEADER}\n{_rows('B')}\nAfter the table"]
+
+    merged = merge_tables_across_chunks(contents)
+
+    assert merged[0].startswith(f"Intro\n{HEADER}\n{_rows('A')}\n")
+    assert _rows('B') in merged[0]
+    assert merged[1] == "After the table"
+
+
+def test_tables_with_different_columns_are_not_merged():
+    contents = [f"{HEADER}\n{_rows('A')}", "| a | b | c |\n| - | - | - |\n| 1 | 2 | 3 |"]
+    assert merge_tables_across_chunks(contents) == contents
+
+
+def test_a_table_filling_a_whole_chunk_keeps_merging():
+    contents = [f"Intro\n{HEADER}\n{_rows('A')}", f"{HEADER}\n{_rows('B')}\n<!-- PageNumber=\"300\" -->",
+                f"{HEADER}\n{_rows('C')}\nAfter the table"]
+
+    merged = merge_tables_across_chunks(contents)
+
+    table = merged[0].split("Intro\n")[1]
+    assert [row for row in table.splitlines() if row.endswith('10% |')] == [_rows('A'), _rows('B'), _rows('C')]
+    assert merged[1].strip() == '<!-- PageNumber="300" -->'
+    assert merged[2] == "After the table"
@@ -0,0 +1,82 @@
+import json
+
+from response_generator import FinancialAnalyzer, detect_deal_boundaries, split_deals
+
+TRANSCRIPT = (
+    "Yes, so it is said that this is seven thirty-eight Rajasthan, fourteen September twenty-six, "
+    "this is our purchase from Standard Chartered Bank, one hundred and fifty crores. "
+    "Okay, twelve twenty-fourth is the deal time, and the second is seven ninety-eight Haryana, "
+    "twenty-ninth June twenty-sixth. This is our purchase from Standard Chartered Bank, amount two hundred crores."
+)
+
+
+def test_split_deals_cuts_only_at_deal_boundaries():
+    boundary, = detect_deal_boundaries(TRANSCRIPT)
+    assert TRANSCRIPT[boundary:].startswith('the second is')
+
+    assert split_deals(TRANSCRIPT, len(TRANSCRIPT)) == [(0, TRANSCRIPT)]
+    segments = split_deals(TRANSCRIPT, 200)
+    assert segments == [(0, TRANSCRIPT[:boundary]), (boundary, TRANSCRIPT[boundary:])]
+    # A deal longer than the limit is kept whole
+    assert split_deals(TRANSCRIPT, 10) == segments
+
+
+class _Completions:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, model, messages, temperature):
+        self.requests.append(messages[-1]['content'])
+        text = messages[-1]['content'].split('Conversation:\n')[-1]
+        security = 'Haryana' if 'Haryana' in text else 'Rajasthan'
+        excerpt = next(sentence for sentence in text.split(', ') if security in sentence)
+        deal = {'security_name': security, 'transaction_type': 'Buy', 'transcript_excerpt': excerpt}
+        reply = {'financial_info': {'deal_details': [deal]}, 'confidence': 0.9}
+        message = type('Message', (), {'content': json.dumps(reply)})
+        return type('Response', (), {'choices': [type('Choice', (), {'message': message})]})
+
+
+def test_long_calls_are_extracted_per_segment_with_spans(monkeypatch):
+    analyzer = FinancialAnalyzer()
+    completions = _Completions()
+    monkeypatch.setattr(analyzer, 'client', type('Client', (), {'chat': type('Chat', (), {'completions': completions})}))
+    monkeypatch.setattr(FinancialAnalyzer, 'MAX_SEGMENT_CHARS', 200)
+
+    result = analyzer.extract_key_info(TRANSCRIPT)
+    boundary, = detect_deal_boundaries(TRANSCRIPT)
+
+    assert result['segments'] == 2 and result['failed_segments'] == 0
+    # The later segment is sent with the opening of the call, where the counterparty is named
+    with_context = [request for request in completions.requests if request.startswith('Call context:')]
+    assert len(with_context) == 1
+    assert with_context[0].startswith('Call context:\n' + TRANSCRIPT[:boundary].strip())
+    assert 'Haryana' in with_context[0].split('Conversation:\n')[-1]
+    identifiers = analyzer.extract_deal_identifiers(result)
+    assert [deal['security_name'] for deal in identifiers] == ['Rajasthan', 'Haryana']
+    for deal in identifiers:
+        start, end = deal['transcript_span']
+        assert deal['security_name'] in TRANSCRIPT[start:end]
+
+    # Figures are parsed locally, sent ahead of the conversation, and fill what the model left out
+    assert any('"two hundred crores" = 2000000000 (quantity)' in request for request in completions.requests)
+    quantities = [deal['quantity'] for deal in result['financial_info']['deal_details']]
+    assert quantities == ['1500000000', '2000000000']
+    assert result['financial_info']['deal_details'][0]['local_checks']['quantity']['status'] == 'filled'
+
+
+def test_short_calls_report_segments_too(monkeypatch):
+    analyzer = FinancialAnalyzer()
+    completions = _Completions()
+    monkeypatch.setattr(analyzer, 'client', type('Client', (), {'chat': type('Chat', (), {'completions': completions})}))
+
+    result = analyzer.extract_key_info(TRANSCRIPT)
+
+    assert len(completions.requests) == 1
+    assert (result['segments'], result['failed_segments']) == (1, 0)
+
+
+def test_deal_identifiers_accept_a_single_deal():
+    analyzer = FinancialAnalyzer()
+    result = {'financial_info': {'deal_details': {'security_name': 'Rajasthan', 'transaction_type': 'Buy'}}}
+    assert [deal['security_name'] for deal in analyzer.extract_deal_identifiers(result)] == ['Rajasthan']
+    assert analyzer.extract_deal_identifiers({}) == []
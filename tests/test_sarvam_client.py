@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import CancelledError
+
+import numpy as np
+import pytest
+
+from audio_chunker import WavChunk
+from sarvam_client import AsyncSarvamClient, SarvamClient
+
+
+def _chunk(first_sample):
+    pcm = np.full(1600, first_sample, dtype=np.int16).tobytes()
+    return WavChunk(0, pcm, [(0, len(pcm))], 1, 2, 16000)
+
+
+@pytest.fixture
+def client(sarvam_stub):
+    client = SarvamClient('test-key', base_url=sarvam_stub.base_url, max_retries=3, max_concurrency_per_host=2,
+                          backoff_base=0.01)
+    yield client
+    client.close()
+
+
+def test_transcribe_and_translate(client):
+    assert client.transcribe(_chunk(7), 'hi-IN', 'saarika:v1') == {'transcript': 'S7'}
+    assert client.translate(_chunk(8), 'saaras:v1') == {'transcript': 'T8'}
+
+
+def test_requests_per_host_are_capped(client, sarvam_stub):
+    sarvam_stub.delay = (0.02, 0.04)
+    futures = [client.submit_translate(_chunk(i), 'saaras:v1') for i in range(8)]
+    assert [f.result()['transcript'] for f in futures] == [f"T{i}" for i in range(8)]
+    assert sarvam_stub.peak == 2
+
+
+def test_retry_after_is_honoured(client, sarvam_stub):
+    sarvam_stub.responses = [(429, {'Retry-After': '0.3'})]
+    start = time.monotonic()
+    assert client.translate(_chunk(3), 'saaras:v1') == {'transcript': 'T3'}
+    assert time.monotonic() - start >= 0.3
+    assert sarvam_stub.calls == 2
+
+
+def test_client_errors_are_not_retried(client, sarvam_stub):
+    sarvam_stub.responses = [(400, {})]
+    assert client.translate(_chunk(3), 'saaras:v1') is None
+    assert sarvam_stub.calls == 1
+
+
+def test_gives_up_after_max_retries(client, sarvam_stub):
+    sarvam_stub.fail.add(('T', 5))
+    assert client.translate(_chunk(5), 'saaras:v1') is None
+    assert sarvam_stub.calls == 3
+
+
+def test_cancel_in_flight_request(client, sarvam_stub):
+    sarvam_stub.delay = (0.5, 0.5)
+    future = client.submit_translate(_chunk(1), 'saaras:v1')
+    time.sleep(0.1)
+    future.cancel()
+    with pytest.raises(CancelledError):
+        future.result(timeout=1)
+
+
+def test_backoff_without_retry_after_is_bounded():
+    client = AsyncSarvamClient.__new__(AsyncSarvamClient)
+    client.backoff_base, client.backoff_max = 0.5, 2.0
+    delays = [client._backoff_delay(attempt) for attempt in range(10)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
@@ -0,0 +1,75 @@
+import pytest
+
+from spoken_numbers import find_mentions, local_deal_fields, reconcile_deal_fields, to_number
+
+
+@pytest.mark.parametrize('text, kind, value', [
+    ("one hundred and fifty crores", 'quantity', 1500000000),
+    ("two lakh fifty thousand", 'quantity', 250000),
+    ("fifty thousand crore", 'quantity', 500000000000),
+    ("one point five crore", 'quantity', 15000000),
+    ("150 crores", 'quantity', 1500000000),
+    ("hundred point two zero eight six", 'price', "100.2086"),
+    ("One zero one point three two two two three triple two", 'price', "101.32223222"),
+    ("thirty-six thousand brokerage", 'brokerage', 36000),
+    ("broker, Rs. 27,000", 'brokerage', 27000),
+    ("deal time twelve twenty-three", 'time', "12:23"),
+    ("twelve twenty-fourth is the deal time", 'time', "12:24"),
+    ("deal time nine oh five", 'time', "09:05"),
+    ("deal time 9:05", 'time', "09:05"),
+    ("the 7.18% GS 718G2037 paper", 'code', "718G2037"),
+    ("the 7.18% GS 718G2037 paper", 'coupon', "7.18"),
+    ("7.38 percent Rajasthan", 'coupon', "7.38"),
+    ("7.38 Rajasthan 2026 at 100.6828", 'coupon', "7.38"),
+    ("brokerage of one lakh", 'brokerage', 100000),
+])
+def test_mentions(text, kind, value):
+    mention = next(mention for mention in find_mentions(text) if mention.kind == kind)
+    assert mention.value == value
+
+
+def test_numbers_stop_at_clause_punctuation():
+    values = [mention.value for mention in find_mentions("amount two hundred crores. One zero one point five")]
+    assert values == [2000000000, "101.5"]
+
+
+def test_times_need_a_time_word_nearby():
+    assert [mention.kind for mention in find_mentions("this is seven thirty-eight Rajasthan")] == ['number', 'number']
+
+
+def test_local_deal_fields_take_the_last_time():
+    text = ("this is our purchase from Standard Chartered Bank, one hundred and fifty crores at hundred point "
+            "two zero eight six, stock market broker, twenty-seven thousand rupees. And deal time twelve "
+            "twenty-three, okay. Twelve twenty-fourth is the deal time.")
+    assert local_deal_fields(text) == {
+        'price': "100.2086", 'quantity': "1500000000", 'brokerage_money': 27000.0, 'deal_timestamp': "12:24",
+    }
+
+
+def test_coupon_rates_are_not_prices():
+    text = "7.38% Rajasthan 2026 at 100.6828"
+    assert [mention.kind for mention in find_mentions(text)] == ['coupon', 'number', 'price']
+    assert local_deal_fields(text)['price'] == "100.6828"
+
+    deal = {'price': "100.6828"}
+    reconcile_deal_fields(deal, text)
+    assert deal['local_checks']['price']['status'] == 'verified'
+
+
+def test_reconcile_fills_verifies_and_flags():
+    deal = {'price': "100.2086", 'quantity': "150 crores", 'brokerage_money': 36000.0, 'deal_timestamp': None}
+    text = "150 crores at hundred point two zero eight six, twenty-seven thousand brokerage, deal time twelve twenty-four"
+
+    reconcile_deal_fields(deal, text)
+
+    assert deal['deal_timestamp'] == "12:24"
+    assert deal['brokerage_money'] == 36000.0
+    assert {field: check['status'] for field, check in deal['local_checks'].items()} == {
+        'price': 'verified', 'quantity': 'verified', 'brokerage_money': 'mismatch', 'deal_timestamp': 'filled',
+    }
+
+
+def test_to_number():
+    assert to_number("1,50,00,00,000") == 1500000000
+    assert to_number("Rs. 12,500") == 12500
+    assert to_number(None) is None
@@ -0,0 +1,237 @@
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+import transcriber
+from sarvam_client import SarvamClient
+from transcriber import SarvamTranscriber
+from transcript_cache import TranscriptCache
+
+
+def _write_wav(path, seconds, framerate=16000):
+    samples = (np.random.default_rng(0).standard_normal(framerate * seconds) * 3000).astype(np.int16)
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(framerate)
+        wf.writeframes(samples.tobytes())
+
+
+def _drain(t, timeout=30):
+    events = list(t.iter_events(timeout=timeout))
+    transcripts = [event.transcript for event in events if event.transcript]
+    translations = [event.translation for event in events if event.translation]
+    return transcripts, translations
+
+
+@pytest.fixture
+def fake_api(monkeypatch, sarvam_stub):
+    monkeypatch.setattr(transcriber, 'identify_language_from_audio', lambda audio: 'hi-IN')
+    client = SarvamClient('test-key', base_url=sarvam_stub.base_url, max_retries=1)
+    sarvam_stub.client = client
+    yield sarvam_stub
+    client.close()
+
+
+def _expected_markers(path):
+    with wave.open(str(path), 'rb') as wf:
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    step = wf.getframerate() * SarvamTranscriber.CHUNK_LENGTH_MS // 1000
+    return [int(samples[i]) for i in range(0, len(samples), step)]
+
+
+def test_results_are_ordered_and_concurrency_is_bounded(tmp_path, fake_api):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 8 * 30 + 5)
+    markers = _expected_markers(path)
+
+    t = SarvamTranscriber(client=fake_api.client, max_concurrent_requests=3, silence_aware=False)
+    t.process_file(str(path))
+    transcripts, translations = _drain(t)
+
+    assert transcripts == [f"S{m}" for m in markers]
+    assert translations == [f"T{m}" for m in markers]
+    assert fake_api.calls == 2 * len(markers)
+    assert 1 <= fake_api.peak <= 3
+    assert not t.is_partial()
+
+
+def test_failed_chunk_is_reported_and_later_chunks_still_arrive(tmp_path, fake_api):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 3 * 30)
+    markers = _expected_markers(path)
+    fake_api.fail.add(('S', markers[1]))
+
+    t = SarvamTranscriber(client=fake_api.client, max_concurrent_requests=2, silence_aware=False)
+    t.process_file(str(path))
+    transcripts, translations = _drain(t)
+
+    assert transcripts == [f"S{markers[0]}", f"S{markers[2]}"]
+    assert translations == [f"T{m}" for m in markers]
+    assert t.failed_chunks == [(1, 'transcription')]
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_invalid_concurrency_limit_is_rejected(limit):
+    with pytest.raises(ValueError):
+        SarvamTranscriber(max_concurrent_requests=limit)
+
+
+def test_process_stream_uploads_decoded_chunks_in_order(tmp_path, fake_api, monkeypatch):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 4 * 30 + 5)
+    markers = _expected_markers(path)
+    with wave.open(str(path), 'rb') as wf:
+        pcm = wf.readframes(wf.getnframes())
+
+    def stream_pcm(input_file, block_size=8192):
+        for start in range(0, len(pcm), block_size):
+            yield pcm[start:start + block_size]
+
+    monkeypatch.setattr(transcriber.AudioPreprocessor, 'stream_pcm', staticmethod(stream_pcm))
+    monkeypatch.setattr(transcriber.AudioPreprocessor, 'probe_duration_ms', staticmethod(lambda f: 125000.0))
+
+    t = SarvamTranscriber(client=fake_api.client, max_concurrent_requests=2, silence_aware=False)
+    t.process_stream(str(path))
+    transcripts, translations = _drain(t)
+
+    assert t.get_language_code() == 'hi-IN'
+    assert transcripts == [f"S{m}" for m in markers]
+    assert translations == [f"T{m}" for m in markers]
+    assert t.total_chunks == len(markers)
+    assert t.error is None
+
+
+def test_translations_start_before_language_is_identified(tmp_path, fake_api, monkeypatch):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 2 * 30)
+    release = threading.Event()
+
+    def identify(audio):
+        release.wait(5)
+        return 'hi-IN'
+
+    monkeypatch.setattr(transcriber, 'identify_language_from_audio', identify)
+    t = SarvamTranscriber(client=fake_api.client, silence_aware=False)
+    t.process_file(str(path))
+
+    deadline = time.time() + 5
+    while fake_api.calls < 2:
+        assert time.time() < deadline, "translations waited for language identification"
+        time.sleep(0.005)
+    assert fake_api.languages == []
+    release.set()
+    _drain(t)
+    assert fake_api.languages == ['hi-IN', 'hi-IN']
+
+
+def test_pending_language_does_not_hold_workers(tmp_path, fake_api, monkeypatch):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 3 * 30)
+    release = threading.Event()
+
+    def identify(audio):
+        release.wait(5)
+        return 'hi-IN'
+
+    monkeypatch.setattr(transcriber, 'identify_language_from_audio', identify)
+    # A single worker: a transcription waiting for the language would block every translation
+    t = SarvamTranscriber(client=fake_api.client, max_concurrent_requests=1, silence_aware=False)
+    t.process_file(str(path))
+
+    deadline = time.time() + 5
+    while fake_api.calls < 3:
+        assert time.time() < deadline, "translations were blocked behind transcriptions"
+        time.sleep(0.005)
+    release.set()
+    _drain(t)
+    assert fake_api.languages == ['hi-IN'] * 3
+
+
+def test_chunks_are_retranscribed_when_the_language_vote_changes(tmp_path, fake_api, monkeypatch):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 4 * 30)
+    markers = _expected_markers(path)
+    leading = {m: i for i, m in enumerate(markers)}
+
+    def identify(audio):
+        (first_sample,) = np.frombuffer(audio[44:46], dtype=np.int16)
+        if leading[int(first_sample)] == 0:
+            return 'en-IN'
+        time.sleep(0.3)
+        return 'hi-IN'
+
+    monkeypatch.setattr(transcriber, 'identify_language_from_audio', identify)
+    monkeypatch.setattr(SarvamTranscriber, 'LANGUAGE_SAMPLE_CHUNKS', 3)
+    t = SarvamTranscriber(client=fake_api.client, silence_aware=False)
+    t.process_file(str(path))
+    transcripts, _ = _drain(t)
+
+    assert t.get_language_code() == 'hi-IN'
+    assert transcripts == [f"S{m}" for m in markers]
+    assert 'en-IN' in fake_api.languages
+    assert fake_api.languages.count('hi-IN') == len(markers)
+
+
+def test_iter_events_yields_ordered_chunks_then_stops(tmp_path, fake_api):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 5 * 30 + 10)
+    markers = _expected_markers(path)
+    fake_api.fail.add(('T', markers[3]))
+
+    t = SarvamTranscriber(client=fake_api.client, max_concurrent_requests=4, silence_aware=False)
+    t.process_file(str(path))
+    events = list(t.iter_events(timeout=30))
+
+    assert [e.index for e in events] == list(range(len(markers)))
+    assert [e.transcript for e in events] == [f"S{m}" for m in markers]
+    assert [e.translation for e in events] == [f"T{m}" if i != 3 else None for i, m in enumerate(markers)]
+    assert [e.duration_ms for e in events] == [30000.0] * 5 + [10000.0]
+    assert all(a.elapsed_seconds <= b.elapsed_seconds for a, b in zip(events, events[1:]))
+    assert not t.is_processing
+
+
+def test_repeat_file_is_served_from_cache(tmp_path, fake_api):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 2 * 30 + 5)
+    cache = TranscriptCache(str(tmp_path / 'cache'))
+
+    first = SarvamTranscriber(client=fake_api.client, silence_aware=False, cache=cache)
+    first.process_file(str(path))
+    expected = _drain(first)
+    calls = fake_api.calls
+
+    second = SarvamTranscriber(client=fake_api.client, silence_aware=False, cache=cache)
+    second.process_file(str(path))
+
+    assert _drain(second) == expected
+    assert second.from_cache
+    assert second.get_language_code() == 'hi-IN'
+    assert fake_api.calls == calls
+
+
+def test_partial_run_resumes_with_only_the_missing_chunks(tmp_path, fake_api):
+    path = tmp_path / 'call.wav'
+    _write_wav(path, 3 * 30)
+    markers = _expected_markers(path)
+    cache = TranscriptCache(str(tmp_path / 'cache'))
+    fake_api.fail.add(('T', markers[2]))
+
+    first = SarvamTranscriber(client=fake_api.client, silence_aware=False, cache=cache)
+    first.process_file(str(path))
+    _drain(first)
+    assert first.get_missing_chunks() == [(2, 'translation')]
+    assert cache.missing_chunks(first.audio_key, 3, {'translation': SarvamTranscriber.TRANSLATION_MODEL}) == [(2, 'translation')]
+
+    fake_api.fail.clear()
+    calls = fake_api.calls
+    second = SarvamTranscriber(client=fake_api.client, silence_aware=False, cache=cache)
+    second.process_file(str(path))
+    transcripts, translations = _drain(second)
+
+    assert fake_api.calls == calls + 1
+    assert translations == [f"T{m}" for m in markers]
+    assert second.get_missing_chunks() == []
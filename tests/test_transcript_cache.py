@@ -0,0 +1,56 @@
+import os
+import time
+
+import transcript_cache
+
+from transcript_cache import TranscriptCache, hash_buffer
+
+
+def test_put_get_and_alias(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    key = TranscriptCache.make_key('pcm-digest', 'saarika:v1')
+    assert cache.get(key) is None
+
+    cache.put(key, {'language_code': 'hi-IN', 'chunks': []})
+    cache.put_alias('source-digest', key)
+
+    assert TranscriptCache(str(tmp_path)).get(key) == {'language_code': 'hi-IN', 'chunks': []}
+    assert cache.get_alias('source-digest') == key
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = TranscriptCache(str(tmp_path), max_bytes=2500)
+    payload = 'x' * 1000
+    for name in ('a', 'b'):
+        cache.put(name, payload)
+    # Age both entries, then touch 'a' so 'b' becomes the oldest
+    for name, age in (('a', 20), ('b', 10)):
+        os.utime(tmp_path / f"{name}.json", (time.time() - age, time.time() - age))
+    assert cache.get('a') == payload
+
+    cache.put('c', payload)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == payload
+    assert cache.get('c') == payload
+
+
+def test_writes_do_not_rescan_the_directory(tmp_path, monkeypatch):
+    cache = TranscriptCache(str(tmp_path), max_bytes=10_000)
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(transcript_cache.os, 'scandir', lambda path: scans.append(path) or real_scandir(path))
+
+    for index in range(20):
+        cache.put(f"chunk-{index}", 'x' * 100)
+    assert len(scans) == 1  # measured once, then tracked per write
+
+    # Growing an entry past the budget triggers a measured eviction
+    cache.put('chunk-0', 'x' * 9000)
+    assert len(scans) == 2
+    assert sum(entry.stat().st_size for entry in real_scandir(tmp_path)) <= 10_000
+
+
+def test_hash_buffer_range_matches_slice():
+    data = bytes(range(256)) * 10
+    assert hash_buffer(data, 10, 2000, block_size=64) == hash_buffer(data[10:2000])
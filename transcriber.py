@@ -2,119 +2,470 @@
 
 import os
 import json
-import tempfile
-import requests
 import time
-import io
+import math
+import hashlib
 import threading
 import queue
-import wave
 import numpy as np
+from collections import deque
+from typing import NamedTuple, Optional
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from audio_chunker import MappedWav, PcmStreamChunker, split_on_silence
 from audio_preprocessor import AudioPreprocessor
-from language_identifier import identify_language
+from language_identifier import LanguageDetection, LanguageIdentifier, identify_language_from_audio
+from sarvam_client import get_shared_client
+from transcript_cache import TranscriptCache, hash_buffer, hash_file
+
+class ChunkEvent(NamedTuple):
+    """One chunk's results, emitted in chunk order as soon as both requests for it are done."""
+    index: int
+    transcript: Optional[str]  # None if the chunk failed
+    translation: Optional[str]
+    duration_ms: Optional[float]  # audio length of the chunk; None when replayed from the cache
+    elapsed_seconds: float  # time since the run started
 
 class SarvamTranscriber:
     API_KEY = "e8ece64e-6ff8-495b-9159-9d034c3f83dc"
     CHUNK_LENGTH_MS = 30000  # 30 seconds
     MAX_AUDIO_LENGTH_MS = 1800000  # 30 minutes
+    MAX_CONCURRENT_REQUESTS = 8  # in-flight API requests per file
+    LANGUAGE_SAMPLE_CHUNKS = 2  # leading chunks voted on by language identification
+    TRANSCRIPTION_MODEL = 'saarika:v1'
+    TRANSLATION_MODEL = 'saaras:v1'
 
-    def __init__(self):
-        self.transcription_queue = queue.Queue()
-        self.translation_queue = queue.Queue()
+    def __init__(self, max_concurrent_requests=MAX_CONCURRENT_REQUESTS, silence_aware=True, cache=None, client=None):
+        if max_concurrent_requests < 1:
+            raise ValueError(f"max_concurrent_requests must be at least 1, got {max_concurrent_requests}")
+        self.event_queue = queue.Queue()
         self.is_processing = False
         self.total_chunks = 0
         self.processed_chunks = 0
-        self.language_code = None
+        self.failed_chunks = []
+        self.silence_report = None
+        self.error = None
+        self._language = LanguageDetection.known(None)
+        self.silence_aware = silence_aware
+        self.cache = cache
+        self.audio_key = None
+        self.chunk_results = []
+        self._unsaved_chunk_results = []
+        self.from_cache = False
+        self.max_concurrent_requests = max_concurrent_requests
+        # The shared client pools connections and caps in-flight requests across all transcribers
+        self.client = client or get_shared_client(self.API_KEY, max_concurrency_per_host=self.MAX_CONCURRENT_REQUESTS)
+        self._progress_lock = threading.Lock()
+        self._in_flight = set()
+        self._cancelled = threading.Event()
+        self._worker = None
+        self._started_at = time.time()
 
     @staticmethod
-    def split_audio(file_path, chunk_length_ms=30000):
-        with wave.open(file_path, 'rb') as wf:
-            framerate = wf.getframerate()
-            n_frames = wf.getnframes()
-            
-            total_duration_ms = (n_frames / framerate) * 1000
-            if total_duration_ms > SarvamTranscriber.MAX_AUDIO_LENGTH_MS:
-                raise ValueError(f"Audio file is too long. Maximum length is {SarvamTranscriber.MAX_AUDIO_LENGTH_MS/60000} minutes.")
-            
-            chunks = []
-            for i in range(0, n_frames, int(framerate * chunk_length_ms / 1000)):
-                wf.setpos(i)
-                chunk_frames = wf.readframes(int(framerate * chunk_length_ms / 1000))
-                chunk = io.BytesIO()
-                with wave.open(chunk, 'wb') as chunk_wf:
-                    chunk_wf.setnchannels(wf.getnchannels())
-                    chunk_wf.setsampwidth(wf.getsampwidth())
-                    chunk_wf.setframerate(framerate)
-                    chunk_wf.writeframes(chunk_frames)
-                chunk.seek(0)
-                chunks.append(chunk)
-            
-            return chunks
-
-    @classmethod
-    def api_request(cls, url, files, data, headers, max_retries=3):
-        for attempt in range(max_retries):
+    def split_audio(wav, chunk_length_ms=CHUNK_LENGTH_MS, silence_aware=True):
+        """
+        Split a memory-mapped WAV into chunks. Chunks are views into the mapped file,
+        so no PCM is copied until a chunk is read for upload.
+
+        :param wav: MappedWav of the preprocessed audio
+        :param chunk_length_ms: Maximum length of each chunk in milliseconds
+        :param silence_aware: Cut at pauses near the limit and drop long silences instead of fixed offsets
+        :return: Tuple of (list of WavChunk in playback order, silence report dict)
+        """
+        if wav.duration_ms > SarvamTranscriber.MAX_AUDIO_LENGTH_MS:
+            raise ValueError(f"Audio file is too long. Maximum length is {SarvamTranscriber.MAX_AUDIO_LENGTH_MS/60000} minutes.")
+
+        if silence_aware:
+            return split_on_silence(wav, chunk_length_ms)
+
+        frames_per_chunk = int(wav.framerate * chunk_length_ms / 1000)
+        chunks = [
+            wav.chunk(index, start_frame, min(start_frame + frames_per_chunk, wav.n_frames))
+            for index, start_frame in enumerate(range(0, wav.n_frames, frames_per_chunk))
+        ]
+        report = {"total_seconds": round(wav.duration_ms / 1000, 2), "skipped_seconds": 0.0, "chunks": len(chunks)}
+        return chunks, report
+
+    @property
+    def language_code(self):
+        # Provisional while identification is still voting, None before it has answered
+        return self._language.language_code
+
+    def _load_chunk_result(self, index, endpoint, model):
+        if self.cache is None or self.audio_key is None:
+            return None
+        return self.cache.get_chunk_result(self.audio_key, index, endpoint, model)
+
+    def _save_chunk_result(self, index, endpoint, model, result):
+        if self.cache is None:
+            return
+        if self.audio_key is None:
+            # Streaming runs learn their audio key only once decoding ends
+            with self._progress_lock:
+                self._unsaved_chunk_results.append((index, endpoint, model, result))
+            return
+        try:
+            self.cache.put_chunk_result(self.audio_key, index, endpoint, model, result)
+        except OSError as e:
+            print(f"Could not store result for chunk {index} ({endpoint}): {e}")
+
+    def _fetch_chunk(self, chunk, endpoint, model, submit):
+        # A chunk fetched by an earlier, partially failed run is reused instead of re-sent
+        result = self._load_chunk_result(chunk.index, endpoint, model)
+
+        if result is None and not self._cancelled.is_set():
+            future = submit()
+            with self._progress_lock:
+                self._in_flight.add(future)
             try:
-                response = requests.post(url, files=files, data=data, headers=headers, timeout=30)
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.RequestException as e:
-                if attempt == max_retries - 1:
-                    print(f"Error: {e}")
-                    return None
-            time.sleep(2 ** attempt)
-
-    def process_audio_chunk(self, chunk, is_translation):
-        url = "https://api.sarvam.ai/speech-to-text-translate" if is_translation else "https://api.sarvam.ai/speech-to-text"
-        
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            temp_file.write(chunk.getvalue())
-            temp_file_path = temp_file.name
-
-        with open(temp_file_path, 'rb') as file:
-            files = {'file': ('chunk.wav', file, 'audio/wav')}
-            data = {'language_code': self.language_code, 'model': 'saarika:v1'} if not is_translation else {'model': 'saaras:v1'}
-            headers = {"api-subscription-key": self.API_KEY}
-
-            result = self.api_request(url, files, data, headers)
-
-        os.unlink(temp_file_path)
-        self.processed_chunks += 1
+                result = future.result()
+            except CancelledError:
+                result = None
+            finally:
+                with self._progress_lock:
+                    self._in_flight.discard(future)
+
+            if result is not None:
+                self._save_chunk_result(chunk.index, endpoint, model, result)
         return result
 
-    def process_file(self, file_path):
+    def _transcribe_chunk(self, chunk, language_code):
+        # Transcripts also depend on the language code they were requested with
+        return self._fetch_chunk(
+            chunk, 'transcription', f"{self.TRANSCRIPTION_MODEL}/{language_code}",
+            lambda: self.client.submit_transcribe(chunk, language_code, self.TRANSCRIPTION_MODEL),
+        )
+
+    def _count_processed(self):
+        with self._progress_lock:
+            self.processed_chunks += 1
+
+    def _translate_chunk(self, chunk):
+        result = self._fetch_chunk(
+            chunk, 'translation', self.TRANSLATION_MODEL,
+            lambda: self.client.submit_translate(chunk, self.TRANSLATION_MODEL),
+        )
+        self._count_processed()
+        return result
+
+    def _submit_transcription(self, executor, chunk):
+        """
+        Transcribe `chunk` without holding a worker while the language is identified: the
+        request is submitted once the first language answer is in, and again with the
+        settled code if the final vote over the leading samples disagrees.
+
+        :return: Future with the transcription result
+        """
+        done = Future()
+
+        def settle(future):
+            if future.exception() is not None:
+                done.set_exception(future.exception())
+                return
+            self._count_processed()
+            done.set_result(future.result())
+
+        def submit(language_code, then):
+            try:
+                future = executor.submit(self._transcribe_chunk, chunk, language_code)
+            except Exception as e:
+                done.set_exception(e)
+                return
+            future.add_done_callback(then)
+
+        def reconcile(first, language_code):
+            final_code = self._language.language_code
+            if final_code != language_code and first.exception() is None:
+                submit(final_code, settle)
+            else:
+                settle(first)
+
+        def start():
+            language_code = self._language.language_code
+            submit(language_code, lambda first: self._language.when_final(lambda: reconcile(first, language_code)))
+
+        self._language.when_provisional(start)
+        return done
+
+    def _submit_chunk(self, executor, chunk):
+        """Start both requests for `chunk`; returns (transcription future, translation future)."""
+        # Translations go first as they need no language
+        translation_future = executor.submit(self._translate_chunk, chunk)
+        return self._submit_transcription(executor, chunk), translation_future
+
+    def _collect_result(self, index, endpoint, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error processing chunk {index} ({endpoint}): {e}")
+            result = None
+        if result is None:
+            self.failed_chunks.append((index, endpoint))
+        return result
+
+    def _publish(self, chunk, transcription_future, translation_future):
+        # A failed chunk is recorded in failed_chunks and skipped so later chunks still come through
+        transcription = self._collect_result(chunk.index, 'transcription', transcription_future)
+        translation = self._collect_result(chunk.index, 'translation', translation_future)
+        self.chunk_results.append({'transcription': transcription, 'translation': translation})
+        self._emit(chunk.index, transcription, translation, chunk.duration_ms)
+
+    def _emit(self, index, transcription, translation, duration_ms):
+        transcript = transcription.get('transcript', '') if transcription else None
+        translated = translation.get('transcript', '') if translation else None
+        self.event_queue.put(ChunkEvent(index, transcript, translated, duration_ms, round(time.time() - self._started_at, 3)))
+
+    def _end_run(self):
+        self.is_processing = False
+        # Sentinel that ends iter_events()
+        self.event_queue.put(None)
+
+    def _cache_key(self, pcm_digest):
+        # Anything that changes the chunk results must be part of the key
+        return TranscriptCache.make_key(
+            pcm_digest, self.TRANSCRIPTION_MODEL, self.TRANSLATION_MODEL, LanguageIdentifier.MODEL,
+            self.CHUNK_LENGTH_MS, self.silence_aware,
+        )
+
+    def _replay_cached(self, entry):
+        """Serve a finished run from the transcript cache without any API calls."""
+        self.from_cache = True
+        self._language = LanguageDetection.known(entry['language_code'])
+        self.silence_report = entry.get('silence_report')
+        self.chunk_results = entry['chunks']
+        self.total_chunks = len(self.chunk_results)
+        self.processed_chunks = 2 * self.total_chunks
+        for index, result in enumerate(self.chunk_results):
+            self._emit(index, result['transcription'], result['translation'], None)
+        print(f"Loaded {self.total_chunks} chunks from transcript cache ({self.audio_key[:12]})")
+        self._end_run()
+
+    def _language_key(self):
+        return TranscriptCache.make_key('language', self.audio_key)
+
+    def _finish_caching(self, source_digest=None):
+        if self.cache is None or self.audio_key is None or self.error:
+            return
+        try:
+            self.cache.put(self._language_key(), {'language_code': self.language_code})
+            for index, endpoint, model, result in self._unsaved_chunk_results:
+                self.cache.put_chunk_result(self.audio_key, index, endpoint, model, result)
+            self._unsaved_chunk_results = []
+            # The alias is recorded even for partial runs so a retry can find the stored chunks
+            if source_digest:
+                self.cache.put_alias(source_digest, self.audio_key)
+            if not self.failed_chunks:
+                self.cache.put(self.audio_key, {
+                    'language_code': self.language_code,
+                    'silence_report': self.silence_report,
+                    'chunks': self.chunk_results,
+                })
+        except OSError as e:
+            print(f"Could not write transcript cache entry: {e}")
+
+    def _start_language_detection(self):
+        """
+        Set up language identification for this run. Identification runs in the
+        background on the first LANGUAGE_SAMPLE_CHUNKS chunks, so translation requests
+        (which need no language) and the first transcription requests are not held up
+        by a serial round trip. A language already known for this audio is reused.
+        """
+        entry = self.cache.get(self._language_key()) if self.cache is not None and self.audio_key else None
+        if entry:
+            self._language = LanguageDetection.known(entry['language_code'])
+        else:
+            self._language = LanguageDetection(
+                identify=lambda audio: identify_language_from_audio(audio),
+                max_samples=self.LANGUAGE_SAMPLE_CHUNKS,
+            )
+
+    def _sample_language(self, chunk):
+        if chunk.index < self.LANGUAGE_SAMPLE_CHUNKS:
+            self._language.add_sample(chunk.getvalue())
+
+    def cancel(self):
+        """Abort outstanding requests; chunks that did not finish are reported as missing."""
+        self._cancelled.set()
+        with self._progress_lock:
+            in_flight = list(self._in_flight)
+        for future in in_flight:
+            future.cancel()
+
+    def get_missing_chunks(self):
+        """(index, endpoint) pairs that failed in the last run; re-running the same audio fetches only these."""
+        return sorted(self.failed_chunks)
+
+    def _reset(self):
         self.is_processing = True
-        
-        # Identify the language
-        self.language_code = identify_language(file_path)
-        print(f"Identified language code: {self.language_code}")
+        self.event_queue = queue.Queue()
+        self._started_at = time.time()
+        self.total_chunks = 0
+        self.processed_chunks = 0
+        self.failed_chunks = []
+        self.silence_report = None
+        self.error = None
+        self.audio_key = None
+        self.chunk_results = []
+        self._unsaved_chunk_results = []
+        self.from_cache = False
+        self._cancelled.clear()
+        self._worker = None
 
-        audio_chunks = self.split_audio(file_path)
+    def process_file(self, file_path):
+        self._reset()
+
+        wav = MappedWav(file_path)
+        if self.cache is not None:
+            self.audio_key = self._cache_key(hash_buffer(wav.buffer, wav.data_offset, wav.data_offset + wav.data_size))
+            entry = self.cache.get(self.audio_key)
+            if entry:
+                wav.close()
+                self._replay_cached(entry)
+                return
+
+        try:
+            audio_chunks, self.silence_report = self.split_audio(wav, silence_aware=self.silence_aware)
+        except Exception:
+            wav.close()
+            self._end_run()
+            raise
+        self._start_language_detection()
+        for chunk in audio_chunks[:self.LANGUAGE_SAMPLE_CHUNKS]:
+            self._sample_language(chunk)
+        self._language.close()
         self.total_chunks = len(audio_chunks)
+        print(f"Split into {self.total_chunks} chunks, skipped {self.silence_report['skipped_seconds']}s of "
+              f"{self.silence_report['total_seconds']}s as silence")
 
         def process_chunks():
-            for chunk in audio_chunks:
-                transcription = self.process_audio_chunk(chunk, is_translation=False)
-                translation = self.process_audio_chunk(chunk, is_translation=True)
-                if transcription:
-                    self.transcription_queue.put(transcription.get('transcript', ''))
-                if translation:
-                    self.translation_queue.put(translation.get('transcript', ''))
-            self.is_processing = False
+            try:
+                with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+                    # Both endpoints for every chunk are requested up front; the pool bounds how many are
+                    # in flight, and transcriptions join it once the language is known
+                    futures = [self._submit_chunk(executor, chunk) for chunk in audio_chunks]
 
-        threading.Thread(target=process_chunks, daemon=True).start()
+                    # Hand results out in chunk order, even though requests complete out of order
+                    for chunk, (transcription_future, translation_future) in zip(audio_chunks, futures):
+                        self._publish(chunk, transcription_future, translation_future)
+                print(f"Identified language code: {self.language_code}")
+                self._finish_caching()
+            finally:
+                wav.close()
+                self._end_run()
 
-    def get_transcription(self):
-        return self.transcription_queue.get() if not self.transcription_queue.empty() else None
+        self._worker = threading.Thread(target=process_chunks, daemon=True)
+        self._worker.start()
 
-    def get_translation(self):
-        return self.translation_queue.get() if not self.translation_queue.empty() else None
+    def process_stream(self, input_file):
+        """
+        Decode `input_file` with a streaming ffmpeg pipe and upload each chunk as soon as
+        it has been decoded, so network work overlaps with decoding. Accepts any format
+        supported by AudioPreprocessor; no intermediate WAV is written.
+        """
+        self._reset()
 
-    def is_finished(self):
-        return not self.is_processing and self.transcription_queue.empty() and self.translation_queue.empty()
+        # The normalized PCM hash is only known once decoding ends, so the source file's
+        # hash is recorded as an alias to find the entry again on a repeat upload
+        source_digest = None
+        if self.cache is not None:
+            source_digest = hash_file(input_file)
+            self.audio_key = self.cache.get_alias(source_digest)
+            entry = self.cache.get(self.audio_key) if self.audio_key else None
+            if entry:
+                self._replay_cached(entry)
+                return
+            # A known key without a full entry means an earlier partial run; its chunks are reused
+
+        duration_ms = AudioPreprocessor.probe_duration_ms(input_file)
+        if duration_ms:
+            # Estimate for the progress bar; corrected once decoding finishes
+            self.total_chunks = max(1, math.ceil(duration_ms / self.CHUNK_LENGTH_MS))
+
+        pcm_digest = hashlib.sha256()
+
+        def hashed(blocks):
+            for block in blocks:
+                pcm_digest.update(block)
+                yield block
+
+        chunker = PcmStreamChunker(
+            hashed(AudioPreprocessor.stream_pcm(input_file)),
+            framerate=AudioPreprocessor.SAMPLE_RATE,
+            nchannels=AudioPreprocessor.CHANNELS,
+            max_chunk_ms=self.CHUNK_LENGTH_MS,
+            silence_aware=self.silence_aware,
+            max_duration_ms=self.MAX_AUDIO_LENGTH_MS,
+        )
+        # Language identification votes on the first decoded chunks while they are uploaded
+        self._start_language_detection()
+
+        def process_chunks():
+            pending = deque()
+            executor = ThreadPoolExecutor(max_workers=self.max_concurrent_requests)
+            try:
+                try:
+                    for chunk in chunker:
+                        self._sample_language(chunk)
+                        pending.append((chunk, *self._submit_chunk(executor, chunk)))
+                        self.total_chunks = max(self.total_chunks, chunk.index + 1)
+
+                        # Publish finished chunks in order; block once enough decoded chunks are
+                        # waiting so a slow API cannot pull the whole file into memory
+                        while pending and (all(f.done() for f in pending[0][1:])
+                                           or len(pending) >= 2 * self.max_concurrent_requests):
+                            self._publish(*pending.popleft())
+                finally:
+                    # Calls shorter than LANGUAGE_SAMPLE_CHUNKS (or cut short by a decode
+                    # error) settle on the samples they have, releasing waiting transcriptions
+                    self._language.close()
+            except Exception as e:
+                print(f"Error while streaming {input_file}: {e}")
+                self.error = e
+            finally:
+                # Transcriptions may still be waiting for the language, so the pool stays up
+                # until every chunk is published
+                while pending:
+                    self._publish(*pending.popleft())
+                executor.shutdown()
+                self.silence_report = chunker.report
+                self.total_chunks = chunker.chunk_count
+                print(f"Identified language code: {self.language_code}")
+                print(f"Split into {self.total_chunks} chunks, skipped {self.silence_report['skipped_seconds']}s of "
+                      f"{self.silence_report['total_seconds']}s as silence")
+                if self.cache is not None and not self.error:
+                    self.audio_key = self._cache_key(pcm_digest.hexdigest())
+                    self._finish_caching(source_digest)
+                self._end_run()
+
+        self._worker = threading.Thread(target=process_chunks, daemon=True)
+        self._worker.start()
+
+    def wait(self, timeout=None):
+        """Block until the current run has finished; returns False if `timeout` expired first."""
+        if self._worker is not None:
+            self._worker.join(timeout)
+        return not self.is_processing
+
+    def iter_events(self, timeout=None):
+        """
+        Yield a ChunkEvent per chunk, in chunk order, blocking until each one is ready,
+        and stop when the run ends. Meant for a single consumer.
+
+        :param timeout: Seconds to wait for the next event before raising queue.Empty
+        """
+        while True:
+            event = self.event_queue.get(timeout=timeout)
+            if event is None:
+                return
+            yield event
 
     def get_progress(self):
         return self.processed_chunks / (self.total_chunks * 2) if self.total_chunks > 0 else 0
 
+    def is_partial(self):
+        return bool(self.failed_chunks)
+
+    def get_silence_report(self):
+        return self.silence_report
+
     def get_language_code(self):
         return self.language_code
\ No newline at end of file
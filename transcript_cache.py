@@ -0,0 +1,171 @@
+# File: transcript_cache.py
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'transcripts')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+HASH_BLOCK_SIZE = 1024 * 1024
+EVICT_LOW_WATER = 0.9  # eviction frees space down to this fraction of max_bytes, so it runs rarely
+RESCAN_EVERY_WRITES = 1000  # re-measure the directory now and then, other processes write to it too
+
+
+def hash_buffer(buffer, start=0, end=None, block_size=HASH_BLOCK_SIZE):
+    """SHA-256 of `buffer[start:end]` (bytes, mmap, memoryview) without copying it."""
+    digest = hashlib.sha256()
+    view = memoryview(buffer)
+    end = len(view) if end is None else end
+    try:
+        for offset in range(start, end, block_size):
+            digest.update(view[offset:min(offset + block_size, end)])
+    finally:
+        view.release()
+    return digest.hexdigest()
+
+
+def hash_file(file_path, block_size=HASH_BLOCK_SIZE):
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Persistent, content-addressed JSON store with size-based LRU eviction. Holds whole
+    transcripts as well as individual chunk results, so an interrupted or partially
+    failed run can resume by fetching only the chunks that are missing.
+
+    Entries are individual files named after their key, so the cache survives restarts
+    and can be shared by several processes. A file's mtime is its last-access time:
+    reads touch it and eviction removes the least recently used entries first once the
+    directory grows past `max_bytes`.
+
+    The directory size is tracked incrementally as entries are written and only
+    re-measured when it goes over budget or every RESCAN_EVERY_WRITES writes, so a
+    write does not scan the whole cache.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # unknown until the directory is first measured
+        self._writes_since_scan = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """Combine the given parts (digests, model names, settings) into one cache key."""
+        return hashlib.sha256("\x1f".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                value = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """Store a JSON-serializable value under `key`, then evict if the cache is over budget."""
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(value, file, ensure_ascii=False)
+                size = file.tell()
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            # Atomic so concurrent readers never see a half-written entry
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._writes_since_scan += 1
+            if self._total_bytes is not None:
+                self._total_bytes += size - replaced
+            rescan = (self._total_bytes is None or self._total_bytes > self.max_bytes
+                      or self._writes_since_scan >= RESCAN_EVERY_WRITES)
+        if rescan:
+            self._evict()
+
+    def get_alias(self, alias):
+        """Resolve an alias (e.g. a source-file hash) to the key it was recorded against."""
+        entry = self.get(self.make_key('alias', alias))
+        return entry.get('key') if entry else None
+
+    def put_alias(self, alias, key):
+        self.put(self.make_key('alias', alias), {'key': key})
+
+    def _chunk_key(self, audio_key, index, endpoint, model):
+        return self.make_key('chunk', audio_key, index, endpoint, model)
+
+    def get_chunk_result(self, audio_key, index, endpoint, model):
+        """Return the stored API result for one chunk/endpoint/model, or None if it was never fetched."""
+        return self.get(self._chunk_key(audio_key, index, endpoint, model))
+
+    def put_chunk_result(self, audio_key, index, endpoint, model, result):
+        self.put(self._chunk_key(audio_key, index, endpoint, model), result)
+
+    def missing_chunks(self, audio_key, total_chunks, endpoint_models):
+        """
+        List the (index, endpoint) pairs that have no stored result yet.
+
+        :param audio_key: Key of the audio the chunks belong to
+        :param total_chunks: Number of chunks the audio was split into
+        :param endpoint_models: Mapping of endpoint name to the model tag it was stored under
+        """
+        return [
+            (index, endpoint)
+            for index in range(total_chunks)
+            for endpoint, model in endpoint_models.items()
+            if not os.path.exists(self._path(self._chunk_key(audio_key, index, endpoint, model)))
+        ]
+
+    def _evict(self):
+        """Measure the directory and, if it is over budget, remove the least recently used entries."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.json'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total > self.max_bytes:
+                target = self.max_bytes * EVICT_LOW_WATER
+                for _, size, path in sorted(entries):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    if total <= target:
+                        break
+            self._total_bytes = total
+            self._writes_since_scan = 0